@@ -0,0 +1,426 @@
+"""
+API load and latency benchmark.
+
+Builds synthetic pennyai.duckdb files at several scales (rows in the
+`training` view), then drives the FastAPI endpoints with concurrent
+clients, either in-process through an ASGI transport or against a real
+uvicorn server. Reports p50/p95/p99 latency, throughput, response size
+and server RSS per endpoint, parameter set and concurrency level.
+
+Each run is saved as JSON under --results-dir; pass --compare with an
+earlier report to print the change in p95 latency and throughput.
+
+Run from the repo root:
+
+    python backend/benchmarks/api_bench.py --scales 10000,100000
+    python backend/benchmarks/api_bench.py --scales 1000000 --mode uvicorn \
+        --uvicorn-workers 2 --concurrency 1,16,64 --compare results/api-old.json
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import math
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+from common import RSSSampler, current_rss_mb, environment, tree_rss_mb, utc_timestamp
+
+BENCH_DIR = Path(__file__).resolve().parent
+BACKEND_DIR = BENCH_DIR.parent
+REPO_ROOT = BACKEND_DIR.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(REPO_ROOT))
+
+# (name, path, params); "{deep_cursor}" is filled in per database
+SCENARIOS = [
+    ("summary", "/api/pennystocks/summary", {}),
+    ("details_50", "/api/pennystocks/details", {"limit": 50}),
+    ("details_50_deep", "/api/pennystocks/details",
+     {"limit": 50, "cursor": "{deep_cursor}"}),
+    ("details_500_full", "/api/pennystocks/details",
+     {"limit": 500, "include_content": "true", "include_comments": "true"}),
+    ("details_5000_ndjson", "/api/pennystocks/details",
+     {"limit": 5000, "format": "ndjson"}),
+    ("export_arrow", "/api/pennystocks/export", {"format": "arrow"}),
+    # md5('1') appears in a single synthetic post; "play" in every post
+    ("search_rare", "/api/pennystocks/search",
+     {"q": "c4ca4238a0b923820dcc509a6f75849b"}),
+    ("search_common", "/api/pennystocks/search", {"q": "play", "limit": 20}),
+]
+
+
+# ------------------ Synthetic databases ------------------
+
+def build_database(path, rows, symbols=2000, mentions_per_post=2, days=30,
+                   seed=0):
+    """
+    Write a synthetic database with `rows` ticker mentions in the
+    normalized schema. Ticker popularity is skewed so a few symbols get
+    most mentions, like the real feed.
+    """
+    import duckdb
+    from scripts.data_version import bump_data_version
+    from scripts.schema import ensure_schema, resolve_quotes
+
+    posts = max(1, rows // mentions_per_post)
+    start = "TIMESTAMP '2025-01-01'"
+    symbol = "'S' || lpad(({expr})::TEXT, 5, '0')"
+    skewed = symbol.format(
+        expr=f"floor({symbols} * pow((hash(i, {seed}) % 1000000) / 1e6, 3))::INT")
+
+    with duckdb.connect(str(path)) as con:
+        ensure_schema(con)
+        con.execute(f"""
+        INSERT INTO companies
+        SELECT {symbol.format(expr='i')}, 'Company ' || i, 'Co ' || i,
+               ['Healthcare', 'Technology', 'Energy', 'Financials'][i % 4 + 1],
+               'Industry ' || (i % 40), 10 + i % 5000, NULL, 'United States',
+               'USD', 'https://s' || i || '.example',
+               repeat(md5(i::TEXT) || ' ', 8), {start}
+        FROM range({symbols}) t(i)
+        """)
+        con.execute(f"""
+        INSERT INTO quotes
+        SELECT {symbol.format(expr='i')}, {start} + INTERVAL (d) DAY,
+               1000000 + hash(i, d) % 500000000,
+               round(0.05 + (hash(i, d, 1) % 50000) / 10000.0, 4),
+               round(0.05 + (hash(i, d, 2) % 50000) / 10000.0, 4),
+               round(0.05 + (hash(i, d, 3) % 50000) / 10000.0, 4),
+               round(0.05 + (hash(i, d, 4) % 50000) / 10000.0, 4),
+               round(0.05 + (hash(i, d, 5) % 50000) / 10000.0, 4),
+               10000 + hash(i, d, 6) % 50000000
+        FROM range({symbols}) s(i), range({days}) q(d)
+        """)
+        con.execute(f"""
+        INSERT INTO posts (post_id, content, comments, score, num_comments,
+                           created_utc, last_updated)
+        SELECT 'p' || i,
+               'Thoughts on this play ' || repeat(md5(i::TEXT) || ' ', 10),
+               to_json([md5((i + 1)::TEXT), md5((i + 2)::TEXT),
+                        md5((i + 3)::TEXT)])::TEXT,
+               hash(i, {seed}) % 5000, 3,
+               {start} + INTERVAL (i * 30) SECOND,
+               {start} + INTERVAL (hash(i, {seed}) % {days}) DAY
+        FROM range({posts}) t(i)
+        """)
+        con.execute(f"""
+        INSERT INTO post_ticker_mentions
+        SELECT i + 1, 'p' || (i // {mentions_per_post}), {skewed}, {skewed},
+               NULL,
+               {start} + INTERVAL (hash(i // {mentions_per_post}, {seed}) % {days}) DAY
+                   + INTERVAL 12 HOUR,
+               NULL
+        FROM range({rows}) t(i)
+        """)
+        resolve_quotes(con)
+        con.execute(f"""
+        INSERT INTO summaries
+        SELECT 'p' || i, 'Summary ' || md5(i::TEXT), 'Comments ' || md5(i::TEXT),
+               ['BUY', 'SELL', 'HOLD'][i % 3 + 1], 'synthetic', 'bench', {start}
+        FROM range({posts}) t(i)
+        WHERE i % 5 <> 0
+        """)
+        bump_data_version(con, "api_bench")
+        con.execute("CHECKPOINT")
+
+
+def ensure_database(data_dir, rows, args):
+    """Reuse a database built for this scale, or build it"""
+    from scripts.search_index import update_search_index
+    from scripts.ticker_aggregates import update_ticker_aggregates
+
+    path = Path(data_dir) / f"api-bench-{rows}.duckdb"
+    if path.exists() and not args.rebuild:
+        # No-op unless the database predates the aggregate or search tables
+        with contextlib.redirect_stdout(sys.stderr):
+            update_ticker_aggregates(str(path))
+            update_search_index(str(path))
+        return path, None
+    if path.exists():
+        path.unlink()
+    print(f"🗃️  Building {rows:,}-row database at {path}...", file=sys.stderr)
+    start = time.perf_counter()
+    build_database(path, rows, symbols=args.symbols, seed=args.seed)
+    with contextlib.redirect_stdout(sys.stderr):
+        update_ticker_aggregates(str(path))
+        update_search_index(str(path))
+    return path, round(time.perf_counter() - start, 2)
+
+
+def deep_cursor(path):
+    """Keyset cursor pointing at the middle of the details listing"""
+    import duckdb
+    from backend.server import encode_cursor
+
+    with duckdb.connect(str(path), read_only=True) as con:
+        total = con.execute("SELECT COUNT(*) FROM training").fetchone()[0]
+        row = con.execute("""
+            SELECT created_utc, row_id FROM training
+            ORDER BY created_utc DESC NULLS LAST, row_id DESC
+            LIMIT 1 OFFSET ?
+        """, [total // 2]).fetchone()
+    return encode_cursor(*row) if row else None
+
+
+# ------------------ Load generation ------------------
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+async def drive(client, path, params, concurrency, requests, warmup):
+    """Issue `requests` GETs from `concurrency` clients; returns raw samples"""
+    for _ in range(warmup):
+        await client.get(path, params=params)
+
+    counter = itertools.count()
+    latencies, sizes, statuses = [], [], Counter()
+
+    async def client_loop():
+        while next(counter) < requests:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                statuses[response.status_code] += 1
+                sizes.append(len(response.content))
+            except Exception as e:
+                statuses[type(e).__name__] += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, sizes, statuses, time.perf_counter() - start
+
+
+def summarize_samples(latencies, sizes, statuses, elapsed):
+    ms = sorted(x * 1000 for x in latencies)
+    ok = sum(n for status, n in statuses.items() if status == 200)
+    return {
+        "requests": sum(statuses.values()),
+        "errors": sum(statuses.values()) - ok,
+        "status_counts": {str(k): v for k, v in statuses.items()},
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "max_ms": round(ms[-1], 2) if ms else None,
+        "throughput_rps": round(len(ms) / elapsed, 1) if elapsed > 0 else None,
+        "mean_bytes": round(sum(sizes) / len(sizes)) if sizes else None,
+    }
+
+
+def scenarios_for(rows, cursor, args):
+    for name, path, params in SCENARIOS:
+        if args.scenarios and name not in args.scenarios:
+            continue
+        if name == "export_arrow" and rows > args.export_max_rows:
+            continue
+        if "cursor" in params:
+            if cursor is None:
+                continue
+            params = {**params, "cursor": cursor}
+        yield name, path, params
+
+
+async def run_scenarios(client, rows, cursor, args, measure_rss, mode):
+    results = []
+    for name, path, params in scenarios_for(rows, cursor, args):
+        for concurrency in args.concurrency:
+            with RSSSampler(interval=0.05, measure=measure_rss) as rss:
+                samples = await drive(client, path, params, concurrency,
+                                      args.requests, args.warmup)
+            result = {
+                "scale": rows, "mode": mode, "scenario": name, "path": path,
+                "params": {k: v for k, v in params.items() if k != "cursor"},
+                "concurrency": concurrency,
+                **summarize_samples(*samples),
+                "server_rss_mb": round(rss.peak, 1) if rss.peak else None,
+            }
+            results.append(result)
+            print(f"  {mode:<9} {rows:>10,} {name:<20} c={concurrency:<4} "
+                  f"p50 {result['p50_ms']}ms  p95 {result['p95_ms']}ms  "
+                  f"p99 {result['p99_ms']}ms  {result['throughput_rps']} rps  "
+                  f"{result['mean_bytes']} B  err {result['errors']}",
+                  file=sys.stderr)
+    return results
+
+
+async def bench_inprocess(db_path, rows, cursor, args):
+    """Drive the app through httpx's ASGI transport, lifespan included"""
+    import httpx
+    import backend.server as server
+
+    server.DB_PATH = Path(db_path)
+    app = server.app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench",
+                                     timeout=args.timeout) as client:
+            return await run_scenarios(client, rows, cursor, args,
+                                       current_rss_mb, "inprocess")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def bench_uvicorn(db_path, rows, cursor, args):
+    """Start uvicorn on the database and drive it over HTTP"""
+    import httpx
+
+    port = free_port()
+    # The server reads backend/data/duckdb/pennyai.duckdb relative to its
+    # working directory, so run it from a directory where that is our file
+    workdir = Path(tempfile.mkdtemp(prefix="pennyai-api-bench-"))
+    server_db = workdir / "backend" / "data" / "duckdb" / "pennyai.duckdb"
+    server_db.parent.mkdir(parents=True)
+    server_db.symlink_to(Path(db_path).resolve())
+    env = {**os.environ,
+           "PYTHONPATH": os.pathsep.join(
+               filter(None, [str(REPO_ROOT), os.environ.get("PYTHONPATH")]))}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.server:app",
+         "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.uvicorn_workers), "--log-level", "warning"],
+        cwd=workdir, env=env)
+    base_url = f"http://127.0.0.1:{port}"
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    try:
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout,
+                                     limits=limits) as client:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    await client.get("/api/pennystocks/summary")
+                    break
+                except httpx.TransportError:
+                    if proc.poll() is not None or time.monotonic() > deadline:
+                        raise RuntimeError("uvicorn did not start")
+                    await asyncio.sleep(0.2)
+            return await run_scenarios(client, rows, cursor, args,
+                                       lambda: tree_rss_mb(proc.pid), "uvicorn")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+# ------------------ Reports ------------------
+
+def compare(report, baseline_path):
+    """Print p95 and throughput changes against an earlier report"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    key = lambda r: (r["scale"], r["mode"], r["scenario"], r["concurrency"])
+    before = {key(r): r for r in baseline.get("results", [])}
+
+    print(f"\nCompared with {baseline_path} ({baseline.get('timestamp')}):",
+          file=sys.stderr)
+    for result in report["results"]:
+        old = before.get(key(result))
+        if not old or not old.get("p95_ms") or not result.get("p95_ms"):
+            continue
+        p95 = (result["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        rps = ((result["throughput_rps"] - old["throughput_rps"])
+               / old["throughput_rps"] * 100) if old.get("throughput_rps") else 0
+        flag = "⚠️ " if p95 > 10 else "   "
+        print(f"{flag}{result['mode']:<9} {result['scale']:>10,} "
+              f"{result['scenario']:<20} c={result['concurrency']:<4} "
+              f"p95 {old['p95_ms']} -> {result['p95_ms']}ms ({p95:+.1f}%)  "
+              f"rps {rps:+.1f}%", file=sys.stderr)
+
+
+def int_list(value):
+    return [int(float(v)) for v in value.split(",") if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int_list, default=[10_000, 100_000],
+                        help="comma-separated row counts, e.g. 10000,1e6,1e7")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"],
+                        default="inprocess")
+    parser.add_argument("--concurrency", type=int_list, default=[1, 8, 32],
+                        help="comma-separated concurrent client counts")
+    parser.add_argument("--requests", type=int, default=200,
+                        help="requests per scenario and concurrency level")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--scenarios", type=lambda v: v.split(","),
+                        help=f"subset of: {', '.join(s[0] for s in SCENARIOS)}")
+    parser.add_argument("--export-max-rows", type=int, default=1_000_000,
+                        help="skip the full export scenario above this scale")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="disable the response cache to measure query cost")
+    parser.add_argument("--uvicorn-workers", type=int, default=1)
+    parser.add_argument("--symbols", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--data-dir", default=str(BACKEND_DIR / "benchmarks" / "data"),
+                        help="where synthetic databases are built and reused")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="rebuild databases even if present")
+    parser.add_argument("--results-dir", default=str(BENCH_DIR / "results"))
+    parser.add_argument("--compare", help="earlier report to compare against")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    if args.no_cache:
+        # Read by the server at import (in-process) or startup (uvicorn)
+        os.environ["PENNYAI_CACHE_MAX_BYTES"] = "0"
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(REPO_ROOT)
+
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    databases, results = [], []
+    for rows in args.scales:
+        db_path, build_seconds = ensure_database(args.data_dir, rows, args)
+        databases.append({
+            "scale": rows, "path": str(db_path), "build_seconds": build_seconds,
+            "size_mb": round(db_path.stat().st_size / (1024 * 1024), 1),
+        })
+        cursor = deep_cursor(db_path)
+        for mode in modes:
+            bench = bench_inprocess if mode == "inprocess" else bench_uvicorn
+            results += asyncio.run(bench(db_path, rows, cursor, args))
+
+    report = {
+        "benchmark": "api",
+        "timestamp": utc_timestamp(),
+        "config": {k: v for k, v in vars(args).items()
+                   if k not in ("compare", "results_dir", "data_dir")},
+        "environment": environment(),
+        "databases": databases,
+        "results": results,
+    }
+
+    os.makedirs(args.results_dir, exist_ok=True)
+    out = Path(args.results_dir) / f"api-{report['timestamp'].replace(':', '')}.json"
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+        f.write("\n")
+    print(f"✅ Report written to {out}", file=sys.stderr)
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Helpers shared by the benchmark scripts: memory sampling and report metadata"""
+import os
+import platform
+import resource
+import sys
+import threading
+from datetime import datetime, timezone
+
+
+def peak_rss_mb():
+    """Process-lifetime peak RSS (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def process_rss_mb(pid="self"):
+    """Current RSS of a process from /proc (Linux); None when unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError):
+        return None
+
+
+def current_rss_mb():
+    rss = process_rss_mb()
+    return rss if rss is not None else peak_rss_mb()
+
+
+def tree_rss_mb(pid):
+    """RSS of a process plus its children, e.g. uvicorn and its workers"""
+    pids = [pid]
+    try:
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, ValueError, IndexError):
+                continue
+            if ppid == pid:
+                pids.append(int(entry))
+    except OSError:
+        return None
+    sizes = [process_rss_mb(p) for p in pids]
+    sizes = [s for s in sizes if s is not None]
+    return sum(sizes) if sizes else None
+
+
+class RSSSampler:
+    """Samples RSS on a background thread to get a peak over a block"""
+
+    def __init__(self, interval=0.01, measure=current_rss_mb):
+        self.interval = interval
+        self.measure = measure
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        rss = self.measure()
+        if rss is not None:
+            self.peak = max(self.peak, rss)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def utc_timestamp():
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
@@ -0,0 +1,283 @@
+"""
+Deterministic local stand-ins for the pipeline's network dependencies:
+a praw-compatible Reddit source, a yfinance module (Ticker + download)
+and a LangChain chat model in place of ChatGroq. Every value is derived
+from a seed, so the same configuration produces the same dataset.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+LETTERS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+WORDS = (
+    "stock shares squeeze float short calls puts earnings revenue guidance "
+    "dilution offering catalyst partnership FDA approval merger rally dip "
+    "bagholder moon rocket support resistance volume breakout chart bullish "
+    "bearish quarter contract insider buyback pump dump hold buy sell"
+).split()
+
+
+def _rng(*parts):
+    """Random generator seeded from the parts, stable across processes"""
+    return random.Random(zlib.crc32(":".join(map(str, parts)).encode()))
+
+
+def make_symbols(count, seed=0):
+    """`count` distinct synthetic tickers of 2-4 letters"""
+    rng = _rng("symbols", seed)
+    symbols = set()
+    while len(symbols) < count:
+        symbols.add("".join(rng.choice(LETTERS) for _ in range(rng.randint(2, 4))))
+    return sorted(symbols)
+
+
+# --- Reddit -----------------------------------------------------------------
+
+class FakeComment:
+    def __init__(self, body, score=0):
+        self.body = body
+        self.score = score
+
+
+class FakeCommentForest(list):
+    def replace_more(self, limit=0):
+        return []
+
+
+class FakeSubmission:
+    def __init__(self, source, subreddit, index):
+        rng = _rng(source.seed, subreddit, index)
+        tickers = rng.sample(source.symbols, k=rng.randint(1, 3))
+        words = rng.choices(WORDS, k=rng.randint(*source.body_words))
+
+        self.id = f"{subreddit}-{index}"
+        self.title = f"${tickers[0]} {' '.join(rng.choices(WORDS, k=6))}"
+        self.selftext = " ".join(words + [f"${t}" for t in tickers[1:]])
+        self.author = f"user{rng.randint(1, 50_000)}"
+        self.score = rng.randint(0, 5_000)
+        self.num_comments = source.comments_per_post
+        # Index 0 is the newest post
+        self.created_utc = source.start - index * 60.0
+        self.url = f"https://reddit.example/{self.id}"
+        self._source = source
+        self._rng = rng
+
+    @property
+    def comments(self):
+        rng = self._rng
+        return FakeCommentForest(
+            FakeComment(" ".join(rng.choices(WORDS, k=rng.randint(3, 40))),
+                        rng.randint(0, 500))
+            for _ in range(self._source.comments_per_post)
+        )
+
+
+class FakeSubreddit:
+    def __init__(self, source, name):
+        self.source = source
+        self.display_name = name
+
+    def new(self, limit=100):
+        for index in range(min(limit, self.source.posts_per_sub)):
+            # One listing page per 100 posts
+            if index % 100 == 0:
+                self.source.wait()
+            yield FakeSubmission(self.source, self.display_name, index)
+
+
+class FakeReddit:
+    """Stands in for praw.Reddit; all clients share one FakeRedditSource"""
+
+    def __init__(self, source, **_credentials):
+        self.source = source
+
+    def subreddit(self, name):
+        return FakeSubreddit(self.source, name)
+
+    def submission(self, id):
+        subreddit, index = id.rsplit("-", 1)
+        self.source.wait()
+        return FakeSubmission(self.source, subreddit, int(index))
+
+
+class FakeRedditSource:
+    """Synthetic subreddits of `posts_per_sub` posts each"""
+
+    def __init__(self, posts_per_sub, symbols, comments_per_post=5,
+                 body_words=(20, 200), latency=0.0, seed=0, start=1.7e9):
+        self.posts_per_sub = posts_per_sub
+        self.symbols = symbols
+        self.comments_per_post = comments_per_post
+        self.body_words = body_words
+        self.latency = latency
+        self.seed = seed
+        self.start = start
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def praw_module(self):
+        """Drop-in for the `praw` module: praw.Reddit(**credentials)"""
+        return SimpleNamespace(Reddit=lambda **kw: FakeReddit(self, **kw))
+
+
+# --- yfinance ---------------------------------------------------------------
+
+class FakeTicker:
+    def __init__(self, market, symbol):
+        self.market = market
+        self.symbol = symbol
+
+    @property
+    def info(self):
+        self.market.call("info")
+        base, _, suffix = self.symbol.partition(".")
+        if self.market.listing(base) != self.symbol:
+            return {"trailingPegRatio": None}
+
+        rng = _rng(self.market.seed, "info", self.symbol)
+        price = round(rng.uniform(0.05, 5.0), 4)
+        return {
+            "longName": f"{base} Holdings Inc.",
+            "shortName": f"{base} Hldgs",
+            "sector": rng.choice(["Healthcare", "Technology", "Energy", "Financial Services"]),
+            "industry": rng.choice(["Biotechnology", "Software", "Oil & Gas", "Banks"]),
+            "marketCap": rng.randint(1_000_000, 500_000_000),
+            "sharesOutstanding": rng.randint(1_000_000, 200_000_000),
+            "fullTimeEmployees": rng.randint(5, 5_000),
+            "country": "Canada" if suffix else "United States",
+            "currency": "CAD" if suffix else "USD",
+            "currentPrice": price,
+            "previousClose": round(price * rng.uniform(0.9, 1.1), 4),
+            "open": price,
+            "dayHigh": round(price * 1.05, 4),
+            "dayLow": round(price * 0.95, 4),
+            "volume": rng.randint(10_000, 50_000_000),
+            "website": f"https://{base.lower()}.example",
+            "longBusinessSummary": " ".join(rng.choices(WORDS, k=80)),
+        }
+
+
+class FakeMarket:
+    """
+    Stands in for the yfinance module. A share of base tickers is listed
+    under an exchange suffix and a share is unknown to every exchange, so
+    symbol resolution walks the suffix list like it does live. Each call
+    sleeps `latency` seconds and fails with probability `error_rate`.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, suffixed_share=0.1,
+                 unknown_share=0.05, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.suffixed_share = suffixed_share
+        self.unknown_share = unknown_share
+        self.seed = seed
+        self.calls = {"info": 0, "download": 0}
+        self._lock = threading.Lock()
+        self._errors = random.Random(seed)
+        self.Ticker = lambda symbol: FakeTicker(self, symbol)
+
+    def call(self, kind):
+        with self._lock:
+            self.calls[kind] += 1
+            fail = self._errors.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            raise ConnectionError(f"fake yfinance {kind} error")
+
+    def listing(self, base):
+        """The one symbol `base` trades under, or None"""
+        roll = _rng(self.seed, "listing", base).random()
+        if roll < self.unknown_share:
+            return None
+        if roll < self.unknown_share + self.suffixed_share:
+            return f"{base}.TO"
+        return base
+
+    def download(self, symbols, period="5d", **_kwargs):
+        self.call("download")
+        days = pd.bdate_range(end="2025-01-10", periods=5)
+        frames = {}
+        for symbol in symbols:
+            base = symbol.partition(".")[0]
+            if self.listing(base) != symbol:
+                continue
+            rng = _rng(self.seed, "bars", symbol)
+            close = np.round([rng.uniform(0.05, 5.0) for _ in days], 4)
+            frames[symbol] = pd.DataFrame({
+                "Open": close * 0.99, "High": close * 1.05, "Low": close * 0.95,
+                "Close": close, "Adj Close": close,
+                "Volume": [rng.randint(10_000, 50_000_000) for _ in days],
+            }, index=days)
+        return pd.concat(frames, axis=1) if frames else pd.DataFrame()
+
+
+# --- Groq -------------------------------------------------------------------
+
+class FakeServiceError(Exception):
+    """Retryable provider error, like a Groq 503"""
+    status_code = 503
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    ChatGroq stand-in. Answers the summary prompts with valid JSON (an
+    array for batched prompts) after `latency` seconds, failing with a
+    retryable error at `error_rate`.
+    """
+
+    latency: float = 0.0
+    error_rate: float = 0.0
+    seed: int = 0
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-groq"
+
+    def _respond(self, messages):
+        self.calls += 1
+        prompt = "\n".join(str(m.content) for m in messages)
+        rng = _rng(self.seed, prompt)
+        if rng.random() < self.error_rate:
+            raise FakeServiceError("fake groq 503")
+
+        def summary():
+            return {
+                "summarized_content": " ".join(rng.choices(WORDS, k=25)),
+                "summarized_comments": " ".join(rng.choices(WORDS, k=15)),
+                "verdict": rng.choice(["BUY", "SELL", "HOLD"]),
+            }
+
+        batch = re.search(r"JSON array of exactly (\d+)", prompt)
+        if batch:
+            body = [summary() for _ in range(int(batch.group(1)))]
+        else:
+            body = summary()
+        return ChatResult(generations=[
+            ChatGeneration(message=AIMessage(content=json.dumps(body)))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._respond(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._respond(messages)
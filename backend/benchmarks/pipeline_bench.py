@@ -0,0 +1,261 @@
+"""
+Offline pipeline benchmark.
+
+Runs the real pipeline stages (fetch -> preprocess -> enrich -> merge ->
+upload -> summarize) against the deterministic fakes in fakes.py and
+reports wall time, peak RSS and rows per second for each stage as JSON.
+Nothing touches the network or the real database.
+
+Run from the repo root:
+
+    python backend/benchmarks/pipeline_bench.py --posts 10000
+    python backend/benchmarks/pipeline_bench.py --posts 100000 --engine duckdb \
+        --llm-latency 0.05 --output bench.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from common import RSSSampler, environment, peak_rss_mb, utc_timestamp
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SUBREDDITS = ["pennystocks", "wallstreetbets",
+              "smallstreetbets", "RobinHoodPennyStocks"]
+
+
+def measure(results, name, func, count_rows, verbose=False):
+    """Run one stage, appending its timing to results; returns its output"""
+    sink = contextlib.ExitStack()
+    if not verbose:
+        # Stage logs and tqdm progress bars
+        sink.enter_context(contextlib.redirect_stdout(io.StringIO()))
+        sink.enter_context(contextlib.redirect_stderr(io.StringIO()))
+    with RSSSampler() as rss, sink:
+        start = time.perf_counter()
+        output = func()
+        seconds = time.perf_counter() - start
+    rows = count_rows(output)
+    results.append({
+        "stage": name,
+        "seconds": round(seconds, 4),
+        "rows": rows,
+        "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+        "peak_rss_mb": round(rss.peak, 1),
+    })
+    print(f"  {name:<11} {seconds:9.3f}s  {rows:>9} rows  "
+          f"{results[-1]['rows_per_second'] or 0:>12,.0f} rows/s  "
+          f"{rss.peak:8.1f} MB", file=sys.stderr)
+    return output
+
+
+def parquet_rows(path):
+    import pyarrow.parquet as pq
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def configure_environment(args):
+    """
+    Pipeline settings are read from the environment at import time, so
+    they are set before the pipeline modules are imported. Rate limits
+    default to effectively unlimited: the benchmark measures the pipeline,
+    not the provider quotas.
+    """
+    unlimited = str(10 ** 9)
+    os.environ["REDDIT_REQUESTS_PER_MINUTE"] = unlimited
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(args.llm_rpm or unlimited)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(args.llm_tpm or unlimited)
+    os.environ["LLM_MAX_CONCURRENCY"] = str(args.llm_concurrency)
+    os.environ["SUMMARY_BATCH_SIZE"] = str(args.summary_batch_size)
+    os.environ.setdefault("LLM_MAX_RETRIES", "2")
+
+
+def run_benchmark(args):
+    configure_environment(args)
+
+    import duckdb
+
+    import scripts.create_summary_from_langchain as summarizer
+    import scripts.fetch_posts_from_reddit as reddit
+    import scripts.get_ticker_info_from_yfinance as yfinance
+    from scripts.create_duckdb_from_parquet import upload_to_db
+    from scripts.duckdb_engine import connect_engine, merge_duckdb, preprocess_duckdb
+    from scripts.merge_reddit_and_yfinance import merge_reddit_yfinance
+    from scripts.pre_process_reddit_posts import preprocess
+    from scripts.ticker_aggregates import update_ticker_aggregates
+    from scripts import metrics
+
+    from fakes import (FakeChatModel, FakeMarket, FakeRedditSource,
+                       make_symbols)
+
+    subreddits = SUBREDDITS[:args.subreddits]
+    posts_per_sub = -(-args.posts // len(subreddits))
+    symbols = make_symbols(args.symbols, seed=args.seed)
+
+    source = FakeRedditSource(posts_per_sub, symbols,
+                              comments_per_post=args.comments,
+                              latency=args.reddit_latency, seed=args.seed)
+    market = FakeMarket(latency=args.yfinance_latency,
+                        error_rate=args.yfinance_error_rate, seed=args.seed)
+    chat = FakeChatModel(latency=args.llm_latency,
+                         error_rate=args.llm_error_rate, seed=args.seed)
+
+    reddit.praw = source.praw_module()
+    yfinance.yf = market
+    summarizer.ChatGroq = lambda **kwargs: chat
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pennyai-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    db_path = os.path.join(workdir, "bench.duckdb")
+    paths = {name: os.path.join(workdir, f"{name}.parquet")
+             for name in ("reddit_posts", "processed", "yfinance", "llm_ready")}
+    for path in [db_path, *paths.values()]:
+        if os.path.exists(path):
+            os.remove(path)
+
+    def db_rows(_):
+        with duckdb.connect(db_path, read_only=True) as con:
+            return con.execute("SELECT COUNT(*) FROM training").fetchone()[0]
+
+    def summarized(stats):
+        return (stats or {}).get("done", 0)
+
+    print(f"Benchmarking {args.engine} pipeline: {args.posts} posts, "
+          f"{len(symbols)} symbols, workdir {workdir}", file=sys.stderr)
+
+    results = []
+    started = time.perf_counter()
+    fetch = lambda output_path: reddit.fetch_reddit_posts(
+        output_path, limit_per_sub=posts_per_sub, subreddit_list=subreddits,
+        top_n=args.comments, db_path=None, max_workers=args.workers)
+
+    if args.engine == "files":
+        measure(results, "fetch", lambda: fetch(paths["reddit_posts"]),
+                lambda t: t.num_rows, args.verbose)
+        measure(results, "preprocess",
+                lambda: preprocess(paths["reddit_posts"], paths["processed"]),
+                lambda _: parquet_rows(paths["processed"]), args.verbose)
+        measure(results, "enrich",
+                lambda: yfinance.enrich_tickers_with_yfinance(
+                    paths["processed"], paths["yfinance"], db_path=db_path,
+                    max_workers=args.workers),
+                len, args.verbose)
+        measure(results, "merge",
+                lambda: merge_reddit_yfinance(
+                    paths["processed"], paths["yfinance"], paths["llm_ready"]),
+                lambda _: parquet_rows(paths["llm_ready"]), args.verbose)
+        measure(results, "upload",
+                lambda: upload_to_db(db_path, paths["llm_ready"], "training"),
+                db_rows, args.verbose)
+    else:
+        con = connect_engine()
+        posts = measure(results, "fetch", lambda: fetch(None),
+                        lambda t: t.num_rows, args.verbose)
+        processed = measure(results, "preprocess",
+                            lambda: preprocess_duckdb(con, posts),
+                            lambda t: t.num_rows, args.verbose)
+        yfinance_info = measure(
+            results, "enrich",
+            lambda: yfinance.yfinance_table(
+                yfinance.enrich_tickers_with_yfinance(
+                    processed, None, db_path=db_path, max_workers=args.workers)),
+            lambda t: t.num_rows, args.verbose)
+        llm_ready = measure(results, "merge",
+                            lambda: merge_duckdb(con, processed, yfinance_info),
+                            lambda t: t.num_rows, args.verbose)
+        con.close()
+        measure(results, "upload",
+                lambda: upload_to_db(db_path, llm_ready, "training"),
+                db_rows, args.verbose)
+
+    if not args.skip_summarize:
+        measure(results, "summarize",
+                lambda: summarizer.summarize_using_langchain(
+                    "training", db_path=db_path, workers=1),
+                summarized, args.verbose)
+        measure(results, "aggregate",
+                lambda: update_ticker_aggregates(db_path, "training"),
+                lambda stats: stats["tickers"], args.verbose)
+
+    total = time.perf_counter() - started
+    report = {
+        "benchmark": "pipeline",
+        "timestamp": utc_timestamp(),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "environment": environment(),
+        "stages": results,
+        "total_seconds": round(total, 4),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "db_size_mb": round(os.path.getsize(db_path) / (1024 * 1024), 2),
+        "fake_calls": {
+            "yfinance": dict(market.calls),
+            "llm_requests": chat.calls,
+        },
+        # Counters the pipeline itself records (scripts/metrics.py)
+        "pipeline_metrics": {
+            name: metric["samples"]
+            for name, metric in metrics.REGISTRY.snapshot()["metrics"].items()
+            if metric["type"] == "counter"
+        },
+    }
+
+    if not args.keep and not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000,
+                        help="posts to generate (1k-1M)")
+    parser.add_argument("--subreddits", type=int, default=len(SUBREDDITS),
+                        choices=range(1, len(SUBREDDITS) + 1))
+    parser.add_argument("--comments", type=int, default=5, help="comments per post")
+    parser.add_argument("--symbols", type=int, default=500,
+                        help="size of the synthetic ticker universe")
+    parser.add_argument("--engine", choices=["files", "duckdb"], default="files",
+                        help="parquet-per-stage pipeline, or the in-process DuckDB engine")
+    parser.add_argument("--workers", type=int, default=8,
+                        help="fetch/enrich thread pool size")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reddit-latency", type=float, default=0.0,
+                        help="seconds per fake Reddit request")
+    parser.add_argument("--yfinance-latency", type=float, default=0.0,
+                        help="seconds per fake yfinance call")
+    parser.add_argument("--yfinance-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-latency", type=float, default=0.0,
+                        help="seconds per fake LLM request")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--llm-rpm", type=int, default=None,
+                        help="LLM requests/minute limit (default unlimited)")
+    parser.add_argument("--llm-tpm", type=int, default=None,
+                        help="LLM tokens/minute limit (default unlimited)")
+    parser.add_argument("--summary-batch-size", type=int, default=250,
+                        help="posts per summary job checkpoint")
+    parser.add_argument("--skip-summarize", action="store_true")
+    parser.add_argument("--workdir", help="keep stage outputs here instead of a temp dir")
+    parser.add_argument("--keep", action="store_true", help="keep the temp dir")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="show stage output")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    report = run_benchmark(args)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(text)
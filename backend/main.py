@@ -1,56 +1,263 @@
+import argparse
+import os
+import time
 from datetime import datetime
 
 from scripts.fetch_posts_from_reddit import fetch_reddit_posts
 from scripts.pre_process_reddit_posts import preprocess
-from scripts.get_ticker_info_from_yfinance import enrich_tickers_with_yfinance
+from scripts.get_ticker_info_from_yfinance import (
+    enrich_tickers_with_yfinance, yfinance_table)
 from scripts.merge_reddit_and_yfinance import merge_reddit_yfinance
 from scripts.create_duckdb_from_parquet import upload_to_db
-from scripts.create_summary_from_langchain import summarize_using_langchain
+from scripts.create_summary_from_langchain import (
+    SUMMARY_WORKERS, summarize_using_langchain)
+from scripts.pipeline_runner import PipelineRunner, Stage
+from scripts.ticker_aggregates import update_ticker_aggregates
+from scripts.data_lake import update_data_lake
+from scripts.search_index import update_search_index
+from scripts.db_publish import prepare_staging, publish_database, staging_path
+from scripts import metrics
+from scripts.duckdb_engine import (
+    connect_engine, materialize, merge_duckdb, preprocess_duckdb)
 
 subreddits_to_fetch = ["pennystocks", "wallstreetbets",
                        "smallstreetbets", "RobinHoodPennyStocks"]
 
+DB_PATH = "backend/data/duckdb/pennyai.duckdb"
+# Stages write here; the last stage publishes it over DB_PATH (see
+# scripts/db_publish.py), so the pipeline can run while the API is up
+WORK_DB_PATH = staging_path(DB_PATH)
+STATE_PATH = "backend/data/pipeline_state.json"
+REPORT_PATH = "backend/data/pipeline_report.json"
+
+# Optional Pushgateway-compatible sink for the run's metrics
+PUSHGATEWAY_URL = os.environ.get("PUSHGATEWAY_URL")
+
+REDDIT_POSTS = "backend/data/reddit_posts.parquet"
+PROCESSED_POSTS = "backend/data/processed_reddit_posts.parquet"
+YFINANCE_INFO = "backend/data/processed_yfinance_info.parquet"
+LLM_READY = "backend/data/llm_ready_dataset.parquet"
+
+
+def build_stages(summary_workers=SUMMARY_WORKERS):
+    return [
+        Stage(
+            "fetch", fetch_reddit_posts,
+            kwargs=dict(
+                output_path=REDDIT_POSTS,
+                limit_per_sub=20,
+                subreddit_list=subreddits_to_fetch,
+                top_n=20,
+                db_path=WORK_DB_PATH,
+                incremental=True,
+            ),
+            outputs=[REDDIT_POSTS],
+            # Source stage: its input is Reddit itself
+            always_run=True,
+        ),
+        Stage(
+            "preprocess", preprocess,
+            kwargs=dict(input_path=REDDIT_POSTS, output_path=PROCESSED_POSTS),
+            inputs=[REDDIT_POSTS],
+            outputs=[PROCESSED_POSTS],
+        ),
+        Stage(
+            "enrich", enrich_tickers_with_yfinance,
+            kwargs=dict(input_path=PROCESSED_POSTS, output_path=YFINANCE_INFO,
+                        db_path=WORK_DB_PATH),
+            inputs=[PROCESSED_POSTS],
+            outputs=[YFINANCE_INFO],
+        ),
+        Stage(
+            "merge", merge_reddit_yfinance,
+            kwargs=dict(reddit_path=PROCESSED_POSTS, yfinance_path=YFINANCE_INFO,
+                        output_path=LLM_READY),
+            inputs=[PROCESSED_POSTS, YFINANCE_INFO],
+            outputs=[LLM_READY],
+        ),
+        Stage(
+            "lake", update_data_lake,
+            kwargs=dict(
+                sources={
+                    "reddit_posts": REDDIT_POSTS,
+                    "processed_reddit_posts": PROCESSED_POSTS,
+                    "processed_yfinance_info": YFINANCE_INFO,
+                    "llm_ready_dataset": LLM_READY,
+                },
+                DB_PATH=WORK_DB_PATH,
+            ),
+            # Skipped like any stage when these outputs are unchanged, so a
+            # rerun does not append the same rows twice
+            inputs=[REDDIT_POSTS, PROCESSED_POSTS, YFINANCE_INFO, LLM_READY],
+        ),
+        Stage(
+            "upload", upload_to_db,
+            kwargs=dict(DB_PATH=WORK_DB_PATH, PARQUET_FILE=LLM_READY,
+                        TABLE_NAME="training"),
+            inputs=[LLM_READY],
+            outputs=[WORK_DB_PATH],
+        ),
+        Stage(
+            "summarize", summarize_using_langchain,
+            kwargs=dict(TABLE_NAME="training", workers=summary_workers,
+                        db_path=WORK_DB_PATH),
+            inputs=[WORK_DB_PATH],
+            # Only touches rows still missing a summary, so always safe to run
+            always_run=True,
+        ),
+        Stage(
+            "aggregate", update_ticker_aggregates,
+            kwargs=dict(DB_PATH=WORK_DB_PATH, TABLE_NAME="training"),
+            inputs=[WORK_DB_PATH],
+            # Recomputes only the days touched since its last run
+            always_run=True,
+        ),
+        Stage(
+            "search_index", update_search_index,
+            kwargs=dict(DB_PATH=WORK_DB_PATH, TABLE_NAME="training"),
+            inputs=[WORK_DB_PATH],
+            # Re-tokenizes only posts whose content or summary changed
+            always_run=True,
+        ),
+        Stage(
+            "publish", publish_database,
+            kwargs=dict(db_path=DB_PATH),
+            inputs=[WORK_DB_PATH],
+            always_run=True,
+        ),
+    ]
+
+
+def run_pipeline(resume=False, force=False, summary_workers=SUMMARY_WORKERS):
+    prepare_staging(DB_PATH)
+    runner = PipelineRunner(build_stages(summary_workers), STATE_PATH)
+    runner.run(resume=resume, force=force)
+    print("🎉 Pipeline completed!")
+
+
+def run_pipeline_in_process(materialize_outputs=False,
+                            summary_workers=SUMMARY_WORKERS):
+    """
+    Run every stage in one process, handing Arrow tables from stage to
+    stage and doing preprocess/merge as DuckDB SQL. Parquet files are only
+    written when materialize_outputs is set (for debugging).
+    """
+    def path(p):
+        return p if materialize_outputs else None
+
+    work_db = prepare_staging(DB_PATH)
+    con = connect_engine()
 
-def run_pipeline():
     print("✅ Fetching Reddit posts...")
-    fetch_reddit_posts(
-        "backend/data/reddit_posts.parquet",
-        limit_per_sub=20,
-        subreddit_list=subreddits_to_fetch,
-        top_n=20,
-    )
+    with metrics.span("fetch") as span:
+        posts = fetch_reddit_posts(
+            path(REDDIT_POSTS),
+            limit_per_sub=20,
+            subreddit_list=subreddits_to_fetch,
+            top_n=20,
+            db_path=work_db,
+            incremental=True,
+        )
+        span["rows"] = posts.num_rows
 
     print("✅ Preprocessing...")
-    preprocess(
-        "backend/data/reddit_posts.parquet",
-        "backend/data/processed_reddit_posts.parquet",
-    )
+    with metrics.span("preprocess") as span:
+        processed = preprocess_duckdb(con, posts)
+        materialize(processed, path(PROCESSED_POSTS))
+        span["rows"] = processed.num_rows
 
     print("✅ YFinance enrich...")
-    enrich_tickers_with_yfinance(
-        "backend/data/processed_reddit_posts.parquet",
-        "backend/data/processed_yfinance_info.parquet",
-    )
+    with metrics.span("enrich") as span:
+        yfinance_info = yfinance_table(
+            enrich_tickers_with_yfinance(processed, path(YFINANCE_INFO), db_path=work_db))
+        span["rows"] = yfinance_info.num_rows
 
     print("✅ Merge datasets...")
-    merge_reddit_yfinance(
-        "backend/data/processed_reddit_posts.parquet",
-        "backend/data/processed_yfinance_info.parquet",
-        "backend/data/llm_ready_dataset.parquet",
-    )
+    with metrics.span("merge") as span:
+        llm_ready = merge_duckdb(con, processed, yfinance_info)
+        materialize(llm_ready, path(LLM_READY))
+        span["rows"] = llm_ready.num_rows
+    con.close()
+
+    print("✅ Archiving to the data lake...")
+    with metrics.span("lake"):
+        update_data_lake({
+            "reddit_posts": posts,
+            "processed_reddit_posts": processed,
+            "processed_yfinance_info": yfinance_info,
+            "llm_ready_dataset": llm_ready,
+        }, work_db)
 
     print("✅ Uploading to DuckDB...")
-    upload_to_db(
-        "backend/data/duckdb/pennyai.duckdb",
-        "backend/data/llm_ready_dataset.parquet",
-        "training",
-    )
+    with metrics.span("upload", rows=llm_ready.num_rows):
+        upload_to_db(work_db, llm_ready, "training")
 
     print("✅ Running LLM summaries...")
-    summarize_using_langchain("training")
+    with metrics.span("summarize"):
+        summarize_using_langchain("training", workers=summary_workers,
+                                  db_path=work_db)
+
+    print("✅ Updating ticker aggregates...")
+    with metrics.span("aggregate"):
+        update_ticker_aggregates(work_db, "training")
+
+    print("✅ Updating the search index...")
+    with metrics.span("search_index"):
+        update_search_index(work_db, "training")
+
+    print("✅ Publishing the database...")
+    with metrics.span("publish"):
+        publish_database(DB_PATH)
 
     print("🎉 Pipeline completed!")
 
 
+def publish_metrics(report_path, **run_info):
+    """Write the run's metrics and spans as JSON, and push them if configured"""
+    metrics.write_run_report(report_path, **run_info)
+    print(f"📊 Run report saved to {report_path}")
+    if PUSHGATEWAY_URL:
+        try:
+            metrics.push_to_gateway(PUSHGATEWAY_URL, job="pennyai_pipeline")
+            print(f"📊 Metrics pushed to {PUSHGATEWAY_URL}")
+        except Exception as e:
+            print(f"⚠️  Could not push metrics to {PUSHGATEWAY_URL}: {e}")
+
+
 if __name__ == "__main__":
-    run_pipeline()
+    parser = argparse.ArgumentParser(description="Run the PennyAI data pipeline")
+    parser.add_argument("--resume", action="store_true",
+                        help="restart at the stage that failed in the last run")
+    parser.add_argument("--force", action="store_true",
+                        help="rerun every stage even if its inputs are unchanged")
+    parser.add_argument("--engine", choices=["stages", "duckdb"], default="stages",
+                        help="'duckdb' runs all stages in-process over Arrow tables; "
+                             "it always does a full run and keeps no stage state, "
+                             "so it does not take --resume or --force")
+    parser.add_argument("--materialize", action="store_true",
+                        help="with --engine duckdb, also write each stage's parquet")
+    parser.add_argument("--summary-workers", type=int, default=SUMMARY_WORKERS,
+                        help="summarizer worker processes draining the job queue")
+    parser.add_argument("--report", default=REPORT_PATH,
+                        help="where to write the JSON run report (metrics and stage spans)")
+    args = parser.parse_args()
+    if args.engine == "duckdb" and (args.resume or args.force):
+        parser.error("--resume and --force only apply to --engine stages")
+    if args.engine != "duckdb" and args.materialize:
+        parser.error("--materialize only applies to --engine duckdb")
+
+    started_at = datetime.now()
+    started = time.perf_counter()
+    status = "failed"
+    try:
+        if args.engine == "duckdb":
+            run_pipeline_in_process(materialize_outputs=args.materialize,
+                                    summary_workers=args.summary_workers)
+        else:
+            run_pipeline(resume=args.resume, force=args.force,
+                         summary_workers=args.summary_workers)
+        status = "completed"
+    finally:
+        publish_metrics(args.report, status=status, engine=args.engine,
+                        started_at=started_at,
+                        wall_time_s=round(time.perf_counter() - started, 3))
@@ -1,82 +1,68 @@
 import duckdb
+import pyarrow as pa
+
+from scripts.data_version import bump_data_version
+from scripts.fetch_posts_from_reddit import commit_high_water_marks
+from scripts.merge_reddit_and_yfinance import SCORE_COLUMNS
+from scripts.schema import ensure_schema, upsert_rows
 
 
 def upload_to_db(DB_PATH, PARQUET_FILE, TABLE_NAME):
+    """
+    Upsert the LLM-ready rows into the normalized tables (see
+    scripts/schema.py); TABLE_NAME is the compatibility view over them.
+    PARQUET_FILE is a parquet path, or an Arrow table when the pipeline
+    runs in-process.
+    """
     print("<--------------------------Running 5 -------------------------->")
 
     con = duckdb.connect(DB_PATH)
 
-    con.execute("CREATE SEQUENCE IF NOT EXISTS seq_row_id START 1;")
+    if isinstance(PARQUET_FILE, pa.Table):
+        con.register("llm_ready_source", PARQUET_FILE)
+        source = "llm_ready_source"
+    else:
+        source = f"read_parquet('{PARQUET_FILE}')"
 
-    # Create table with auto-increment primary key
-    con.execute(f"""
-        CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
-        row_id INTEGER PRIMARY KEY DEFAULT nextval('seq_row_id'),
-        reddit_ticker TEXT,
-        yfinance_symbol TEXT,
-        long_name TEXT,
-        short_name TEXT,
-        sector TEXT,
-        industry TEXT,
-        market_cap BIGINT,
-        employees INTEGER,
-        founded INTEGER,
-        country TEXT,
-        currency TEXT,
-        current_price DOUBLE,
-        previous_close DOUBLE,
-        open DOUBLE,
-        day_high DOUBLE,
-        day_low DOUBLE,
-        volume BIGINT,
-        website TEXT,
-        about TEXT,
-        score INTEGER,
-        num_comments INTEGER,
-        content TEXT,
-        comments TEXT,
-        created_utc TIMESTAMP,
-        error TEXT,
-        last_updated TIMESTAMP
-    );
-    """)
+    ensure_schema(con, TABLE_NAME)
+    print(f"✅ Normalized tables and {TABLE_NAME} view ready.")
 
-    print("✅ Table created (or already existed).")
+    # Parquet files written before post_id was tracked lack the column
+    parquet_cols = {
+        r[0]: r[1] for r in con.execute(
+            f"DESCRIBE SELECT * FROM {source}").fetchall()
+    }
+    post_id = "" if "post_id" in parquet_cols else ", NULL::TEXT AS post_id"
+    # ...and before the merge scored posts (triage_posts scores them later)
+    scores = "".join(f", NULL::DOUBLE AS {col}" for col in SCORE_COLUMNS
+                     if col not in parquet_cols)
 
-    con.execute(f"""
-    INSERT INTO {TABLE_NAME} (
-        reddit_ticker, yfinance_symbol, long_name, short_name,
-        sector, industry, market_cap, employees, founded, country,
-        currency, current_price, previous_close, open, day_high,
-        day_low, volume, website, about, score, num_comments,
-        content, comments, created_utc, error, last_updated
-    )
-    SELECT 
-        reddit_ticker, yfinance_symbol, long_name, short_name,
-        sector, industry, market_cap, employees, founded, country,
-        currency, current_price, previous_close, open, day_high,
-        day_low, volume, website, about, score, num_comments,
-        content, comments, to_timestamp(created_utc) AS created_utc,
-        error,
-        last_updated
-        FROM read_parquet('{PARQUET_FILE}');
-        """)
+    # Comment lists are stored as JSON text so they can be split again
+    comments = ("to_json(comments)::TEXT"
+                if parquet_cols.get("comments", "").endswith("[]")
+                else "comments")
 
-    columns_to_add = [
-        "summarized_content",
-        "summarized_comments",
-        "verdict"
-    ]
+    con.execute(f"""
+    CREATE OR REPLACE TEMP VIEW upload_rows AS
+    SELECT * REPLACE (
+        CAST(to_timestamp(created_utc) AS TIMESTAMP) AS created_utc,
+        {comments} AS comments
+    ){post_id}{scores}
+    FROM {source}
+    """)
 
-    for col in columns_to_add:
-        con.execute(f"""
-            ALTER TABLE {TABLE_NAME} 
-            ADD COLUMN IF NOT EXISTS {col} TEXT
-        """)
+    # Upsert: re-fetched posts refresh their engagement, mentions and
+    # companies are keyed so they don't pile up, and every fetch appends
+    # a point to the quote history.
+    con.execute("BEGIN TRANSACTION")
+    upsert_rows(con, "upload_rows")
+    # The fetch that produced these rows is now safe to move past
+    commit_high_water_marks(con)
+    con.execute("COMMIT")
 
-    print("✅ Columns added (if not already present)")
+    print("✅ Rows upserted into posts, companies, quotes and mentions.")
 
-    print("✅ Rows appended with auto-increment row_id.")
+    bump_data_version(con, "upload_to_db")
 
     result = con.execute(f"SELECT COUNT(*) FROM {TABLE_NAME};").fetchone()
     print(f"✅ {TABLE_NAME} row count: {result[0]}")
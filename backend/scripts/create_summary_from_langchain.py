@@ -1,17 +1,74 @@
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
-from pydantic import BaseModel, Field
-import json
+from langchain_core.runnables import RunnableBranch
+from pydantic import BaseModel, Field, TypeAdapter
 import pandas as pd
+import pyarrow as pa
 from dotenv import load_dotenv
-import duckdb
+import multiprocessing
 import os
+import queue as queue_module
+
+from scripts import metrics
+from scripts.data_version import bump_data_version
+from scripts.llm_executor import ChainExecutor
+from scripts.prompt_packing import format_posts, pack_post, plan_batches
+from scripts.sentiment import SENTIMENT_VERSION, score_posts
+from scripts.summary_cache import SummaryCache
+from scripts.summary_jobs import SummaryJobQueue
+from scripts.schema import ensure_schema
 
 # Load API keys from .env
 load_dotenv()
 GROQ_API = os.environ.get('GROQ_API')
 
+# Groq limits for llama-3.1-8b-instant; override to match your account tier
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 4))
+LLM_REQUESTS_PER_MINUTE = int(os.environ.get("LLM_REQUESTS_PER_MINUTE", 30))
+LLM_TOKENS_PER_MINUTE = int(os.environ.get("LLM_TOKENS_PER_MINUTE", 6000))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 5))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+
+LLM_MODEL = "llama-3.1-8b-instant"
+
+DB_PATH = "backend/data/duckdb/pennyai.duckdb"
+
+# Job queue: posts per checkpointed batch, lease length, attempts per post
+SUMMARY_BATCH_SIZE = int(os.environ.get("SUMMARY_BATCH_SIZE", 25))
+SUMMARY_LEASE_SECONDS = int(os.environ.get("SUMMARY_LEASE_SECONDS", 600))
+SUMMARY_MAX_ATTEMPTS = int(os.environ.get("SUMMARY_MAX_ATTEMPTS", 3))
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 1))
+
+# Prompt packing: token budget per post, and how short posts are batched
+# into one request (LLM_BATCH_MAX_POSTS=1 disables batching)
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get("LLM_PROMPT_TOKEN_BUDGET", 1500))
+LLM_BATCH_MAX_POSTS = int(os.environ.get("LLM_BATCH_MAX_POSTS", 5))
+LLM_BATCH_TOKEN_BUDGET = int(os.environ.get("LLM_BATCH_TOKEN_BUDGET", 3000))
+LLM_SHORT_POST_TOKENS = int(os.environ.get("LLM_SHORT_POST_TOKENS", 600))
+
+# Bump whenever the prompt changes so cached summaries are not reused
+PROMPT_VERSION = "2"
+
+# Triage on the lexicon scores (scripts/sentiment.py): posts with at least
+# TRIAGE_LLM_MIN_RELEVANCE go to the LLM, those with at least
+# TRIAGE_TEMPLATE_MIN_RELEVANCE get a templated summary whose verdict is
+# BUY/SELL past +/-TRIAGE_VERDICT_THRESHOLD sentiment, the rest are skipped.
+# Set both relevance thresholds to 0 to send every post to the LLM.
+TRIAGE_LLM_MIN_RELEVANCE = float(os.environ.get("TRIAGE_LLM_MIN_RELEVANCE", 0.35))
+TRIAGE_TEMPLATE_MIN_RELEVANCE = float(
+    os.environ.get("TRIAGE_TEMPLATE_MIN_RELEVANCE", 0.1))
+TRIAGE_VERDICT_THRESHOLD = float(os.environ.get("TRIAGE_VERDICT_THRESHOLD", 0.3))
+
+# Model recorded on templated summaries
+TEMPLATE_MODEL = "lexicon"
+
+SUMMARY_POSTS = metrics.counter(
+    "pennyai_summary_posts_total", "Posts finished by the summarizer by outcome")
+LLM_REQUESTS = metrics.counter(
+    "pennyai_llm_summary_requests_total",
+    "Summary requests by kind (single, batch, fallback)")
+
 
 class FinancialSummary(BaseModel):
     summarized_content: str = Field(
@@ -20,26 +77,45 @@ class FinancialSummary(BaseModel):
     verdict: str = Field(description="BUY, SELL, or HOLD based on sentiment")
 
 
-def summarize_using_langchain(TABLE_NAME):
-    con = duckdb.connect("backend/data/duckdb/pennyai.duckdb")
+BATCH_ADAPTER = TypeAdapter(list[FinancialSummary])
+
+
+def compact_format_instructions():
+    """One-line JSON shape for FinancialSummary, far shorter than the parser's schema dump"""
+    fields = ", ".join(
+        f'"{name}": "<{field.description}>"'
+        for name, field in FinancialSummary.model_fields.items()
+    )
+    return "{" + fields + "}"
+
 
-    df = con.execute(f"""
-    SELECT row_id, content, comments
-    FROM {TABLE_NAME}
-    WHERE summarized_content IS NULL
-    OR summarized_content = ''
-    """).fetchdf()
+def parse_batch(output, expected):
+    """Validate a batched response: a list of `expected` FinancialSummary objects"""
+    if isinstance(output, Exception):
+        raise output
+    if isinstance(output, dict):
+        # Some responses wrap the array, e.g. {"summaries": [...]}
+        output = next((v for v in output.values() if isinstance(v, list)), output)
+    summaries = BATCH_ADAPTER.validate_python(output)
+    if len(summaries) != expected:
+        raise ValueError(f"expected {expected} summaries, got {len(summaries)}")
+    return [s.model_dump() for s in summaries]
 
-    print(f"Processing {len(df)} rows...")
 
+def build_chain():
+    """
+    Return the summary chain. Inputs with a `posts` key go to the batched
+    prompt (JSON array out), the rest to the single-post prompt. The
+    format instructions are bound into both templates once.
+    """
     # Initialize LLM
-    llm = ChatGroq(model="llama-3.1-8b-instant",
+    llm = ChatGroq(model=LLM_MODEL,
                    temperature=0, api_key=GROQ_API)
 
     # Setup JSON parser
-    parser = JsonOutputParser(pydantic_object=FinancialSummary)
+    parser = JsonOutputParser()
 
-    # Prompt template
+    # Prompt templates
     prompt_template = """You are a financial analyst AI. 
         Summarize the Reddit post content and comments. 
 
@@ -49,68 +125,350 @@ def summarize_using_langchain(TABLE_NAME):
         Comments:
         {comments}
 
-        {format_instructions}
+        Respond with only this JSON object: {format_instructions}
         """
 
-    prompt = ChatPromptTemplate.from_template(prompt_template)
+    batch_template = """You are a financial analyst AI. 
+        Summarize each Reddit post below (content and comments). 
+
+        {posts}
+
+        Respond with only a JSON array of exactly {count} objects, one per
+        post and in the same order, each shaped like: {format_instructions}
+        """
+
+    format_instructions = compact_format_instructions()
+    prompt = ChatPromptTemplate.from_template(prompt_template).partial(
+        format_instructions=format_instructions)
+    batch_prompt = ChatPromptTemplate.from_template(batch_template).partial(
+        format_instructions=format_instructions)
 
     # Create chain using LCEL
-    chain = prompt | llm | parser
+    return RunnableBranch(
+        (lambda inputs: "posts" in inputs, batch_prompt | llm | parser),
+        prompt | llm | parser,
+    )
 
-    # Process each row
-    results = []
-    for idx, row in df.iterrows():
-        content = row['content'] or ""
 
-        # Handle comments - could be list or string
-        if isinstance(row['comments'], list):
-            comments = " ".join(row['comments'])
+def run_requests(executor, keys, inputs_by_key, tokens_by_key):
+    """
+    Summarize the posts behind `keys`, packing short ones several to a
+    request. A batched response that fails validation is retried as
+    single-post requests. Returns {key: summary dict or exception}.
+    """
+    groups = plan_batches([(k, tokens_by_key[k]) for k in keys],
+                          max_posts=LLM_BATCH_MAX_POSTS,
+                          max_tokens=LLM_BATCH_TOKEN_BUDGET,
+                          short_tokens=LLM_SHORT_POST_TOKENS)
+    requests = [
+        inputs_by_key[group[0]] if len(group) == 1 else {
+            "posts": format_posts([inputs_by_key[k] for k in group]),
+            "count": len(group),
+        }
+        for group in groups
+    ]
+
+    done = 0
+
+    def report(index, output):
+        nonlocal done
+        done += 1
+        label = f"{len(groups[index])} posts" if len(groups[index]) > 1 else "post"
+        if isinstance(output, Exception):
+            print(f"✗ Error processing request {done}/{len(requests)} ({label}): {output}")
         else:
-            comments = str(row['comments']) if row['comments'] else ""
+            print(f"✓ Processed request {done}/{len(requests)} ({label})")
+
+    print(f"Sending {len(keys)} posts in {len(requests)} requests")
+    for group in groups:
+        LLM_REQUESTS.inc(kind="batch" if len(group) > 1 else "single")
+    outputs = executor.run(requests, on_result=report)
 
+    results = {}
+    fallback = []
+    for group, output in zip(groups, outputs):
+        if len(group) == 1:
+            results[group[0]] = output
+            continue
         try:
-            output = chain.invoke({
-                "content": content,
-                "comments": comments,
-                "format_instructions": parser.get_format_instructions()
-            })
+            results.update(zip(group, parse_batch(output, len(group))))
+        except Exception as e:
+            print(f"⚠️ Batched response rejected ({e}); retrying {len(group)} posts singly")
+            fallback += group
 
-            results.append({
-                "row_id": row['row_id'],
-                "summarized_content": output.get("summarized_content", ""),
-                "summarized_comments": output.get("summarized_comments", ""),
-                "verdict": output.get("verdict", "")
-            })
+    if fallback:
+        LLM_REQUESTS.inc(len(fallback), kind="fallback")
+        outputs = executor.run([inputs_by_key[k] for k in fallback])
+        results.update(zip(fallback, outputs))
+    return results
 
-            print(f"✓ Processed row {idx + 1}/{len(df)}")
 
-        except Exception as e:
-            print(f"✗ Error processing row {row['row_id']}: {e}")
-            results.append({
-                "row_id": row['row_id'],
-                "summarized_content": "",
-                "summarized_comments": "",
-                "verdict": ""
-            })
-
-    # Create summary DataFrame
-    summary_df = pd.DataFrame(results)
-
-    # Register as temporary table in DuckDB
-    con.register("temp_summary", summary_df)
-
-    # Update original table
-    con.execute(f"""
-    UPDATE {TABLE_NAME} AS t
-    SET
-        summarized_content = s.summarized_content,
-        summarized_comments = s.summarized_comments,
-        verdict = s.verdict
-    FROM temp_summary AS s
-    WHERE t.row_id = s.row_id
+def score_missing_posts(con):
+    """Score posts stored before the merge computed sentiment/relevance"""
+    posts = con.execute("""
+    SELECT post_id, content, comments, score, num_comments
+    FROM posts
+    WHERE relevance_score IS NULL
+    """).fetch_arrow_table()
+    if not posts.num_rows:
+        return 0
+    sentiment, relevance = score_posts(
+        posts["content"], posts["comments"], posts["score"],
+        posts["num_comments"])
+    con.register("missing_scores", pa.table({
+        "post_id": posts["post_id"],
+        "sentiment_score": sentiment,
+        "relevance_score": relevance,
+    }))
+    con.execute("""
+    UPDATE posts AS p
+    SET sentiment_score = m.sentiment_score, relevance_score = m.relevance_score
+    FROM missing_scores AS m
+    WHERE p.post_id = m.post_id
     """)
+    con.unregister("missing_scores")
+    return posts.num_rows
+
+
+def triage_posts(con, llm_min=TRIAGE_LLM_MIN_RELEVANCE,
+                 template_min=TRIAGE_TEMPLATE_MIN_RELEVANCE,
+                 verdict_threshold=TRIAGE_VERDICT_THRESHOLD):
+    """
+    Give unsummarized posts below llm_min relevance a templated summary
+    (model TEMPLATE_MODEL) if they reach template_min, and count the rest
+    as skipped. Posts with a queued or running job are left to the queue.
+    Returns {"scored", "templated", "skipped"}.
+    """
+    scored = score_missing_posts(con)
+    # Unsummarized, unqueued posts with relevance below $below
+    candidates = """
+    FROM posts AS p
+    LEFT JOIN summaries AS s USING (post_id)
+    LEFT JOIN summary_jobs AS j USING (post_id)
+    WHERE s.post_id IS NULL
+      AND coalesce(j.status, '') NOT IN ('pending', 'running')
+      AND p.relevance_score < $below
+    """
+    tone = """CASE WHEN p.sentiment_score >= $threshold THEN '{}'
+                WHEN p.sentiment_score <= -$threshold THEN '{}'
+                ELSE '{}' END"""
+
+    templated = con.execute(f"""
+    INSERT OR REPLACE INTO summaries
+    SELECT p.post_id,
+           printf('Lexicon pre-score only (not summarized by the LLM): %s tone, '
+                  || 'sentiment %+.2f, relevance %.2f.',
+                  {tone.format("bullish", "bearish", "neutral")},
+                  p.sentiment_score, p.relevance_score),
+           '',
+           {tone.format("BUY", "SELL", "HOLD")},
+           '{TEMPLATE_MODEL}', '{SENTIMENT_VERSION}', now()
+    {candidates}
+      AND p.relevance_score >= $template_min
+    """, {"below": llm_min, "template_min": template_min,
+          "threshold": verdict_threshold}).fetchone()[0]
+
+    skipped = con.execute(f"SELECT COUNT(*) {candidates}",
+                          {"below": template_min}).fetchone()[0]
+    return {"scored": scored, "templated": templated, "skipped": skipped}
+
+
+def run_summary_worker(db_path=DB_PATH, max_concurrency=LLM_MAX_CONCURRENCY,
+                       batch_size=SUMMARY_BATCH_SIZE, workers=1, worker_id=None):
+    """
+    Claim batches from the summary job queue until it is empty. Each
+    batch is checkpointed (summaries + job status) in one transaction.
+    Several workers can run at once, in-process or as separate
+    processes; `workers` splits the Groq rate limits between them.
+    """
+    queue = SummaryJobQueue(db_path, lease_seconds=SUMMARY_LEASE_SECONDS,
+                            max_attempts=SUMMARY_MAX_ATTEMPTS,
+                            worker_id=worker_id)
+    executor = ChainExecutor(
+        build_chain(),
+        max_concurrency=max_concurrency,
+        requests_per_minute=max(1, LLM_REQUESTS_PER_MINUTE // workers),
+        tokens_per_minute=max(1, LLM_TOKENS_PER_MINUTE // workers),
+        max_retries=LLM_MAX_RETRIES,
+        timeout=LLM_TIMEOUT,
+    )
+
+    totals = {"summarized": 0, "failed": 0, "hits": 0, "misses": 0}
+
+    while True:
+        with queue.connect() as con:
+            post_ids = queue.claim(con, batch_size)
+            if not post_ids:
+                break
+
+            df = con.execute("""
+            SELECT post_id, content, comments
+            FROM posts
+            WHERE post_id IN (SELECT unnest(?))
+            """, [post_ids]).fetchdf()
+
+            # One LLM input per distinct (prompt, model, content, comments)
+            # key, packed into the per-post token budget
+            row_keys = []
+            inputs_by_key = {}
+            tokens_by_key = {}
+            for _, row in df.iterrows():
+                content, comments, tokens = pack_post(
+                    row['content'], row['comments'],
+                    budget=LLM_PROMPT_TOKEN_BUDGET)
+
+                key = SummaryCache.make_key(
+                    PROMPT_VERSION, LLM_MODEL, content, comments)
+                row_keys.append(key)
+                inputs_by_key.setdefault(key, {
+                    "content": content,
+                    "comments": comments,
+                })
+                tokens_by_key[key] = tokens
+
+            cache = SummaryCache(con)
+            summaries = cache.get_many(inputs_by_key)
+
+        pending_keys = [k for k in inputs_by_key if k not in summaries]
+        totals["hits"] += cache.hits
+        totals["misses"] += cache.misses
+
+        print(f"[{queue.worker_id}] Claimed {len(post_ids)} posts: "
+              f"{len(summaries)} cache hits, {len(pending_keys)} to summarize")
+
+        # No connection is held while the LLM calls run
+        outputs = run_requests(executor, pending_keys, inputs_by_key,
+                               tokens_by_key)
+
+        new_summaries = {}
+        errors = {}
+        for key, output in outputs.items():
+            if isinstance(output, Exception):
+                errors[key] = output
+            else:
+                new_summaries[key] = {
+                    "summarized_content": output.get("summarized_content", ""),
+                    "summarized_comments": output.get("summarized_comments", ""),
+                    "verdict": output.get("verdict", "")
+                }
+        summaries.update(new_summaries)
+
+        # Fill every post sharing a key from the one summary
+        results = [
+            {"post_id": post_id, **summaries[key]}
+            for post_id, key in zip(df['post_id'], row_keys)
+            if key in summaries
+        ]
+        failures = {
+            post_id: errors[key]
+            for post_id, key in zip(df['post_id'], row_keys)
+            if key in errors
+        }
+        # Posts deleted since they were queued have nothing to summarize
+        done_ids = set(post_ids) - set(failures)
+
+        summary_df = pd.DataFrame(results, columns=[
+            "post_id", "summarized_content", "summarized_comments", "verdict"])
+
+        # Checkpoint the batch
+        with queue.connect() as con:
+            con.execute("BEGIN TRANSACTION")
+            SummaryCache(con).put_many(new_summaries)
+            con.register("temp_summary", summary_df)
+            con.execute("""
+            INSERT OR REPLACE INTO summaries
+            SELECT post_id, summarized_content, summarized_comments, verdict,
+                   ?, ?, now()
+            FROM temp_summary
+            """, [LLM_MODEL, PROMPT_VERSION])
+            queue.complete(con, done_ids, failures)
+            con.execute("COMMIT")
+            if results:
+                bump_data_version(con, "summarize_using_langchain")
+
+        totals["summarized"] += len(results)
+        totals["failed"] += len(failures)
+        SUMMARY_POSTS.inc(len(results), outcome="summarized")
+        SUMMARY_POSTS.inc(len(failures), outcome="failed")
+
+    print(f"✅ [{queue.worker_id}] {totals['summarized']} posts summarized, "
+          f"{totals['failed']} failed")
+    return totals
+
+
+def _worker_process(results, **kwargs):
+    """Process entry point: run a worker, then hand its counters back"""
+    run_summary_worker(**kwargs)
+    results.put(metrics.REGISTRY.snapshot())
+
+
+def summarize_using_langchain(TABLE_NAME, max_concurrency=LLM_MAX_CONCURRENCY,
+                              workers=SUMMARY_WORKERS, db_path=DB_PATH,
+                              retry_failed=False):
+    """
+    Triage unsummarized posts on their lexicon scores, queue a summary
+    job for every post relevant enough for the LLM, then drain the queue
+    with `workers` worker processes (1 runs in this process). Interrupted
+    runs resume from the last checkpointed batch.
+    """
+    queue = SummaryJobQueue(db_path, max_attempts=SUMMARY_MAX_ATTEMPTS)
+
+    with queue.connect() as con:
+        ensure_schema(con, TABLE_NAME)
+        queue.ensure_table(con)
+        triage = triage_posts(con)
+        if triage["scored"] or triage["templated"]:
+            bump_data_version(con, "triage_posts")
+        stats = queue.enqueue(con, retry_failed=retry_failed,
+                              min_relevance=TRIAGE_LLM_MIN_RELEVANCE,
+                              template_model=TEMPLATE_MODEL)
+
+    SUMMARY_POSTS.inc(triage["templated"], outcome="templated")
+    SUMMARY_POSTS.inc(triage["skipped"], outcome="skipped")
+    print(f"📊 Triage: {triage['templated']} posts given a templated verdict, "
+          f"{triage['skipped']} skipped as low-signal"
+          + (f" ({triage['scored']} older posts scored)" if triage["scored"] else ""))
+
+    queued = stats.get("pending", 0) + stats.get("running", 0)
+    print(f"Processing {queued} queued posts with {workers} worker(s)...")
+    if not queued:
+        print(f"✅ Nothing to summarize in {TABLE_NAME}")
+        return stats
+
+    worker_kwargs = dict(db_path=db_path, max_concurrency=max_concurrency,
+                         workers=workers)
+    if workers <= 1:
+        run_summary_worker(**worker_kwargs)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        results = ctx.Queue()
+        procs = [ctx.Process(target=_worker_process, args=(results,),
+                             kwargs=worker_kwargs)
+                 for _ in range(workers)]
+        for proc in procs:
+            proc.start()
+        # Drain while workers run so none blocks flushing its snapshot
+        while any(proc.is_alive() for proc in procs):
+            try:
+                metrics.REGISTRY.merge(results.get(timeout=1))
+            except queue_module.Empty:
+                pass
+        for proc in procs:
+            proc.join()
+        while not results.empty():
+            metrics.REGISTRY.merge(results.get())
+        exit_codes = [proc.exitcode for proc in procs]
+        if any(code != 0 for code in exit_codes):
+            # Their leased batches are reclaimed by the next run
+            raise RuntimeError(
+                f"Summary worker(s) failed with exit codes {exit_codes}")
 
-    con.commit()
-    con.close()
+    with queue.connect() as con:
+        cache = SummaryCache(con)
+        cache.evict()
+        entries = cache.stats()["entries"]
+        stats = queue.stats(con)
 
-    print(f"✅ Successfully updated {len(results)} rows in {TABLE_NAME}")
+    print(f"✅ Summary jobs: {stats}")
+    print(f"🗃️  Summary cache: {entries} entries")
+    return stats
@@ -0,0 +1,296 @@
+"""
+Hive-partitioned Parquet lake for stage outputs.
+
+    backend/data/lake/<dataset>/date=YYYY-MM-DD[/subreddit=...]/part-*.parquet
+
+Each run appends its stage outputs as zstd Parquet (with per row group
+min/max statistics) to one dataset per stage, partitioned by the post's
+date (the run date for yfinance info, which has no timestamp). Runs
+leave small files behind, so partitions with several files are compacted
+into one; partitions older than LAKE_HOT_DAYS move to the cold tier and
+those older than LAKE_RETENTION_DAYS are deleted. Appends are keyed by
+run date and content hash and recorded in a ledger, so retrying a failed
+run never appends the same output twice. `lake_<dataset>` views in the
+DuckDB file read the hot tier with partition pruning, e.g.
+
+    SELECT ... FROM lake_llm_ready_dataset WHERE date >= DATE '2025-11-01'
+"""
+import hashlib
+import os
+import re
+import shutil
+import uuid
+from datetime import date, datetime
+
+import duckdb
+import pyarrow as pa
+
+LAKE_ROOT = os.environ.get("LAKE_ROOT", "backend/data/lake")
+# Empty disables the cold tier: old partitions are deleted instead
+LAKE_COLD_ROOT = os.environ.get("LAKE_COLD_ROOT", "backend/data/lake_cold")
+LAKE_HOT_DAYS = int(os.environ.get("LAKE_HOT_DAYS", 90))
+LAKE_RETENTION_DAYS = int(os.environ.get("LAKE_RETENTION_DAYS", 730))
+
+# Rows per Parquet row group (DuckDB's default)
+ROW_GROUP_SIZE = 122_880
+
+POST_DATE = "CAST(to_timestamp(created_utc) AS DATE)"
+
+# dataset -> (partition date expression or None for the run date, partition columns)
+DATASETS = {
+    "reddit_posts": (POST_DATE, ["date", "subreddit"]),
+    "processed_reddit_posts": (POST_DATE, ["date"]),
+    "processed_yfinance_info": (None, ["date"]),
+    "llm_ready_dataset": (POST_DATE, ["date"]),
+}
+
+# Dated snapshots kept next to the stage outputs before the lake existed
+LEGACY_SNAPSHOT = re.compile(r"^(?P<dataset>[a-z_]+)_(?P<day>\d{8})\.parquet$")
+LEGACY_IMPORTED = "_legacy_imported.txt"
+# Keys of the stage outputs already appended
+APPENDED = "_appended.txt"
+
+
+def _source(con, name, source):
+    """Register an Arrow table, or return a read_parquet() for a path"""
+    if isinstance(source, pa.Table):
+        con.register(name, source)
+        return name
+    return f"read_parquet('{source}')"
+
+
+def source_key(source, run_date):
+    """Run date plus content hash of a stage output (parquet path or Arrow table)"""
+    digest = hashlib.sha256()
+    if isinstance(source, pa.Table):
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, source.schema) as writer:
+            writer.write_table(source)
+        digest.update(sink.getvalue())
+    else:
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return f"{run_date:%Y%m%d}-{digest.hexdigest()[:16]}"
+
+
+def _read_ledger(lake_root, name):
+    path = os.path.join(lake_root, name)
+    if not os.path.exists(path):
+        return set()
+    with open(path) as f:
+        return set(f.read().split())
+
+
+def _record(lake_root, name, entry):
+    os.makedirs(lake_root, exist_ok=True)
+    with open(os.path.join(lake_root, name), "a") as f:
+        f.write(entry + "\n")
+
+
+def _remove_partial(dataset_root, key):
+    """Delete files a crashed append of `key` left behind"""
+    for dirpath, _, filenames in os.walk(dataset_root):
+        for f in filenames:
+            if f.startswith(f"part-{key}-"):
+                os.remove(os.path.join(dirpath, f))
+
+
+def write_dataset(con, dataset, source, run_date, key, lake_root=LAKE_ROOT):
+    """
+    Append one stage output (parquet path or Arrow table) to its dataset
+    as files named after `key`, replacing any left by an earlier attempt
+    that did not finish.
+    """
+    date_expr, partition_by = DATASETS[dataset]
+    relation = _source(con, f"lake_source_{dataset}", source)
+    rows = con.execute(f"SELECT COUNT(*) FROM {relation}").fetchone()[0]
+    if rows:
+        date_expr = date_expr or f"DATE '{run_date.isoformat()}'"
+        dataset_root = os.path.join(lake_root, dataset)
+        _remove_partial(dataset_root, key)
+        os.makedirs(lake_root, exist_ok=True)
+        con.execute(f"""
+        COPY (SELECT *, {date_expr} AS date FROM {relation})
+        TO '{dataset_root}' (
+            FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {ROW_GROUP_SIZE},
+            PARTITION_BY ({", ".join(partition_by)}),
+            APPEND, FILENAME_PATTERN 'part-{key}-{{uuid}}'
+        )
+        """)
+    if isinstance(source, pa.Table):
+        con.unregister(relation)
+    return rows
+
+
+def import_legacy_snapshots(con, data_dir, lake_root=LAKE_ROOT):
+    """
+    Append <dataset>_YYYYMMDD.parquet snapshots from data_dir to the lake.
+    The files are left in place; imported names are recorded in
+    lake_root/LEGACY_IMPORTED so each is imported once.
+    """
+    done = _read_ledger(lake_root, LEGACY_IMPORTED)
+    imported = 0
+    for name in sorted(os.listdir(data_dir)):
+        match = LEGACY_SNAPSHOT.match(name)
+        if not match or match["dataset"] not in DATASETS or name in done:
+            continue
+        run_date = datetime.strptime(match["day"], "%Y%m%d").date()
+        write_dataset(con, match["dataset"], os.path.join(data_dir, name),
+                      run_date, f"legacy-{match['day']}", lake_root)
+        _record(lake_root, LEGACY_IMPORTED, name)
+        imported += 1
+    return imported
+
+
+def _partitions(root):
+    """Yield (leaf partition dir, its date) for every partition under root"""
+    for dirpath, _, filenames in os.walk(root):
+        if not any(f.endswith(".parquet") for f in filenames):
+            continue
+        match = re.search(r"date=(\d{4}-\d{2}-\d{2})", dirpath)
+        if match:
+            yield dirpath, date.fromisoformat(match[1])
+
+
+# Written next to a compacted file until the files it replaces are deleted
+COMPACT_MANIFEST = ".compacted"
+
+
+def _finish_compaction(partition):
+    """Delete the sources of a compaction a crash interrupted, if any"""
+    manifest = os.path.join(partition, COMPACT_MANIFEST)
+    if not os.path.exists(manifest):
+        return
+    with open(manifest) as f:
+        target, *sources = f.read().split()
+    if os.path.exists(os.path.join(partition, target)):
+        for name in sources:
+            path = os.path.join(partition, name)
+            if os.path.exists(path):
+                os.remove(path)
+    os.remove(manifest)
+
+
+def compact(con, root=LAKE_ROOT, min_files=2):
+    """Rewrite every partition holding at least min_files files as one file"""
+    compacted = 0
+    for partition, _ in list(_partitions(root)):
+        _finish_compaction(partition)
+        files = sorted(os.path.join(partition, f) for f in os.listdir(partition)
+                       if f.endswith(".parquet"))
+        if len(files) < min_files:
+            continue
+        target = os.path.join(partition, f"part-{uuid.uuid4()}.parquet")
+        # Written under a name readers don't glob, then swapped in
+        con.execute(f"""
+        COPY (SELECT * FROM read_parquet(?, union_by_name = true))
+        TO '{target}.tmp' (
+            FORMAT parquet, COMPRESSION zstd, ROW_GROUP_SIZE {ROW_GROUP_SIZE}
+        )
+        """, [files])
+        with open(os.path.join(partition, COMPACT_MANIFEST), "w") as f:
+            f.write("\n".join(os.path.basename(p) for p in [target, *files]))
+        os.replace(target + ".tmp", target)
+        _finish_compaction(partition)
+        compacted += 1
+    return compacted
+
+
+def _date_dir(partition):
+    """The date=... directory a leaf partition belongs to"""
+    while not os.path.basename(partition).startswith("date="):
+        partition = os.path.dirname(partition)
+    return partition
+
+
+def apply_retention(root=LAKE_ROOT, cold_root=LAKE_COLD_ROOT,
+                    hot_days=LAKE_HOT_DAYS, retention_days=LAKE_RETENTION_DAYS,
+                    today=None):
+    """
+    Move date partitions older than hot_days to cold_root (same layout),
+    and delete those older than retention_days from either tier.
+    """
+    today = today or date.today()
+    moved = deleted = 0
+    roots = [root] + ([cold_root] if cold_root else [])
+    for tier in roots:
+        if not os.path.isdir(tier):
+            continue
+        date_dirs = {_date_dir(p): d for p, d in _partitions(tier)}
+        for date_dir, day in date_dirs.items():
+            age = (today - day).days
+            if age > retention_days:
+                shutil.rmtree(date_dir)
+                deleted += 1
+            elif tier == root and age > hot_days:
+                if not cold_root:
+                    shutil.rmtree(date_dir)
+                    deleted += 1
+                    continue
+                target = os.path.join(cold_root, os.path.relpath(date_dir, root))
+                if os.path.exists(target):
+                    # Same day already archived: keep both sets of files
+                    for dirpath, _, filenames in os.walk(date_dir):
+                        dest = os.path.join(target, os.path.relpath(dirpath, date_dir))
+                        os.makedirs(dest, exist_ok=True)
+                        for f in filenames:
+                            os.replace(os.path.join(dirpath, f), os.path.join(dest, f))
+                    shutil.rmtree(date_dir)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(date_dir, target)
+                moved += 1
+    return moved, deleted
+
+
+def create_lake_views(con, lake_root=LAKE_ROOT):
+    """(Re)create a lake_<dataset> view over each dataset's hot tier"""
+    for dataset in DATASETS:
+        root = os.path.join(lake_root, dataset)
+        has_files = any(True for _ in _partitions(root))
+        if has_files:
+            con.execute(f"""
+            CREATE OR REPLACE VIEW lake_{dataset} AS
+            SELECT * FROM read_parquet('{root}/**/*.parquet',
+                                       hive_partitioning = true,
+                                       union_by_name = true)
+            """)
+        else:
+            con.execute(f"DROP VIEW IF EXISTS lake_{dataset}")
+
+
+def update_data_lake(sources, DB_PATH, data_dir="backend/data",
+                     lake_root=LAKE_ROOT, cold_root=LAKE_COLD_ROOT, run_date=None):
+    """
+    Append this run's stage outputs ({dataset: parquet path or Arrow
+    table}) to the lake, skipping any already appended for run_date,
+    import legacy snapshots, compact, apply retention and refresh the
+    lake views in DB_PATH.
+    """
+    print("<--------------------------Running lake -------------------------->")
+    run_date = run_date or date.today()
+    con = duckdb.connect()
+
+    appended = _read_ledger(lake_root, APPENDED)
+    for dataset, source in sources.items():
+        key = source_key(source, run_date)
+        if f"{dataset}/{key}" in appended:
+            print(f"⏭️  {dataset}: already appended by an earlier attempt")
+            continue
+        rows = write_dataset(con, dataset, source, run_date, key, lake_root)
+        _record(lake_root, APPENDED, f"{dataset}/{key}")
+        print(f"🗃️  {dataset}: {rows} rows appended to the lake")
+
+    imported = import_legacy_snapshots(con, data_dir, lake_root)
+    if imported:
+        print(f"🗃️  Imported {imported} legacy snapshot files")
+
+    compacted = compact(con, lake_root)
+    con.close()
+    moved, deleted = apply_retention(lake_root, cold_root)
+    print(f"✅ Lake maintenance: {compacted} partitions compacted, "
+          f"{moved} moved to cold storage, {deleted} deleted")
+
+    with duckdb.connect(DB_PATH) as db:
+        create_lake_views(db, lake_root)
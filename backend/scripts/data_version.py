@@ -0,0 +1,24 @@
+import uuid
+from datetime import datetime
+
+
+def bump_data_version(con, source):
+    """
+    Record a new data version in the database so readers (the API cache)
+    know the tables changed. Call after the write has been committed.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS data_version (
+            version TEXT,
+            source TEXT,
+            updated_at TIMESTAMP
+        );
+    """)
+
+    version = f"{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    con.execute("DELETE FROM data_version")
+    con.execute("INSERT INTO data_version VALUES (?, ?, ?)",
+                [version, source, datetime.utcnow()])
+
+    print(f"✅ Data version bumped to {version} ({source})")
+    return version
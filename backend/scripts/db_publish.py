@@ -0,0 +1,54 @@
+"""
+Publishing the pipeline's DuckDB file.
+
+The API keeps a read-only handle on pennyai.duckdb for as long as it
+runs, and that handle holds a file lock no writer can get past. So the
+pipeline never opens the live file for writing: a run works on a staging
+copy next to it (pennyai.duckdb.staging) and, once every stage has
+succeeded, checkpoints it and swaps it into place with os.replace. Open
+readers keep the old file until they notice the swap (the server
+compares the file's inode, mtime and size on each request) and reopen.
+
+A failed run leaves its staging copy behind and the next run continues
+from it, so summaries checkpointed before the failure are not lost.
+"""
+import os
+import shutil
+
+import duckdb
+
+
+def staging_path(db_path):
+    """Where runs write before publishing to db_path"""
+    return f"{db_path}.staging"
+
+
+def prepare_staging(db_path):
+    """
+    Return the staging copy of db_path, copying the live file first if
+    no earlier run left one behind.
+    """
+    staging = staging_path(db_path)
+    if os.path.exists(staging):
+        print(f"🗃️  Continuing from the staging database {staging}")
+        return staging
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    if os.path.exists(db_path):
+        # Copied under another name so a crash never leaves a partial copy
+        shutil.copyfile(db_path, staging + ".tmp")
+        os.replace(staging + ".tmp", staging)
+        print(f"🗃️  Staging database copied from {db_path}")
+    return staging
+
+
+def publish_database(db_path):
+    """Checkpoint the staging copy and atomically replace db_path with it"""
+    staging = staging_path(db_path)
+    if not os.path.exists(staging):
+        print(f"⚠️  No staging database to publish for {db_path}")
+        return
+    # Folds the WAL into the file, so the single file is the whole database
+    with duckdb.connect(staging) as con:
+        con.execute("CHECKPOINT")
+    os.replace(staging, db_path)
+    print(f"✅ Published {staging} to {db_path}")
@@ -0,0 +1,130 @@
+"""
+DuckDB SQL versions of the preprocess and merge stages.
+
+They take and return Arrow tables registered on a DuckDB connection, so
+the in-process pipeline can go fetch -> preprocess -> enrich -> merge ->
+upload without writing and re-reading parquet between stages, and the
+transforms run multi-threaded inside DuckDB instead of in pandas.
+"""
+from datetime import datetime
+import os
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from scripts.pre_process_reddit_posts import (
+    DENYLIST_PATH, SYMBOL_UNIVERSE_PATH, TICKER_PATTERN, load_symbol_set)
+from scripts.merge_reddit_and_yfinance import FINAL_COLUMNS
+from scripts.get_ticker_info_from_yfinance import YFINANCE_SCHEMA
+from scripts.sentiment import add_scores
+
+
+def _symbol_table(symbols):
+    return pa.table({"symbol": pa.array(sorted(symbols or []), pa.string())})
+
+
+def preprocess_duckdb(con, posts: pa.Table, denylist_path=DENYLIST_PATH,
+                      universe_path=SYMBOL_UNIVERSE_PATH):
+    """SQL equivalent of preprocess(): one row per distinct ($TICKER, post)"""
+    print("<--------------------------Running 2 (duckdb) -------------------------->")
+    denylist = load_symbol_set(denylist_path)
+    universe = load_symbol_set(universe_path)
+
+    con.register("reddit_posts", posts)
+    con.register("ticker_denylist", _symbol_table(denylist))
+    con.register("symbol_universe", _symbol_table(universe))
+
+    universe_filter = ""
+    if universe is not None:
+        universe_filter = "AND tickers IN (SELECT symbol FROM symbol_universe)"
+
+    result = con.execute(f"""
+        WITH posts AS (
+            SELECT
+                id AS post_id,
+                score,
+                num_comments,
+                coalesce(title, '') || chr(10) || chr(10) || coalesce(body, '') AS content,
+                comments,
+                created_utc,
+                list_distinct(list_transform(
+                    regexp_extract_all(
+                        coalesce(title, '') || chr(10) || coalesce(body, ''), ?, 1),
+                    t -> upper(t)
+                )) AS ticker_list
+            FROM reddit_posts
+        ),
+        mentions AS (
+            SELECT * EXCLUDE (ticker_list), unnest(ticker_list) AS tickers
+            FROM posts
+        )
+        SELECT post_id, tickers, score, num_comments, content, comments, created_utc
+        FROM mentions
+        WHERE tickers NOT IN (SELECT symbol FROM ticker_denylist)
+        {universe_filter}
+    """, [TICKER_PATTERN]).fetch_arrow_table()
+
+    for name in ("reddit_posts", "ticker_denylist", "symbol_universe"):
+        con.unregister(name)
+
+    print(f"Preprocessed dataset ready for LLM: {result.num_rows} rows")
+    return result
+
+
+def merge_duckdb(con, processed: pa.Table, yfinance: pa.Table):
+    """SQL equivalent of merge_reddit_yfinance(): left join, stamp, sort, score"""
+    print("<--------------------------Running 4 (duckdb) -------------------------->")
+    con.register("processed_posts", processed)
+    con.register("yfinance_info", yfinance)
+    present = set(yfinance.column_names)
+
+    def typed(col):
+        # Enrich columns keep the enrich parquet's types even when a run
+        # left them all None (no ticker resolved, or no tickers at all)
+        sql_type = "DOUBLE" if pa.types.is_floating(
+            YFINANCE_SCHEMA.field(col).type) else "VARCHAR"
+        source = f"y.{col}" if col in present else "NULL"
+        return f"CAST({source} AS {sql_type})"
+
+    select = []
+    for col in FINAL_COLUMNS:
+        if col == "reddit_ticker":
+            select.append(f"upper(trim({typed(col)})) AS reddit_ticker")
+        elif col == "last_updated":
+            select.append("?::TIMESTAMP AS last_updated")
+        elif col in ("post_id", "score", "num_comments", "content",
+                     "comments", "created_utc"):
+            select.append(f"p.{col}")
+        else:
+            if col not in present:
+                print(f"⚠️  Column '{col}' not found, added with None values")
+            select.append(f"{typed(col)} AS {col}")
+
+    result = con.execute(f"""
+        SELECT {', '.join(select)}
+        FROM processed_posts AS p
+        LEFT JOIN yfinance_info AS y
+            ON upper(trim(p.tickers)) = upper(trim({typed("reddit_ticker")}))
+        ORDER BY p.created_utc DESC, p.score DESC
+    """, [datetime.now()]).fetch_arrow_table()
+
+    con.unregister("processed_posts")
+    con.unregister("yfinance_info")
+
+    result = add_scores(result)
+    print(f"🧩 Shape: ({result.num_rows}, {result.num_columns})")
+    return result
+
+
+def materialize(table: pa.Table, output_path):
+    """Optionally keep a stage's output as parquet for debugging"""
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        pq.write_table(table, output_path)
+        print(f"💾 Materialized {table.num_rows} rows to {output_path}")
+
+
+def connect_engine():
+    """In-memory DuckDB connection used for the transforms"""
+    return duckdb.connect()
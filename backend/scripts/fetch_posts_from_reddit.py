@@ -1,9 +1,18 @@
 import praw
 import os
-import pandas as pd
+import threading
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+from datetime import datetime
 from dotenv import load_dotenv
 from tqdm import tqdm
 
+from scripts import metrics
+from scripts.rate_limit import TokenBucket
+
 # Load API keys from .env
 load_dotenv()
 
@@ -11,40 +20,211 @@ REDDIT_CLIENT_ID = os.getenv("REDDIT_CLIENT_ID")
 REDDIT_CLIENT_SECRET = os.getenv("REDDIT_CLIENT_SECRET")
 REDDIT_USER_AGENT = "pennyai:v0.1 (by u/Effective-Task347)"
 
+# Reddit's OAuth API allows 100 requests per minute per client
+REDDIT_REQUESTS_PER_MINUTE = int(os.environ.get("REDDIT_REQUESTS_PER_MINUTE", 100))
+
+REDDIT_REQUESTS = metrics.counter(
+    "pennyai_reddit_requests_total", "Reddit API requests by kind")
+POSTS_FETCHED = metrics.counter(
+    "pennyai_reddit_posts_fetched_total", "New Reddit posts listed per subreddit")
+
+POST_SCHEMA = pa.schema([
+    ("subreddit", pa.string()),
+    ("id", pa.string()),
+    ("title", pa.string()),
+    ("body", pa.string()),
+    ("author", pa.string()),
+    ("score", pa.int64()),
+    ("num_comments", pa.int64()),
+    ("comments", pa.list_(pa.string())),
+    ("created_utc", pa.float64()),
+    ("url", pa.string()),
+])
+
+
+INGEST_STATE_SQL = """
+CREATE TABLE IF NOT EXISTS ingest_state (
+    subreddit TEXT PRIMARY KEY,
+    last_created_utc DOUBLE,
+    last_post_id TEXT,
+    updated_at TIMESTAMP
+);
+
+-- Marks of the last fetch, promoted to ingest_state once its posts are stored
+CREATE TABLE IF NOT EXISTS ingest_state_pending (
+    subreddit TEXT PRIMARY KEY,
+    last_created_utc DOUBLE,
+    last_post_id TEXT,
+    updated_at TIMESTAMP
+);
+"""
+
+
+def load_high_water_marks(con):
+    """Newest (created_utc, post id) already stored, per subreddit"""
+    con.execute(INGEST_STATE_SQL)
+    rows = con.execute("""
+        SELECT subreddit, last_created_utc, last_post_id FROM ingest_state
+    """).fetchall()
+    return {sub: (created, post_id) for sub, created, post_id in rows}
+
+
+def save_high_water_marks(con, newest):
+    """
+    Record {subreddit: (created_utc, post id)} for the newest fetched
+    posts as pending. They only become the marks the next fetch starts
+    from once upload_to_db has stored the posts (commit_high_water_marks),
+    so a run failing in between fetches the same posts again.
+    """
+    con.execute("DELETE FROM ingest_state_pending")
+    for sub_name, (created_utc, post_id) in newest.items():
+        con.execute("""
+            INSERT INTO ingest_state_pending VALUES (?, ?, ?, ?)
+        """, [sub_name, created_utc, post_id, datetime.now()])
+
+
+def commit_high_water_marks(con):
+    """Promote the pending marks; call in the transaction storing the posts"""
+    con.execute(INGEST_STATE_SQL)
+    con.execute("""
+        INSERT OR REPLACE INTO ingest_state SELECT * FROM ingest_state_pending;
+        DELETE FROM ingest_state_pending;
+    """)
+
+
+_thread_local = threading.local()
+
+
+def _thread_reddit():
+    """praw is not thread-safe, so each worker thread gets its own client"""
+    reddit = getattr(_thread_local, "reddit", None)
+    if reddit is None:
+        reddit = praw.Reddit(
+            client_id=REDDIT_CLIENT_ID,
+            client_secret=REDDIT_CLIENT_SECRET,
+            user_agent=REDDIT_USER_AGENT
+        )
+        _thread_local.reddit = reddit
+    return reddit
 
-def fetch_reddit_posts(output_path, limit_per_sub=100, subreddit_list=None, top_n=100):
+
+def _list_new_posts(sub_name, limit_per_sub, high_water_mark, rate_limiter):
+    """Page through subreddit.new, returning post fields without comments"""
+    last_created, last_id = high_water_mark
+    posts = []
+    for i, post in enumerate(_thread_reddit().subreddit(sub_name).new(limit=limit_per_sub)):
+        # One listing request returns up to 100 posts
+        if i % 100 == 0:
+            rate_limiter.acquire()
+            REDDIT_REQUESTS.inc(kind="listing")
+        # subreddit.new is newest first: stop once we reach seen posts
+        if last_created is not None and (
+                post.id == last_id or post.created_utc < last_created):
+            break
+        posts.append({
+            "subreddit": sub_name,
+            "id": post.id,
+            "title": post.title,
+            "body": post.selftext,
+            "author": str(post.author),
+            "score": post.score,
+            "num_comments": post.num_comments,
+            "created_utc": post.created_utc,
+            "url": post.url
+        })
+    return posts
+
+
+def _load_comments(post, top_n, rate_limiter):
+    """Fetch one post's comment tree and attach its n highest-scored comments"""
+    rate_limiter.acquire()
+    REDDIT_REQUESTS.inc(kind="comments")
+    submission = _thread_reddit().submission(id=post["id"])
+    submission.comments.replace_more(limit=0)
+    # Top n comments by score, stored highest first (ties keep Reddit's order)
+    ranked = sorted(submission.comments, key=lambda c: c.score or 0, reverse=True)
+    post["comments"] = [c.body for c in ranked[:top_n]]
+    return post
+
+
+def fetch_reddit_posts(output_path, limit_per_sub=100, subreddit_list=None, top_n=100,
+                       db_path=None, incremental=False, max_workers=8,
+                       requests_per_minute=REDDIT_REQUESTS_PER_MINUTE, batch_size=100):
+    """
+    Fetch the newest posts (with top comments) from each subreddit.
+
+    Subreddit listings and per-post comment trees are loaded concurrently on
+    a pool of `max_workers` threads sharing one requests-per-minute budget,
+    and posts are written to the parquet file in batches as they complete.
+    The posts are also returned as an Arrow table; pass output_path=None to
+    skip writing parquet (in-process engine).
+
+    With incremental=True, paging through subreddit.new stops at the first
+    post at or before the subreddit's high-water mark stored in `db_path`,
+    so only posts not stored by an earlier run are fetched. The marks
+    advance when upload_to_db commits, not here.
+    """
     print("<--------------------------Running 1 -------------------------->")
     if subreddit_list is None:
         subreddit_list = ["pennystocks"]  # default single subreddit
 
-    reddit = praw.Reddit(
-        client_id=REDDIT_CLIENT_ID,
-        client_secret=REDDIT_CLIENT_SECRET,
-        user_agent=REDDIT_USER_AGENT
-    )
-
-    all_posts = []
-
-    for sub_name in subreddit_list:
-        subreddit = reddit.subreddit(sub_name)
-        print(f"\nFetching from r/{sub_name}...")
-        for post in tqdm(subreddit.new(limit=limit_per_sub), desc=f"r/{sub_name} posts"):
-            post.comments.replace_more(limit=0)
-            # Top n comments
-            comments = [c.body for c in post.comments[:top_n]]
-
-            all_posts.append({
-                "subreddit": sub_name,
-                "id": post.id,
-                "title": post.title,
-                "body": post.selftext,
-                "author": str(post.author),
-                "score": post.score,
-                "num_comments": post.num_comments,
-                "comments": comments,
-                "created_utc": post.created_utc,
-                "url": post.url
-            })
-    all_posts = pd.DataFrame(all_posts)
-    all_posts.to_parquet(
-        output_path, engine="pyarrow", index=False)
+    con = None
+    high_water_marks = {}
+    if incremental:
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        con = duckdb.connect(db_path)
+        high_water_marks = load_high_water_marks(con)
+
+    rate_limiter = TokenBucket(requests_per_minute)
+    writer = pq.ParquetWriter(output_path, POST_SCHEMA) if output_path else None
+    batch = []
+    record_batches = []
+    total = 0
+    newest = {}
+
+    def flush():
+        nonlocal batch
+        if batch:
+            record_batch = pa.RecordBatch.from_pylist(batch, schema=POST_SCHEMA)
+            record_batches.append(record_batch)
+            if writer is not None:
+                writer.write_batch(record_batch)
+            batch = []
+
+    with writer or nullcontext(), ThreadPoolExecutor(max_workers=max_workers) as pool:
+        listings = {
+            pool.submit(_list_new_posts, sub_name, limit_per_sub,
+                        high_water_marks.get(sub_name, (None, None)),
+                        rate_limiter): sub_name
+            for sub_name in subreddit_list
+        }
+
+        comment_jobs = []
+        for future in as_completed(listings):
+            sub_name = listings[future]
+            posts = future.result()
+            print(f"Listed {len(posts)} posts from r/{sub_name}")
+            POSTS_FETCHED.inc(len(posts), subreddit=sub_name)
+            if posts:
+                top = max(posts, key=lambda p: p["created_utc"])
+                newest[sub_name] = (top["created_utc"], top["id"])
+            comment_jobs += [pool.submit(_load_comments, post, top_n, rate_limiter)
+                             for post in posts]
+
+        for future in tqdm(as_completed(comment_jobs), total=len(comment_jobs),
+                           desc="Loading comments"):
+            batch.append(future.result())
+            total += 1
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+    if writer is not None:
+        print(f"✅ Saved {total} posts to {output_path}")
+
+    if con is not None:
+        save_high_water_marks(con, newest)
+        con.close()
+        print(f"✅ {total} new posts since last run")
+
+    return pa.Table.from_batches(record_batches, schema=POST_SCHEMA)
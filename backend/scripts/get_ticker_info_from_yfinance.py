@@ -1,66 +1,426 @@
 import pandas as pd
+import pyarrow as pa
 import yfinance as yf
+import duckdb
 import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from tqdm import tqdm
+from yfinance.exceptions import YFTickerMissingError
 
+from scripts import metrics
 
-def enrich_tickers_with_yfinance(input_path, output_path):
+TICKER_COLUMNS = [
+    "reddit_ticker", "yfinance_symbol", "long_name", "short_name", "sector",
+    "industry", "market_cap", "employees", "founded", "country", "currency",
+    "current_price", "previous_close", "open", "day_high", "day_low",
+    "volume", "website", "about", "error",
+]
+
+# Column types of the enrich stage's parquet. Arrow tables built from the
+# result use them too: a run where no ticker resolved (or with no tickers)
+# would otherwise get all-None columns typed null/int32/double at random.
+YFINANCE_SCHEMA = pa.schema([
+    (col, pa.float64() if col in (
+        "market_cap", "employees", "founded", "current_price",
+        "previous_close", "open", "day_high", "day_low", "volume",
+    ) else pa.string())
+    for col in TICKER_COLUMNS
+])
+
+SUFFIXES = ["", ".CN", ".V", ".TO", ".AX", ".L",
+            ".NS", ".BO", ".SA", ".HK", ".NE", ".F"]
+
+# How long resolved symbols and "not found" tickers are trusted
+POSITIVE_TTL = timedelta(days=30)
+NEGATIVE_TTL = timedelta(days=7)
+
+# Company profiles (name, sector, summary, share count, ...) rarely change
+PROFILE_TTL = timedelta(days=7)
+
+# Market cap is not cached with the profile: it is priced off each run's
+# quote from the cached share count (see with_market_cap)
+PROFILE_FIELDS = [
+    "yfinance_symbol", "long_name", "short_name", "sector", "industry",
+    "shares_outstanding", "employees", "founded", "country", "currency",
+    "website", "about",
+]
+
+YFINANCE_CALLS = metrics.counter(
+    "pennyai_yfinance_calls_total", "Yahoo Finance requests by endpoint")
+SUFFIX_MISSES = metrics.counter(
+    "pennyai_yfinance_suffix_misses_total",
+    "Ticker.info lookups on an exchange suffix that did not match")
+TICKER_CACHE = metrics.counter(
+    "pennyai_cache_lookups_total", "Cache lookups by cache and result")
+
+
+class LookupFailed(Exception):
+    """Yahoo Finance errored, so whether the ticker exists is unknown"""
+
+
+def resolve_symbol(ticker):
+    """
+    Try each exchange suffix until yfinance knows the symbol. Returns
+    (None, None) only when every suffix answered "not found"; if nothing
+    matched and some lookup errored (rate limit, network), raises
+    LookupFailed so the ticker is not cached as unknown.
+    """
+    error = None
+    for suffix in SUFFIXES:
+        symbol = f"{ticker}{suffix}"
+        YFINANCE_CALLS.inc(endpoint="info")
+        try:
+            info = yf.Ticker(symbol).info
+        except YFTickerMissingError:
+            info = None
+        except Exception as exc:
+            error = exc
+            continue
+        if info and "longName" in info:
+            return symbol, info
+        SUFFIX_MISSES.inc()
+    if error is not None:
+        raise LookupFailed(ticker) from error
+    return None, None
+
+
+def fetch_info(symbol):
+    YFINANCE_CALLS.inc(endpoint="info")
+    try:
+        info = yf.Ticker(symbol).info
+        if info and "longName" in info:
+            return info
+    except Exception:
+        pass
+    return None
+
+
+class ResolutionCache:
+    """
+    reddit ticker -> yfinance symbol map persisted in DuckDB, including
+    negative entries for tickers no exchange suffix matched. Entries past
+    their expiry are still served, and re-resolved on a background pool
+    while the stage runs. A re-resolution that errors keeps the old entry.
+    """
+
+    TABLE_NAME = "ticker_resolution"
+
+    def __init__(self, con, max_workers=4):
+        self.con = con
+        self._refresh_pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._refreshes = {}
+
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                reddit_ticker TEXT PRIMARY KEY,
+                yfinance_symbol TEXT,
+                found BOOLEAN,
+                resolved_at TIMESTAMP,
+                expires_at TIMESTAMP
+            );
+        """)
+        self.entries = {
+            ticker: (symbol, found, expires_at)
+            for ticker, symbol, found, expires_at in con.execute(f"""
+                SELECT reddit_ticker, yfinance_symbol, found, expires_at
+                FROM {self.TABLE_NAME}
+            """).fetchall()
+        }
+
+    def lookup(self, ticker):
+        """Return (known, symbol) and schedule a refresh if the entry expired"""
+        entry = self.entries.get(ticker)
+        if entry is None:
+            return False, None
+        symbol, found, expires_at = entry
+        if expires_at < datetime.now() and ticker not in self._refreshes:
+            self._refreshes[ticker] = self._refresh_pool.submit(
+                resolve_symbol, ticker)
+        return True, symbol if found else None
+
+    def store(self, ticker, symbol):
+        now = datetime.now()
+        ttl = POSITIVE_TTL if symbol else NEGATIVE_TTL
+        self.entries[ticker] = (symbol, symbol is not None, now + ttl)
+        self.con.execute(f"""
+            INSERT OR REPLACE INTO {self.TABLE_NAME} VALUES (?, ?, ?, ?, ?)
+        """, [ticker, symbol, symbol is not None, now, now + ttl])
+
+    def finish(self):
+        """Wait for background refreshes and persist their results"""
+        self._refresh_pool.shutdown(wait=True)
+        refreshed = 0
+        for ticker, future in self._refreshes.items():
+            try:
+                symbol, _ = future.result()
+            except LookupFailed:
+                # Still expired, so it is retried on the next run
+                continue
+            self.store(ticker, symbol)
+            refreshed += 1
+        self._refreshes = {}
+        return refreshed
+
+
+class ProfileStore:
+    """
+    Slow-changing company profile fields per yfinance symbol, persisted in
+    DuckDB and refreshed from Ticker.info only once older than PROFILE_TTL.
+    """
+
+    TABLE_NAME = "company_profiles"
+
+    def __init__(self, con):
+        self.con = con
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                yfinance_symbol TEXT PRIMARY KEY,
+                long_name TEXT,
+                short_name TEXT,
+                sector TEXT,
+                industry TEXT,
+                shares_outstanding BIGINT,
+                employees BIGINT,
+                founded INTEGER,
+                country TEXT,
+                currency TEXT,
+                website TEXT,
+                about TEXT,
+                fetched_at TIMESTAMP
+            );
+        """)
+        columns = {row[0] for row in con.execute(
+            f"SELECT column_name FROM information_schema.columns "
+            f"WHERE table_name = '{self.TABLE_NAME}'").fetchall()}
+        if "shares_outstanding" not in columns:
+            # Profiles cached with a (stale) market cap instead of the share
+            # count: mark them expired so they are refetched
+            con.execute(f"ALTER TABLE {self.TABLE_NAME} DROP COLUMN IF EXISTS market_cap")
+            con.execute(f"ALTER TABLE {self.TABLE_NAME} ADD COLUMN shares_outstanding BIGINT")
+            con.execute(f"UPDATE {self.TABLE_NAME} SET fetched_at = NULL")
+
+    def fresh(self, symbols):
+        """Return {symbol: profile dict} for symbols fetched within PROFILE_TTL"""
+        if not symbols:
+            return {}
+        result = self.con.execute(f"""
+            SELECT {", ".join(PROFILE_FIELDS)} FROM {self.TABLE_NAME}
+            WHERE yfinance_symbol IN (SELECT unnest(?)) AND fetched_at >= ?
+        """, [list(symbols), datetime.now() - PROFILE_TTL])
+        names = [d[0] for d in result.description]
+        return {row[0]: dict(zip(names, row)) for row in result.fetchall()}
+
+    def store(self, symbol, info):
+        profile = profile_from_info(symbol, info)
+        self.con.execute(f"""
+            INSERT OR REPLACE INTO {self.TABLE_NAME}
+                ({", ".join(PROFILE_FIELDS)}, fetched_at)
+            VALUES ({", ".join("?" * (len(PROFILE_FIELDS) + 1))})
+        """, [profile[c] for c in PROFILE_FIELDS] + [datetime.now()])
+        return profile
+
+
+def profile_from_info(symbol, info):
+    return {
+        "yfinance_symbol": symbol,
+        "long_name": info.get("longName"),
+        "short_name": info.get("shortName"),
+        "sector": info.get("sector"),
+        "industry": info.get("industry"),
+        "shares_outstanding": info.get("sharesOutstanding"),
+        "employees": info.get("fullTimeEmployees"),
+        "founded": info.get("founded"),
+        "country": info.get("country"),
+        "currency": info.get("currency"),
+        "website": info.get("website"),
+        "about": info.get("longBusinessSummary"),
+    }
+
+
+def quote_from_info(info):
+    return {
+        "market_cap": info.get("marketCap"),
+        "current_price": info.get("currentPrice"),
+        "previous_close": info.get("previousClose"),
+        "open": info.get("open"),
+        "day_high": info.get("dayHigh"),
+        "day_low": info.get("dayLow"),
+        "volume": info.get("volume"),
+    }
+
+
+def refresh_quotes(symbols, max_workers=8):
+    """
+    Latest daily quote for every symbol from one batched yf.download call
+    (fetched on max_workers threads). Returns {symbol: quote dict}; symbols
+    with no recent bars are left out. Cheap enough to run intraday.
+    """
+    symbols = sorted(set(symbols))
+    if not symbols:
+        return {}
+
+    YFINANCE_CALLS.inc(endpoint="download")
+    bars = yf.download(symbols, period="5d", interval="1d", group_by="ticker",
+                       auto_adjust=False, threads=max_workers, progress=False)
+    if bars is None or bars.empty:
+        return {}
+
+    quotes = {}
+    for symbol in symbols:
+        if symbol not in bars.columns.get_level_values(0):
+            continue
+        history = bars[symbol].dropna(subset=["Close"])
+        if history.empty:
+            continue
+        last = history.iloc[-1]
+        previous = history.iloc[-2] if len(history) > 1 else None
+        quotes[symbol] = {
+            "current_price": float(last["Close"]),
+            "previous_close": float(previous["Close"]) if previous is not None else None,
+            "open": float(last["Open"]),
+            "day_high": float(last["High"]),
+            "day_low": float(last["Low"]),
+            "volume": int(last["Volume"]) if pd.notna(last["Volume"]) else None,
+        }
+    return quotes
+
+
+def with_market_cap(quote, profile):
+    """
+    Quote plus its market cap at the quoted price. The share count comes
+    from the weekly profile, since it moves far less than the price;
+    without one, a quote from .info keeps the market cap it came with.
+    """
+    quote = dict(quote or {})
+    price = quote.get("current_price")
+    shares = profile.get("shares_outstanding")
+    if price is not None and shares:
+        quote["market_cap"] = int(round(price * shares))
+    return quote
+
+
+def yfinance_table(df):
+    """Enrich stage output as an Arrow table with YFINANCE_SCHEMA types"""
+    return pa.Table.from_pandas(df[TICKER_COLUMNS], schema=YFINANCE_SCHEMA,
+                                preserve_index=False)
+
+
+def enrich_tickers_with_yfinance(input_path, output_path, db_path=None, max_workers=8):
+    """
+    Look up company profile and quote info for every ticker in input_path
+    (a parquet path or an Arrow table with a `tickers` column). The result
+    is returned, and also written to output_path when one is given.
+
+    Profiles (name, sector, summary, share count, ...) come from the heavy
+    Ticker.info endpoint and are only refetched weekly; quotes for all
+    resolved symbols come from one bulk download each run, and market cap
+    is priced off that quote. With db_path, ticker resolutions
+    and profiles persist across runs, so known symbols need no .info call
+    and known non-tickers none at all.
+    """
     print("<--------------------------Running 3 -------------------------->")
-    df = pd.read_parquet(input_path)
+    if isinstance(input_path, pa.Table):
+        df = input_path.select(['tickers']).to_pandas()
+    else:
+        df = pd.read_parquet(input_path)
     tickers = df['tickers'].dropna().unique().tolist()
     print(f"Found {len(tickers)} unique tickers.")
 
-    suffixes = ["", ".CN", ".V", ".TO", ".AX", ".L",
-                ".NS", ".BO", ".SA", ".HK", ".NE", ".F"]
+    # Without a database the caches still work, just for this run only
+    con = duckdb.connect(db_path) if db_path else duckdb.connect()
+    cache = ResolutionCache(con)
+    profiles = ProfileStore(con)
 
-    all_data = []
+    symbols = {}
+    to_resolve = []
+    for ticker in tickers:
+        known, cached_symbol = cache.lookup(ticker)
+        if cached_symbol:
+            symbols[ticker] = cached_symbol
+        elif not known:
+            to_resolve.append(ticker)
+
+    fresh_profiles = profiles.fresh(symbols.values())
+    stale = [t for t, sym in symbols.items() if sym not in fresh_profiles]
+    TICKER_CACHE.inc(len(tickers) - len(to_resolve), cache="ticker_resolution", result="hit")
+    TICKER_CACHE.inc(len(to_resolve), cache="ticker_resolution", result="miss")
+    TICKER_CACHE.inc(len(fresh_profiles), cache="company_profile", result="hit")
+    TICKER_CACHE.inc(len(set(symbols.values())) - len(fresh_profiles),
+                     cache="company_profile", result="miss")
+    print(f"🗃️  {len(tickers) - len(to_resolve)}/{len(tickers)} tickers resolved from cache, "
+          f"{len(fresh_profiles)} fresh profiles, {len(stale)} to refresh")
 
-    for ticker in tqdm(tickers, desc="Fetching ticker info from yfinance"):
-        info = None
-        final_symbol = None
-        for suffix in suffixes:
-            symbol = f"{ticker}{suffix}"
+    info_by_symbol = {}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        # Refresh stale profiles; symbols that stopped resolving are re-resolved
+        stale_infos = pool.map(fetch_info, [symbols[t] for t in stale])
+        for ticker, info in zip(stale, stale_infos):
+            if info is None:
+                del symbols[ticker]
+                to_resolve.append(ticker)
+            else:
+                info_by_symbol[symbols[ticker]] = info
+
+        resolved = [pool.submit(resolve_symbol, t) for t in to_resolve]
+        for ticker, future in tqdm(zip(to_resolve, resolved), total=len(to_resolve),
+                                   desc="Resolving new tickers"):
             try:
-                stock = yf.Ticker(symbol)
-                info = stock.info
-                if info and "longName" in info:
-                    final_symbol = symbol
-                    break
-            except Exception:
+                symbol, info = future.result()
+            except LookupFailed:
+                # Not cached either way; resolved again on the next run
+                failed.add(ticker)
                 continue
+            cache.store(ticker, symbol)
+            if symbol:
+                symbols[ticker] = symbol
+                info_by_symbol[symbol] = info
+
+    for symbol, info in info_by_symbol.items():
+        fresh_profiles[symbol] = profiles.store(symbol, info)
+
+    quotes = refresh_quotes(symbols.values(), max_workers=max_workers)
+    print(f"📈 Bulk quotes for {len(quotes)}/{len(set(symbols.values()))} symbols")
+
+    # Symbols the bulk download skipped fall back to their .info quote
+    missing = sorted({sym for sym in symbols.values()
+                      if sym not in quotes and sym not in info_by_symbol})
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for symbol, info in zip(missing, pool.map(fetch_info, missing)):
+            if info:
+                info_by_symbol[symbol] = info
+
+    all_data = []
 
-        if info and final_symbol:
+    for ticker in tickers:
+        symbol = symbols.get(ticker)
+        if symbol and symbol in fresh_profiles:
+            quote = quotes.get(symbol)
+            if quote is None and symbol in info_by_symbol:
+                quote = quote_from_info(info_by_symbol[symbol])
             all_data.append({
                 "reddit_ticker": ticker,
-                "yfinance_symbol": final_symbol,
-                "long_name": info.get("longName"),
-                "short_name": info.get("shortName"),
-                "sector": info.get("sector"),
-                "industry": info.get("industry"),
-                "market_cap": info.get("marketCap"),
-                "employees": info.get("fullTimeEmployees"),
-                "founded": info.get("founded"),
-                "country": info.get("country"),
-                "currency": info.get("currency"),
-                "current_price": info.get("currentPrice"),
-                "previous_close": info.get("previousClose"),
-                "open": info.get("open"),
-                "day_high": info.get("dayHigh"),
-                "day_low": info.get("dayLow"),
-                "volume": info.get("volume"),
-                "website": info.get("website"),
-                "about": info.get("longBusinessSummary"),
+                **fresh_profiles[symbol],
+                **with_market_cap(quote, fresh_profiles[symbol]),
             })
         else:
             all_data.append({
                 "reddit_ticker": ticker,
                 "yfinance_symbol": None,
-                "error": "Not found"
+                "error": "Lookup failed" if ticker in failed else "Not found"
             })
 
-    df_tickers = pd.DataFrame(all_data)
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-    df_tickers.to_parquet(output_path, engine="pyarrow", index=False)
+    refreshed = cache.finish()
+    con.close()
+    print(f"🗃️  Refreshed {refreshed} expired ticker resolutions")
+    if failed:
+        print(f"⚠️  {len(failed)} tickers could not be looked up, retrying next run")
 
-    print(
-        f"✅ Enriched ticker info saved to {output_path} ({len(df_tickers)} tickers total)")
+    df_tickers = pd.DataFrame(all_data, columns=TICKER_COLUMNS)
+    if output_path:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        df_tickers.to_parquet(output_path, engine="pyarrow", index=False)
+        print(
+            f"✅ Enriched ticker info saved to {output_path} ({len(df_tickers)} tickers total)")
+    return df_tickers
@@ -0,0 +1,123 @@
+import asyncio
+import random
+import time
+
+from scripts import metrics
+from scripts.rate_limit import TokenBucket
+
+# HTTP statuses worth retrying: rate limits, timeouts and server errors
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+LLM_CALLS = metrics.counter(
+    "pennyai_llm_calls_total", "LLM requests by outcome (ok, retryable, error)")
+LLM_RETRIES = metrics.counter("pennyai_llm_retries_total", "LLM requests retried")
+LLM_TOKENS = metrics.counter(
+    "pennyai_llm_tokens_total", "Estimated LLM tokens sent, prompt plus output budget")
+LLM_LATENCY = metrics.histogram(
+    "pennyai_llm_request_seconds", "LLM request latency per attempt")
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) for rate budgeting"""
+    return max(1, len(text) // 4)
+
+
+def _status_code(exc):
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status
+
+
+def is_retryable(exc):
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    if _status_code(exc) in RETRYABLE_STATUS:
+        return True
+    message = str(exc).lower()
+    return "rate limit" in message or "429" in message
+
+
+def _retry_after(exc):
+    """Seconds from a Retry-After header on the provider's response, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ChainExecutor:
+    """
+    Runs a LangChain runnable over many inputs concurrently.
+
+    Concurrency is capped by a semaphore, requests and tokens per minute by
+    token buckets, and each call gets a timeout plus exponential backoff
+    with jitter on 429s and transient errors. Results come back in input
+    order; a row that still fails after all retries yields its exception.
+    """
+
+    def __init__(self, chain, max_concurrency=4, requests_per_minute=30,
+                 tokens_per_minute=6000, max_retries=5, timeout=60.0,
+                 base_delay=1.0, max_delay=60.0, output_tokens=300):
+        self.chain = chain
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.output_tokens = output_tokens
+
+    def _backoff(self, attempt, exc):
+        delay = _retry_after(exc)
+        if delay is None:
+            delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+            delay *= 0.5 + random.random()
+        return delay
+
+    async def _run_one(self, inputs, semaphore):
+        tokens = sum(estimate_tokens(str(v)) for v in inputs.values())
+        tokens += self.output_tokens
+
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self.request_bucket.acquire_async()
+                await self.token_bucket.acquire_async(tokens)
+                LLM_TOKENS.inc(tokens)
+                started = time.perf_counter()
+                try:
+                    result = await asyncio.wait_for(
+                        self.chain.ainvoke(inputs), timeout=self.timeout)
+                except Exception as e:
+                    LLM_LATENCY.observe(time.perf_counter() - started)
+                    if attempt == self.max_retries or not is_retryable(e):
+                        LLM_CALLS.inc(outcome="error")
+                        raise
+                    LLM_CALLS.inc(outcome="retryable")
+                    LLM_RETRIES.inc()
+                    await asyncio.sleep(self._backoff(attempt, e))
+                else:
+                    LLM_LATENCY.observe(time.perf_counter() - started)
+                    LLM_CALLS.inc(outcome="ok")
+                    return result
+
+    async def arun(self, inputs_list, on_result=None):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(index, inputs):
+            try:
+                result = await self._run_one(inputs, semaphore)
+            except Exception as e:
+                result = e
+            if on_result is not None:
+                on_result(index, result)
+            return result
+
+        return await asyncio.gather(
+            *(run(i, inputs) for i, inputs in enumerate(inputs_list)))
+
+    def run(self, inputs_list, on_result=None):
+        """Blocking wrapper around arun for the synchronous pipeline"""
+        return asyncio.run(self.arun(inputs_list, on_result))
@@ -2,6 +2,41 @@ import pandas as pd
 from datetime import datetime
 import os
 
+from scripts.sentiment import score_posts
+
+FINAL_COLUMNS = [
+    "post_id",
+    "reddit_ticker",
+    "yfinance_symbol",
+    "long_name",
+    "short_name",
+    "sector",
+    "industry",
+    "market_cap",
+    "employees",
+    "founded",
+    "country",
+    "currency",
+    "current_price",
+    "previous_close",
+    "open",
+    "day_high",
+    "day_low",
+    "volume",
+    "website",
+    "about",
+    "score",
+    "num_comments",
+    "content",
+    "comments",
+    "created_utc",
+    "error",
+    "last_updated"
+]
+
+# Appended by the merge (see scripts/sentiment.py)
+SCORE_COLUMNS = ["sentiment_score", "relevance_score"]
+
 
 def merge_reddit_yfinance(
     reddit_path: str,
@@ -31,34 +66,7 @@ def merge_reddit_yfinance(
 
     merged_df["last_updated"] = datetime.now()
 
-    final_cols = [
-        "reddit_ticker",
-        "yfinance_symbol",
-        "long_name",
-        "short_name",
-        "sector",
-        "industry",
-        "market_cap",
-        "employees",
-        "founded",
-        "country",
-        "currency",
-        "current_price",
-        "previous_close",
-        "open",
-        "day_high",
-        "day_low",
-        "volume",
-        "website",
-        "about",
-        "score",
-        "num_comments",
-        "content",
-        "comments",
-        "created_utc",
-        "error",
-        "last_updated"
-    ]
+    final_cols = FINAL_COLUMNS
 
     for col in final_cols:
         if col not in merged_df.columns:
@@ -71,6 +79,10 @@ def merge_reddit_yfinance(
         ascending=[False, False]
     ).reset_index(drop=True)
 
+    final_df["sentiment_score"], final_df["relevance_score"] = score_posts(
+        final_df["content"], final_df["comments"], final_df["score"],
+        final_df["num_comments"])
+
     final_df.to_parquet(output_path, engine="pyarrow", index=False)
 
     print(f"✅ Merged dataset saved to: {output_path}")
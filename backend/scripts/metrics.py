@@ -0,0 +1,255 @@
+"""
+Minimal Prometheus-style metrics: labelled counters, gauges and
+histograms in a thread-safe registry, rendered in the Prometheus text
+exposition format (for /metrics) or as a JSON snapshot (for pipeline run
+reports). Pipeline stages also record spans: one timed, attributed
+record per stage.
+
+Scripts count into the module-level REGISTRY; the API server keeps its
+own Registry instance.
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Seconds; covers sub-millisecond cached responses up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')
+                         .replace("\n", "\\n"))
+        for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, lock):
+        self.name = name
+        self.documentation = documentation
+        self._lock = lock
+        self._values = {}
+
+    def samples(self):
+        """[(sample name, label key, extra labels, value)] for exposition"""
+        with self._lock:
+            return [(self.name, key, (), value)
+                    for key, value in sorted(self._values.items())]
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "value": value}
+                    for key, value in sorted(self._values.items())]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(_label_key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, lock, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, lock)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {
+                    "counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, state["counts"]):
+                    cumulative += count
+                    out.append((self.name + "_bucket", key,
+                                (("le", _format_value(bound)),), cumulative))
+                out.append((self.name + "_sum", key, (), state["sum"]))
+                out.append((self.name + "_count", key, (), state["count"]))
+        return out
+
+    def snapshot(self):
+        with self._lock:
+            return [{"labels": dict(key), "count": s["count"],
+                     "sum": round(s["sum"], 6)}
+                    for key, s in sorted(self._values.items())]
+
+
+class Registry:
+    """Named metrics plus the spans recorded during a run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.spans = []
+
+    def _get(self, cls, name, documentation, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(
+                    name, documentation, threading.Lock(), **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, documentation=""):
+        return self._get(Counter, name, documentation)
+
+    def gauge(self, name, documentation=""):
+        return self._get(Gauge, name, documentation)
+
+    def histogram(self, name, documentation="", buckets=DEFAULT_BUCKETS):
+        return self._get(Histogram, name, documentation, buckets=buckets)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Time a block as a span and observe it in pennyai_stage_duration_seconds.
+        The yielded dict can be updated with attributes (e.g. row counts).
+        """
+        record = {"name": name, "started_at": datetime.now(timezone.utc).isoformat(),
+                  "attributes": dict(attributes)}
+        started = time.perf_counter()
+        try:
+            yield record["attributes"]
+            record["status"] = "ok"
+        except BaseException:
+            record["status"] = "error"
+            raise
+        finally:
+            record["duration_s"] = round(time.perf_counter() - started, 6)
+            with self._lock:
+                self.spans.append(record)
+            self.histogram(
+                "pennyai_stage_duration_seconds", "Pipeline stage wall time",
+            ).observe(record["duration_s"], stage=name, status=record["status"])
+
+    def render(self):
+        """Prometheus text exposition format"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        lines = []
+        for metric in metrics:
+            if metric.documentation:
+                lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{_format_labels(key, extra)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+            spans = list(self.spans)
+        return {
+            "metrics": {m.name: {"type": m.kind, "samples": m.snapshot()}
+                        for m in metrics},
+            "spans": spans,
+        }
+
+    def merge(self, snapshot):
+        """Add counters and spans from another process's snapshot"""
+        for name, metric in snapshot.get("metrics", {}).items():
+            if metric["type"] != "counter":
+                continue
+            counter = self.counter(name)
+            for sample in metric["samples"]:
+                counter.inc(sample["value"], **sample["labels"])
+        with self._lock:
+            self.spans.extend(snapshot.get("spans", []))
+
+    def reset(self):
+        """Zero every metric and drop recorded spans (metrics stay registered)"""
+        with self._lock:
+            for metric in self._metrics.values():
+                with metric._lock:
+                    metric._values.clear()
+            self.spans = []
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+histogram = REGISTRY.histogram
+span = REGISTRY.span
+
+
+def write_run_report(path, registry=REGISTRY, **extra):
+    """Write the registry snapshot plus run metadata as a JSON run report"""
+    report = {"generated_at": datetime.now(timezone.utc).isoformat(), **extra,
+              **registry.snapshot()}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2, default=str)
+    return report
+
+
+def push_to_gateway(url, job, registry=REGISTRY, timeout=10):
+    """PUT the registry to a Pushgateway-compatible endpoint under /metrics/job/<job>"""
+    request = urllib.request.Request(
+        f"{url.rstrip('/')}/metrics/job/{job}",
+        data=registry.render().encode(),
+        method="PUT",
+        headers={"Content-Type": "text/plain; version=0.0.4"},
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return response.status
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from scripts import metrics
+
+STAGE_RUNS = metrics.counter(
+    "pennyai_pipeline_stages_total", "Pipeline stages by outcome (ran, skipped, resumed, failed)")
+
+
+@dataclass
+class Stage:
+    """
+    One pipeline step. `inputs` are file paths (fingerprinted by content
+    hash) or callables returning a JSON-serializable value (e.g. a table row
+    count); `outputs` are the files the stage writes. Sources such as the
+    Reddit fetch set always_run since their input is the outside world.
+    """
+    name: str
+    func: Callable
+    kwargs: dict = field(default_factory=dict)
+    inputs: list = field(default_factory=list)
+    outputs: list = field(default_factory=list)
+    always_run: bool = False
+
+
+def file_hash(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def fingerprint(stage):
+    """Hash of the stage's config plus the current state of its inputs"""
+    parts = {"config": json.dumps(stage.kwargs, sort_keys=True, default=str)}
+    for i, source in enumerate(stage.inputs):
+        if callable(source):
+            parts[f"input_{i}"] = json.dumps(source(), sort_keys=True, default=str)
+        elif os.path.exists(source):
+            parts[source] = file_hash(source)
+        else:
+            parts[source] = None
+    raw = json.dumps(parts, sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def order_stages(stages):
+    """Topological order from output -> input edges, stable on declaration order"""
+    producers = {out: s.name for s in stages for out in s.outputs}
+    deps = {
+        s.name: {producers[i] for i in s.inputs
+                 if not callable(i) and i in producers and producers[i] != s.name}
+        for s in stages
+    }
+    ordered = []
+    remaining = list(stages)
+    while remaining:
+        ready = [s for s in remaining if deps[s.name] <= {o.name for o in ordered}]
+        if not ready:
+            raise ValueError("Pipeline stages have a dependency cycle")
+        ordered.append(ready[0])
+        remaining.remove(ready[0])
+    return ordered
+
+
+class PipelineRunner:
+    """
+    Runs stages in dependency order, skipping those whose input fingerprint
+    matches the last successful run and whose outputs still exist. Run
+    state is persisted to `state_path` so `resume=True` restarts at the
+    stage that failed last time.
+    """
+
+    def __init__(self, stages, state_path):
+        self.stages = order_stages(stages)
+        self.state_path = state_path
+
+    def load_state(self):
+        if not os.path.exists(self.state_path):
+            return {"stages": {}}
+        with open(self.state_path) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2, default=str)
+        os.replace(tmp_path, self.state_path)
+
+    def run(self, resume=False, force=False):
+        state = self.load_state()
+        previous = state.get("stages", {})
+
+        # On resume, stages before last run's failure are taken as done
+        resume_from = state.get("failed_stage") if resume else None
+        if resume and resume_from is None:
+            print("ℹ️  Last run did not fail; running normally")
+        skip_until_resume = resume_from is not None
+
+        state.update({
+            "run_id": datetime.now().strftime("%Y%m%dT%H%M%S"),
+            "started_at": datetime.now(),
+            "status": "running",
+            "failed_stage": None,
+        })
+        state.setdefault("stages", {})
+        timings = []
+
+        for stage in self.stages:
+            if skip_until_resume and stage.name != resume_from:
+                print(f"⏭️  {stage.name}: completed in the failed run, skipping")
+                timings.append((stage.name, "resumed", 0.0))
+                continue
+            skip_until_resume = False
+
+            # Always-run stages skip hashing (their inputs may be a large DB)
+            stage_fingerprint = None if stage.always_run else fingerprint(stage)
+            up_to_date = (
+                not force
+                and stage_fingerprint is not None
+                and previous.get(stage.name, {}).get("fingerprint") == stage_fingerprint
+                and all(os.path.exists(out) for out in stage.outputs)
+            )
+            if up_to_date:
+                print(f"⏭️  {stage.name}: inputs unchanged, skipping")
+                timings.append((stage.name, "skipped", 0.0))
+                continue
+
+            print(f"▶️  {stage.name}...")
+            started = time.perf_counter()
+            try:
+                with metrics.span(stage.name):
+                    stage.func(**stage.kwargs)
+            except Exception:
+                elapsed = time.perf_counter() - started
+                traceback.print_exc()
+                state.update({"status": "failed", "failed_stage": stage.name,
+                              "finished_at": datetime.now()})
+                self.save_state(state)
+                timings.append((stage.name, "failed", elapsed))
+                self.record_timings(timings)
+                raise
+
+            elapsed = time.perf_counter() - started
+            timings.append((stage.name, "ran", elapsed))
+            state["stages"][stage.name] = {
+                # Re-fingerprint: a stage may change its own inputs
+                "fingerprint": None if stage.always_run else fingerprint(stage),
+                "completed_at": datetime.now(),
+                "duration_s": round(elapsed, 3),
+            }
+            self.save_state(state)
+
+        state.update({"status": "completed", "finished_at": datetime.now()})
+        self.save_state(state)
+        self.record_timings(timings)
+        return timings
+
+    @staticmethod
+    def record_timings(timings):
+        for name, status, _ in timings:
+            STAGE_RUNS.inc(stage=name, status=status)
+        PipelineRunner.print_timings(timings)
+
+    @staticmethod
+    def print_timings(timings):
+        print("\n⏱️  Stage timings:")
+        for name, status, elapsed in timings:
+            print(f"   {name:<12} {status:<8} {elapsed:8.2f}s")
+        print(f"   {'total':<12} {'':<8} {sum(t for _, _, t in timings):8.2f}s")
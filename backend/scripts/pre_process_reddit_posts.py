@@ -1,30 +1,78 @@
 import pandas as pd
-import re
-from tqdm import tqdm
 import os
 
+TICKER_PATTERN = r"\$([A-Za-z]{1,5})"
 
-def preprocess(input_path, output_path):
+# Cashtags that are never stock tickers; one symbol per line
+DENYLIST_PATH = "backend/data/ticker_denylist.txt"
+
+# Optional exchange listing to validate tickers against. Accepts one symbol
+# per line or a delimited listing (e.g. nasdaqtrader's "Symbol|Security
+# Name|..."), where the first field is the symbol.
+SYMBOL_UNIVERSE_PATH = "backend/data/symbol_universe.txt"
+
+
+def load_symbol_set(path):
+    """Read a symbol file into an uppercase set, or None if it is missing"""
+    if not path or not os.path.exists(path):
+        return None
+    symbols = set()
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            symbol = line.replace(",", "|").split("|")[0].strip().upper()
+            if symbol in ("SYMBOL", "ACT SYMBOL") or symbol.startswith("FILE CREATION"):
+                continue
+            symbols.add(symbol)
+    return symbols
+
+
+def extract_tickers(df, denylist=None, universe=None):
+    """
+    Vectorized cashtag extraction: one (row index, ticker) pair per distinct
+    $TICKER in each post's title and body, minus denylisted symbols and,
+    when a universe is given, anything not listed in it.
+    """
+    text = df['title'].fillna('') + "\n" + df['body'].fillna('')
+    matches = text.str.extractall(TICKER_PATTERN)[0].str.upper()
+    pairs = (
+        matches.droplevel('match')
+        .rename('tickers')
+        .reset_index()
+        .drop_duplicates()
+    )
+    if denylist:
+        pairs = pairs[~pairs['tickers'].isin(denylist)]
+    if universe is not None:
+        pairs = pairs[pairs['tickers'].isin(universe)]
+    return pairs.set_index('index')['tickers']
+
+
+def preprocess(input_path, output_path, denylist_path=DENYLIST_PATH,
+               universe_path=SYMBOL_UNIVERSE_PATH):
     print("<--------------------------Running 2 -------------------------->")
     df = pd.read_parquet(input_path)
 
-    def extract_tickers(text):
-        if not text:
-            return []
-        return re.findall(r"\$[A-Za-z]{1,5}", text)
-
-    def merge_tickers(row):
-        tickers = extract_tickers(row['title']) + extract_tickers(row['body'])
-        tickers = list(set([t.upper().replace('$', '') for t in tickers]))
-        return tickers
+    denylist = load_symbol_set(denylist_path)
+    universe = load_symbol_set(universe_path)
+    if universe is not None:
+        print(f"Validating tickers against {len(universe)} listed symbols")
 
-    tqdm.pandas(desc="Extracting tickers")
-    df['tickers'] = df.progress_apply(merge_tickers, axis=1)
     df['content'] = df['title'].fillna('') + "\n\n" + df['body'].fillna('')
-    df_exploded = df.explode('tickers')
-    df_exploded = df_exploded[df_exploded['tickers'].notna()]
-    df_final = df_exploded[['tickers', 'score',
-                            'num_comments', 'content', 'comments', 'created_utc']]
+    df = df.rename(columns={'id': 'post_id'})
+    columns = ['post_id', 'score', 'num_comments', 'content', 'comments', 'created_utc']
+
+    if df.empty:
+        # Incremental runs can have no new posts
+        df_final = df.assign(tickers=pd.Series(dtype=object))
+    else:
+        tickers = extract_tickers(df, denylist, universe)
+        df_final = df[columns].join(tickers, how='inner')
+
+    df_final = df_final[['post_id', 'tickers', 'score',
+                         'num_comments', 'content', 'comments', 'created_utc']]
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df_final.to_parquet(output_path, engine="pyarrow", index=False)
 
@@ -0,0 +1,131 @@
+import ast
+import json
+
+from scripts.llm_executor import estimate_tokens
+
+# Comments that carry no signal for the summary
+NOISE_COMMENTS = {"[deleted]", "[removed]", ""}
+BOT_MARKER = "i am a bot"
+
+
+def parse_comments(value):
+    """
+    Comments as a list of strings. Stored comments may be a list, a JSON
+    array, or the str() of a Python list written by older pipeline runs.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(c) for c in value]
+    if hasattr(value, "tolist"):
+        return [str(c) for c in value.tolist()]
+
+    text = str(value).strip()
+    for parse in (json.loads, ast.literal_eval):
+        try:
+            parsed = parse(text)
+        except (ValueError, SyntaxError, TypeError):
+            continue
+        if isinstance(parsed, (list, tuple)):
+            return [str(c) for c in parsed]
+        if isinstance(parsed, str):
+            return parse_comments(parsed) if parsed != text else [parsed]
+    return [text] if text else []
+
+
+def truncate_to_tokens(text, max_tokens):
+    """Cut text to roughly max_tokens, on a word boundary"""
+    max_chars = max(0, max_tokens) * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    space = cut.rfind(" ")
+    if space > max_chars // 2:
+        cut = cut[:space]
+    return cut.rstrip() + " …"
+
+
+def rank_comments(comments, min_chars=15):
+    """
+    Drop deleted/removed, bot, near-empty and duplicate comments. The fetch
+    stores comments sorted by their Reddit score, so keeping that order
+    spends the budget on the highest-voted comments first.
+    """
+    seen = set()
+    ranked = []
+    for comment in comments:
+        text = " ".join(comment.split())
+        if (text in NOISE_COMMENTS or len(text) < min_chars or text in seen
+                or BOT_MARKER in text.lower()):
+            continue
+        seen.add(text)
+        ranked.append(text)
+    return ranked
+
+
+def pack_post(content, comments, budget=1500, content_share=0.5,
+              comment_tokens=120):
+    """
+    Fit one post into a token budget. Content is guaranteed up to
+    content_share of the budget, comments (each capped at comment_tokens)
+    fill what is left in rank order, and any unused comment budget goes
+    back to the content.
+
+    Returns (content_text, comments_text, estimated_tokens).
+    """
+    content = " ".join((content or "").split())
+    reserved = min(estimate_tokens(content), int(budget * content_share))
+
+    ranked = rank_comments(parse_comments(comments))
+    # A blob that could not be split into comments gets the whole budget
+    if len(ranked) == 1:
+        comment_tokens = budget - reserved - 2
+
+    lines = []
+    used = 0
+    for comment in ranked:
+        line = "- " + truncate_to_tokens(comment, comment_tokens)
+        cost = estimate_tokens(line)
+        if used + cost > budget - reserved:
+            break
+        lines.append(line)
+        used += cost
+
+    content_text = truncate_to_tokens(content, budget - used)
+    comments_text = "\n".join(lines)
+    return (content_text, comments_text,
+            estimate_tokens(content_text) + used)
+
+
+def plan_batches(items, max_posts=5, max_tokens=3000, short_tokens=600):
+    """
+    Group (key, tokens) items into LLM requests. Posts over short_tokens
+    get a request of their own; short posts are packed greedily, up to
+    max_posts per request and max_tokens of post text.
+    """
+    if max_posts <= 1:
+        return [[key] for key, _ in items]
+
+    groups = []
+    current, current_tokens = [], 0
+    for key, tokens in items:
+        if tokens > short_tokens:
+            groups.append([key])
+            continue
+        if current and (len(current) >= max_posts
+                        or current_tokens + tokens > max_tokens):
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(key)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def format_posts(posts):
+    """Numbered post sections for the batched prompt"""
+    return "\n\n".join(
+        f"### Post {i}\nContent:\n{p['content']}\n\nComments:\n{p['comments']}"
+        for i, p in enumerate(posts, start=1)
+    )
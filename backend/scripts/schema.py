@@ -0,0 +1,294 @@
+"""
+Normalized storage model.
+
+    posts                  one row per Reddit post (content, comments, engagement,
+                           lexicon sentiment and relevance scores)
+    companies              one row per yfinance symbol (profile fields)
+    quotes                 market data time series, one row per (symbol, as_of)
+    post_ticker_mentions   one row per (post, ticker) mention
+    summaries              one LLM summary per post
+
+`training` is kept as a view over these tables so existing readers keep
+working. Its row_id is the mention_id, which continues the old row_id
+sequence so ids and API cursors stay valid across the migration. Each
+mention records the quote it was fetched with (quote_as_of, resolved by
+an ASOF join at write time) so the view only needs equi-joins.
+"""
+
+# Stable id for rows written before post_id was tracked. created_utc is
+# hashed as plain TIMESTAMP text, the type the legacy table stored, so a
+# TIMESTAMPTZ source (text with a +00 suffix) yields the same id.
+LEGACY_POST_ID = (
+    "coalesce(post_id, 'legacy-' || md5(coalesce(content, '') || '|' || "
+    "coalesce(CAST(CAST(created_utc AS TIMESTAMP) AS TEXT), '')))"
+)
+
+TABLES_SQL = """
+CREATE SEQUENCE IF NOT EXISTS seq_row_id START 1;
+
+CREATE TABLE IF NOT EXISTS posts (
+    post_id TEXT PRIMARY KEY,
+    content TEXT,
+    comments TEXT,
+    score INTEGER,
+    num_comments INTEGER,
+    created_utc TIMESTAMP,
+    last_updated TIMESTAMP,
+    sentiment_score DOUBLE,
+    relevance_score DOUBLE
+);
+
+CREATE TABLE IF NOT EXISTS companies (
+    yfinance_symbol TEXT PRIMARY KEY,
+    long_name TEXT,
+    short_name TEXT,
+    sector TEXT,
+    industry TEXT,
+    employees INTEGER,
+    founded INTEGER,
+    country TEXT,
+    currency TEXT,
+    website TEXT,
+    about TEXT,
+    last_updated TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS quotes (
+    yfinance_symbol TEXT,
+    as_of TIMESTAMP,
+    market_cap BIGINT,
+    current_price DOUBLE,
+    previous_close DOUBLE,
+    open DOUBLE,
+    day_high DOUBLE,
+    day_low DOUBLE,
+    volume BIGINT,
+    PRIMARY KEY (yfinance_symbol, as_of)
+);
+
+CREATE TABLE IF NOT EXISTS post_ticker_mentions (
+    mention_id INTEGER PRIMARY KEY DEFAULT nextval('seq_row_id'),
+    post_id TEXT,
+    reddit_ticker TEXT,
+    yfinance_symbol TEXT,
+    error TEXT,
+    last_updated TIMESTAMP,
+    quote_as_of TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS summaries (
+    post_id TEXT PRIMARY KEY,
+    summarized_content TEXT,
+    summarized_comments TEXT,
+    verdict TEXT,
+    model TEXT,
+    prompt_version TEXT,
+    created_at TIMESTAMP
+);
+"""
+
+# Column order matches the old `training` table
+VIEW_SQL = """
+CREATE OR REPLACE VIEW {view} AS
+SELECT
+    m.mention_id AS row_id, m.reddit_ticker, m.yfinance_symbol,
+    c.long_name, c.short_name, c.sector, c.industry,
+    q.market_cap, c.employees, c.founded, c.country, c.currency,
+    q.current_price, q.previous_close, q.open, q.day_high, q.day_low,
+    q.volume, c.website, c.about,
+    p.score, p.num_comments, p.content, p.comments, p.created_utc,
+    m.error, m.last_updated, m.post_id,
+    s.summarized_content, s.summarized_comments, s.verdict,
+    p.sentiment_score, p.relevance_score
+FROM post_ticker_mentions AS m
+JOIN posts AS p USING (post_id)
+LEFT JOIN companies AS c ON c.yfinance_symbol = m.yfinance_symbol
+LEFT JOIN quotes AS q
+    ON q.yfinance_symbol = m.yfinance_symbol AND q.as_of = m.quote_as_of
+LEFT JOIN summaries AS s ON s.post_id = m.post_id
+"""
+
+
+def _table_type(con, name):
+    row = con.execute(
+        "SELECT table_type FROM information_schema.tables WHERE table_name = ?",
+        [name]).fetchone()
+    return row[0] if row else None
+
+
+def _column_exists(con, table, column):
+    return con.execute("""
+        SELECT COUNT(*) FROM information_schema.columns
+        WHERE table_name = ? AND column_name = ?
+    """, [table, column]).fetchone()[0] > 0
+
+
+def resolve_quotes(con, where="TRUE"):
+    """Point mentions matching `where` at the latest quote as of their fetch"""
+    con.execute(f"""
+    UPDATE post_ticker_mentions AS t
+    SET quote_as_of = a.as_of
+    FROM (
+        SELECT m.mention_id, q.as_of
+        FROM (SELECT * FROM post_ticker_mentions WHERE {where}) AS m
+        ASOF JOIN quotes AS q
+            ON q.yfinance_symbol = m.yfinance_symbol
+            AND m.last_updated >= q.as_of
+    ) AS a
+    WHERE t.mention_id = a.mention_id
+      AND t.quote_as_of IS DISTINCT FROM a.as_of
+    """)
+
+
+def upsert_rows(con, source):
+    """
+    Upsert LLM-ready rows (a relation name or table function, with
+    created_utc already a TIMESTAMP) into the normalized tables.
+    """
+    con.execute(f"""
+    MERGE INTO posts AS t
+    USING (
+        SELECT * FROM (
+            SELECT {LEGACY_POST_ID} AS post_id, content, comments, score,
+                   num_comments, created_utc, last_updated, sentiment_score,
+                   relevance_score
+            FROM {source}
+        )
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY post_id ORDER BY last_updated DESC) = 1
+    ) AS s
+    ON t.post_id = s.post_id
+    WHEN MATCHED THEN UPDATE SET
+        score = s.score, num_comments = s.num_comments,
+        comments = s.comments, last_updated = s.last_updated,
+        sentiment_score = coalesce(s.sentiment_score, t.sentiment_score),
+        relevance_score = coalesce(s.relevance_score, t.relevance_score)
+    WHEN NOT MATCHED THEN INSERT BY NAME;
+    """)
+
+    # Failed lookups carry no profile, so keep what is already stored
+    con.execute(f"""
+    MERGE INTO companies AS t
+    USING (
+        SELECT yfinance_symbol, long_name, short_name, sector, industry,
+               employees, founded, country, currency, website, about,
+               last_updated
+        FROM {source}
+        WHERE yfinance_symbol IS NOT NULL
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY yfinance_symbol
+            ORDER BY (long_name IS NULL), last_updated DESC) = 1
+    ) AS s
+    ON t.yfinance_symbol = s.yfinance_symbol
+    WHEN MATCHED THEN UPDATE SET
+        long_name = coalesce(s.long_name, t.long_name),
+        short_name = coalesce(s.short_name, t.short_name),
+        sector = coalesce(s.sector, t.sector),
+        industry = coalesce(s.industry, t.industry),
+        employees = coalesce(s.employees, t.employees),
+        founded = coalesce(s.founded, t.founded),
+        country = coalesce(s.country, t.country),
+        currency = coalesce(s.currency, t.currency),
+        website = coalesce(s.website, t.website),
+        about = coalesce(s.about, t.about),
+        last_updated = s.last_updated
+    WHEN NOT MATCHED THEN INSERT BY NAME;
+    """)
+
+    con.execute(f"""
+    INSERT OR IGNORE INTO quotes
+    SELECT yfinance_symbol, last_updated AS as_of, market_cap, current_price,
+           previous_close, open, day_high, day_low, volume
+    FROM {source}
+    WHERE yfinance_symbol IS NOT NULL AND last_updated IS NOT NULL
+      AND (current_price IS NOT NULL OR market_cap IS NOT NULL)
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY yfinance_symbol, last_updated ORDER BY current_price) = 1;
+    """)
+
+    con.execute(f"""
+    MERGE INTO post_ticker_mentions AS t
+    USING (
+        SELECT * FROM (
+            SELECT {LEGACY_POST_ID} AS post_id, reddit_ticker,
+                   yfinance_symbol, error, last_updated
+            FROM {source}
+        )
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY post_id, reddit_ticker ORDER BY last_updated DESC) = 1
+    ) AS s
+    ON t.post_id = s.post_id AND t.reddit_ticker = s.reddit_ticker
+    WHEN MATCHED THEN UPDATE SET
+        yfinance_symbol = s.yfinance_symbol, error = s.error,
+        last_updated = s.last_updated
+    WHEN NOT MATCHED THEN INSERT BY NAME;
+    """)
+
+    resolve_quotes(con, f"""
+        last_updated IN (SELECT DISTINCT last_updated FROM {source})""")
+
+
+def _migrate_legacy_table(con, view):
+    """Move rows from an old denormalized `training` table into the new model"""
+    print(f"🗃️  Migrating legacy {view} table to the normalized schema...")
+    con.execute(f"ALTER TABLE {view} ADD COLUMN IF NOT EXISTS post_id TEXT")
+    for col in ("summarized_content", "summarized_comments", "verdict"):
+        con.execute(f"ALTER TABLE {view} ADD COLUMN IF NOT EXISTS {col} TEXT")
+    for col in ("sentiment_score", "relevance_score"):
+        con.execute(f"ALTER TABLE {view} ADD COLUMN IF NOT EXISTS {col} DOUBLE")
+
+    con.execute(f"""
+    CREATE TEMP TABLE legacy_rows AS
+    SELECT * REPLACE ({LEGACY_POST_ID} AS post_id) FROM {view}
+    """)
+    upsert_rows(con, "legacy_rows")
+
+    # Keep the old row ids as mention ids
+    con.execute("""
+    DELETE FROM post_ticker_mentions;
+    INSERT INTO post_ticker_mentions
+    SELECT row_id, post_id, reddit_ticker, yfinance_symbol, error,
+           last_updated, NULL
+    FROM legacy_rows
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY post_id, reddit_ticker ORDER BY last_updated DESC) = 1;
+    """)
+    resolve_quotes(con)
+
+    con.execute("""
+    INSERT OR IGNORE INTO summaries
+    SELECT post_id, summarized_content, summarized_comments, verdict,
+           NULL, NULL, now()
+    FROM legacy_rows
+    WHERE coalesce(summarized_content, '') <> ''
+    QUALIFY ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY last_updated DESC) = 1;
+    """)
+
+    rows = con.execute("SELECT count(*) FROM legacy_rows").fetchone()[0]
+    con.execute("DROP TABLE legacy_rows")
+    con.execute(f"DROP TABLE {view}")
+    print(f"✅ Migrated {rows} legacy rows")
+
+
+def ensure_schema(con, view="training"):
+    """Create the normalized tables and the compatibility view"""
+    con.execute(TABLES_SQL)
+    if not _column_exists(con, "post_ticker_mentions", "quote_as_of"):
+        # Tables created before mentions recorded their quote
+        con.execute("ALTER TABLE post_ticker_mentions ADD COLUMN quote_as_of TIMESTAMP")
+        resolve_quotes(con)
+    for col in ("sentiment_score", "relevance_score"):
+        # Posts stored before the lexicon scorer existed stay NULL until
+        # re-fetched or triaged
+        con.execute(f"ALTER TABLE posts ADD COLUMN IF NOT EXISTS {col} DOUBLE")
+    if _table_type(con, view) == "BASE TABLE":
+        con.execute("BEGIN TRANSACTION")
+        try:
+            _migrate_legacy_table(con, view)
+            con.execute(VIEW_SQL.format(view=view))
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+    else:
+        con.execute(VIEW_SQL.format(view=view))
@@ -0,0 +1,159 @@
+"""
+Full-text search index over post content and LLM summaries.
+
+    search_docs    one row per indexed post: length in terms plus the
+                   fields search results are filtered on (date, verdict,
+                   tickers mentioned)
+    search_terms   inverted index, one row per (term, post) with the term
+                   frequency and post length, indexed on term
+    search_stopwords, search_tokens(text)
+                   stopword list and tokenizer macro, so the API tokenizes
+                   queries exactly like the index
+
+Posts are re-tokenized only when their text, verdict or tickers changed
+since the last run (tracked by digest), so each run only indexes new and
+re-summarized posts. Queries score matches with Okapi BM25, the ranking
+DuckDB's fts extension uses, computed from the same tables (see
+SEARCH_SCORES_SQL in backend/server.py).
+"""
+import duckdb
+
+from scripts.data_version import bump_data_version
+from scripts.schema import ensure_schema
+
+# Common English words left out of the index and of queries
+STOPWORDS = (
+    "a", "about", "an", "and", "are", "as", "at", "be", "been", "but", "by",
+    "can", "do", "for", "from", "had", "has", "have", "he", "i", "if", "in",
+    "is", "it", "its", "just", "me", "my", "not", "of", "on", "or", "so",
+    "that", "the", "their", "them", "there", "they", "this", "to", "was",
+    "we", "were", "what", "when", "which", "will", "with", "you", "your",
+)
+
+INDEXED_TEXT = "concat_ws(' ', p.content, s.summarized_content, s.summarized_comments)"
+
+# Per-post fields filtered on, and the digest deciding what to re-index
+DOCS_SQL = f"""
+SELECT p.post_id,
+       p.created_utc,
+       upper(trim(s.verdict)) AS verdict,
+       coalesce(m.tickers, []::TEXT[]) AS tickers,
+       md5(concat_ws('|', {INDEXED_TEXT}, s.verdict,
+                     array_to_string(m.tickers, ' '), p.created_utc)) AS digest
+FROM posts AS p
+LEFT JOIN summaries AS s USING (post_id)
+LEFT JOIN (
+    SELECT post_id, list(DISTINCT reddit_ticker ORDER BY reddit_ticker) AS tickers
+    FROM post_ticker_mentions
+    WHERE reddit_ticker IS NOT NULL
+    GROUP BY post_id
+) AS m USING (post_id)
+"""
+
+TABLES_SQL = """
+CREATE OR REPLACE MACRO search_tokens(text) AS
+    regexp_split_to_array(lower(strip_accents(text)), '[^a-z0-9]+');
+
+CREATE TABLE IF NOT EXISTS search_stopwords (word TEXT PRIMARY KEY);
+
+CREATE TABLE IF NOT EXISTS search_docs (
+    post_id TEXT PRIMARY KEY,
+    digest TEXT,
+    length INTEGER,
+    created_utc TIMESTAMP,
+    verdict TEXT,
+    tickers TEXT[],
+    indexed_at TIMESTAMP
+);
+
+-- length is repeated per term so scoring never joins search_docs
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT,
+    post_id TEXT,
+    tf INTEGER,
+    length INTEGER
+);
+
+CREATE INDEX IF NOT EXISTS search_terms_term ON search_terms (term);
+"""
+
+CHANGED_SQL = f"""
+CREATE OR REPLACE TEMP TABLE search_changed AS
+SELECT src.*
+FROM ({DOCS_SQL}) AS src
+LEFT JOIN search_docs AS d USING (post_id)
+WHERE d.digest IS DISTINCT FROM src.digest;
+
+-- Posts that changed or no longer exist
+CREATE OR REPLACE TEMP TABLE search_stale AS
+SELECT post_id FROM search_changed
+UNION
+SELECT post_id FROM search_docs
+WHERE post_id NOT IN (SELECT post_id FROM posts);
+"""
+
+INDEX_SQL = f"""
+DELETE FROM search_terms WHERE post_id IN (SELECT post_id FROM search_stale);
+DELETE FROM search_docs WHERE post_id IN (SELECT post_id FROM search_stale);
+
+CREATE OR REPLACE TEMP TABLE search_new_terms AS
+SELECT term, post_id, COUNT(*)::INTEGER AS tf
+FROM (
+    SELECT c.post_id, unnest(search_tokens({INDEXED_TEXT})) AS term
+    FROM search_changed AS c
+    JOIN posts AS p USING (post_id)
+    LEFT JOIN summaries AS s USING (post_id)
+)
+WHERE term <> '' AND term NOT IN (SELECT word FROM search_stopwords)
+GROUP BY term, post_id;
+
+INSERT INTO search_docs
+SELECT c.post_id, c.digest, coalesce(t.length, 0), c.created_utc, c.verdict,
+       c.tickers, now()
+FROM search_changed AS c
+LEFT JOIN (
+    SELECT post_id, SUM(tf)::INTEGER AS length
+    FROM search_new_terms
+    GROUP BY post_id
+) AS t USING (post_id);
+
+INSERT INTO search_terms
+SELECT t.term, t.post_id, t.tf, d.length
+FROM search_new_terms AS t
+JOIN search_docs AS d USING (post_id)
+ORDER BY t.term;
+"""
+
+
+def update_search_index(DB_PATH, TABLE_NAME="training", full=False):
+    """
+    Bring the search index up to date with posts and summaries in
+    DB_PATH, re-tokenizing only posts whose indexed text changed;
+    full=True rebuilds it from scratch.
+    """
+    print("<--------------------------Running 8 -------------------------->")
+    con = duckdb.connect(DB_PATH)
+    ensure_schema(con, TABLE_NAME)
+    con.execute(TABLES_SQL)
+    con.executemany("INSERT OR IGNORE INTO search_stopwords VALUES (?)",
+                    [[w] for w in STOPWORDS])
+
+    con.execute("BEGIN TRANSACTION")
+    if full:
+        con.execute("DELETE FROM search_terms")
+        con.execute("DELETE FROM search_docs")
+    con.execute(CHANGED_SQL)
+    changed, stale = con.execute("""
+        SELECT (SELECT COUNT(*) FROM search_changed),
+               (SELECT COUNT(*) FROM search_stale)
+    """).fetchone()
+    if stale:
+        con.execute(INDEX_SQL)
+    con.execute("COMMIT")
+
+    if stale:
+        bump_data_version(con, "update_search_index")
+    docs = con.execute("SELECT COUNT(*) FROM search_docs").fetchone()[0]
+    con.close()
+    print(f"✅ Search index: {changed} post(s) indexed, {docs} posts searchable")
+    return {"indexed": changed, "docs": docs}
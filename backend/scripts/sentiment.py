@@ -0,0 +1,216 @@
+"""
+Local lexicon-based sentiment and relevance scoring for Reddit posts.
+
+Runs vectorized over whole columns with pyarrow compute and NumPy (no
+per-row Python), so scoring costs next to nothing per post and every row
+of the merged dataset gets a score before any LLM call:
+
+    sentiment_score   -1 (bearish) .. 1 (bullish), VADER-style normalized
+                      sum of finance-tuned word and phrase weights, with
+                      a word's weight flipped after a negator ("not", "no")
+    relevance_score   0 .. 1, how much signal the post carries, mostly from
+                      its text (market vocabulary and cashtags, length)
+                      with a small boost for Reddit engagement
+
+Both are computed in the merge stage and stored on `posts`. The
+summarizer triages on them (see triage_posts in
+scripts/create_summary_from_langchain.py): only relevant posts go to the
+LLM, the rest get a templated verdict from their sentiment or are skipped.
+"""
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Bump when the lexicon or formulas change
+SENTIMENT_VERSION = "lexicon-2"
+
+# Single-word weights, roughly -3 .. 3
+WORD_WEIGHTS = {
+    # bullish
+    "bull": 1.5, "bullish": 2.5, "moon": 2.0, "mooning": 2.5, "rocket": 2.0,
+    "rip": 1.0, "calls": 1.5, "long": 1.0, "buy": 1.5, "buying": 1.5,
+    "bought": 1.0, "loading": 1.5, "breakout": 2.0, "squeeze": 1.5,
+    "undervalued": 2.0, "cheap": 1.0, "beat": 1.5, "beats": 1.5,
+    "approval": 2.0, "approved": 2.0, "partnership": 1.5, "contract": 1.0,
+    "upgrade": 2.0, "upgraded": 2.0, "rally": 2.0, "surge": 2.0,
+    "surging": 2.0, "soar": 2.0, "soaring": 2.5, "gain": 1.5, "gains": 1.5,
+    "profit": 1.5, "profitable": 2.0, "growth": 1.5, "strong": 1.5,
+    "record": 1.0, "green": 1.0, "uptrend": 2.0, "catalyst": 1.0,
+    "gem": 1.5, "winner": 2.0, "tendies": 2.0, "hold": 0.5, "hodl": 1.0,
+    "runner": 1.5, "multibagger": 2.5, "oversold": 1.0, "buyout": 1.5,
+    # bearish
+    "bear": -1.5, "bearish": -2.5, "puts": -1.5, "short": -1.0,
+    "shorting": -1.5, "sell": -1.5, "selling": -1.5, "sold": -1.0,
+    "dump": -2.0, "dumping": -2.5, "dumped": -2.0, "bagholder": -2.0,
+    "bagholders": -2.0, "bagholding": -2.0, "dilution": -2.5,
+    "dilute": -2.0, "diluted": -2.0, "offering": -1.5, "bankruptcy": -3.0,
+    "bankrupt": -3.0, "delisted": -3.0, "delisting": -3.0, "downgrade": -2.0,
+    "downgraded": -2.0, "miss": -1.5, "missed": -1.5, "scam": -3.0,
+    "fraud": -3.0, "crash": -2.5, "crashing": -2.5, "plunge": -2.5,
+    "plunged": -2.5, "tank": -2.0, "tanking": -2.5, "tanked": -2.0,
+    "lawsuit": -2.0, "loss": -1.5, "losses": -1.5, "red": -1.0,
+    "overvalued": -2.0, "rugpull": -3.0, "pump": -1.0, "worthless": -3.0,
+    "downtrend": -2.0, "weak": -1.5, "avoid": -2.0, "warning": -1.5,
+    "overbought": -1.0, "halted": -1.0, "debt": -1.0, "rejected": -2.0,
+    "selloff": -2.0, "ath": 1.5,
+}
+
+# Phrases whose meaning differs from their words; the weight replaces
+# the two word weights
+PHRASE_WEIGHTS = {
+    "short squeeze": 2.0, "gamma squeeze": 2.0, "fda approval": 2.5,
+    "price target": 0.5, "new high": 2.0, "new highs": 2.0,
+    "reverse split": -2.5, "going concern": -3.0, "pump and": -2.0,
+    "sell off": -2.0, "short report": -2.0, "stay away": -2.5,
+    "paper hands": -0.5, "diamond hands": 1.5, "cash burn": -2.0,
+}
+
+NEGATORS = {
+    "not", "no", "never", "none", "nothing", "neither", "nor", "without",
+    "don't", "doesn't", "didn't", "isn't", "aren't", "wasn't", "won't",
+    "can't", "cannot", "shouldn't", "wouldn't", "dont", "doesnt", "didnt",
+    "isnt", "wont", "cant",
+}
+
+# Market vocabulary that signals a post is about trading, whatever its tone
+MARKET_TERMS = set(WORD_WEIGHTS) | {
+    "earnings", "revenue", "eps", "guidance", "shares", "float", "volume",
+    "dd", "fda", "sec", "filing", "10k", "10q", "8k", "merger", "acquisition",
+    "dividend", "valuation", "market", "cap", "options", "strike", "premarket",
+    "afterhours", "ticker", "stock", "stocks", "price", "chart", "support",
+    "resistance", "trial", "phase", "patent", "insider", "institutional",
+}
+
+# Scaling of the raw sentiment sum into -1 .. 1 (VADER uses 15)
+SENTIMENT_ALPHA = 15.0
+NEGATION_SCALE = -0.74
+
+# Relevance: MARKET_TERMS_SCALE market terms (or cashtags) and
+# LENGTH_SCALE tokens count as fully relevant content; engagement
+# saturates around ENGAGEMENT_SCALE upvotes plus twice the comments.
+# Posts are fetched once, from subreddit.new, when engagement is still
+# near zero, so it only nudges the score.
+ENGAGEMENT_SCALE = 200
+MARKET_TERMS_SCALE = 8
+LENGTH_SCALE = 150
+RELEVANCE_WEIGHTS = {"market_terms": 0.55, "length": 0.3, "engagement": 0.15}
+
+# Stripped from both ends of whitespace-separated tokens
+PUNCTUATION = "\"'`.,!?;:()[]{}<>*#~_-=+/\\|@%^&$"
+
+
+def _lookup(tokens, weights):
+    """Weight of every token in `weights` (0 when absent), as float64"""
+    words = pa.array(list(weights), pa.string())
+    values = np.append(np.array(list(weights.values()), dtype=np.float64), 0.0)
+    index = pc.index_in(tokens, value_set=words)
+    index = pc.fill_null(index, len(words)).to_numpy(zero_copy_only=False)
+    return values[index]
+
+
+def _array(values):
+    """A pyarrow Array from an Array, ChunkedArray, pandas Series or list"""
+    if isinstance(values, pa.ChunkedArray):
+        return values.combine_chunks()
+    if isinstance(values, pa.Array):
+        return values
+    return pa.array(values, from_pandas=True)
+
+
+def _numbers(values):
+    """Numeric column as float64, nulls as 0"""
+    array = _array(values).cast(pa.float64())
+    return pc.fill_null(array, 0.0).to_numpy(zero_copy_only=False)
+
+
+def _text(content, comments):
+    """content and comments (text or list of strings) joined per row"""
+    content = _array(content).cast(pa.string())
+    comments = _array(comments)
+    if pa.types.is_list(comments.type) or pa.types.is_large_list(comments.type):
+        comments = pc.binary_join(comments, " ")
+    comments = comments.cast(pa.string())
+    return pc.binary_join_element_wise(
+        pc.fill_null(content, ""), pc.fill_null(comments, ""), " ")
+
+
+def _text_features(texts):
+    """Raw sentiment sum, token count and market term count per text"""
+    rows = len(texts)
+    lowered = pc.replace_substring(pc.utf8_lower(texts), "\u2019", "'")
+    # "down again..offering" is common; a literal pass is far cheaper
+    # than splitting on a punctuation regex
+    lowered = pc.replace_substring(lowered, "..", " ")
+    tokens_by_row = pc.utf8_split_whitespace(lowered)
+    parents = pc.list_parent_indices(tokens_by_row).to_numpy()
+    untrimmed = pc.list_flatten(tokens_by_row)
+    cashtags = pc.starts_with(untrimmed, "$")
+    tokens = pc.utf8_trim(untrimmed, characters=PUNCTUATION)
+    kept = pc.not_equal(tokens, "").to_numpy(zero_copy_only=False)
+    tokens = pc.filter(tokens, pa.array(kept))
+    cashtags = cashtags.to_numpy(zero_copy_only=False)[kept]
+    parents = parents[kept]
+
+    weights = _lookup(tokens, WORD_WEIGHTS)
+
+    same_row_as_previous = np.zeros(len(tokens), dtype=bool)
+    same_row_as_previous[1:] = parents[1:] == parents[:-1]
+
+    # A negator flips (and dampens) the next word
+    negators = pc.is_in(tokens, value_set=pa.array(sorted(NEGATORS)))
+    negated = np.zeros(len(tokens), dtype=bool)
+    negated[1:] = negators.to_numpy(zero_copy_only=False)[:-1]
+    negated &= same_row_as_previous
+    weights = np.where(negated, weights * NEGATION_SCALE, weights)
+
+    # Phrases replace the weights of both their words
+    if len(tokens) > 1:
+        pairs = pc.binary_join_element_wise(tokens[:-1], tokens[1:], " ")
+        is_phrase = pc.is_in(pairs, value_set=pa.array(list(PHRASE_WEIGHTS)))
+        replaced = np.flatnonzero(
+            is_phrase.to_numpy(zero_copy_only=False) & same_row_as_previous[1:])
+        phrase = _lookup(pairs.take(pa.array(replaced)), PHRASE_WEIGHTS)
+        weights[replaced] = phrase - weights[replaced + 1]
+
+    raw = np.bincount(parents, weights=weights, minlength=rows)
+    length = np.bincount(parents, minlength=rows)
+    market = np.maximum(_lookup(tokens, dict.fromkeys(MARKET_TERMS, 1.0)), cashtags)
+    market_terms = np.bincount(parents, weights=market, minlength=rows)
+    return raw, length, market_terms
+
+
+def score_posts(content, comments, score, num_comments):
+    """
+    Return (sentiment_score, relevance_score) float64 arrays for columns of
+    posts. Each argument may be a pyarrow array/chunked array, a pandas
+    Series or a list.
+    """
+    # Rows repeat a post once per ticker it mentions: score each text once
+    encoded = pc.dictionary_encode(_text(content, comments))
+    row_text = encoded.indices.to_numpy(zero_copy_only=False)
+    raw, length, market_terms = (
+        feature[row_text] for feature in _text_features(encoded.dictionary))
+
+    sentiment = raw / np.sqrt(raw * raw + SENTIMENT_ALPHA)
+
+    upvotes = np.clip(_numbers(score), 0, None)
+    replies = np.clip(_numbers(num_comments), 0, None)
+    engagement = np.log1p(upvotes + 2 * replies) / np.log1p(ENGAGEMENT_SCALE)
+
+    relevance = (
+        RELEVANCE_WEIGHTS["market_terms"] * np.minimum(market_terms / MARKET_TERMS_SCALE, 1.0)
+        + RELEVANCE_WEIGHTS["length"] * np.minimum(length / LENGTH_SCALE, 1.0)
+        + RELEVANCE_WEIGHTS["engagement"] * np.minimum(engagement, 1.0)
+    )
+    return np.round(sentiment, 4), np.round(relevance, 4)
+
+
+def add_scores(table: pa.Table) -> pa.Table:
+    """Append sentiment_score and relevance_score to a merged Arrow table"""
+    sentiment, relevance = score_posts(
+        table["content"], table["comments"], table["score"],
+        table["num_comments"])
+    return (table
+            .append_column("sentiment_score", pa.array(sentiment))
+            .append_column("relevance_score", pa.array(relevance)))
+
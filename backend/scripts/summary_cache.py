@@ -0,0 +1,131 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from scripts import metrics
+
+CACHE_LOOKUPS = metrics.counter(
+    "pennyai_cache_lookups_total", "Cache lookups by cache and result")
+
+
+class SummaryCache:
+    """
+    Persistent LLM summary cache stored in DuckDB.
+
+    Entries are keyed on a hash of the prompt version, model name, post
+    content and comments, so the same post exploded across several tickers
+    or re-ingested on a later day is only summarized once. Entries unused
+    for `max_age_days`, or beyond the newest `max_entries`, are evicted.
+    """
+
+    TABLE_NAME = "summary_cache"
+
+    def __init__(self, con, max_entries=100_000, max_age_days=90):
+        self.con = con
+        self.max_entries = max_entries
+        self.max_age_days = max_age_days
+        self.hits = 0
+        self.misses = 0
+
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                cache_key TEXT PRIMARY KEY,
+                summarized_content TEXT,
+                summarized_comments TEXT,
+                verdict TEXT,
+                created_at TIMESTAMP,
+                last_used_at TIMESTAMP,
+                hit_count INTEGER
+            );
+        """)
+
+    @staticmethod
+    def make_key(prompt_version, model, content, comments):
+        raw = json.dumps([prompt_version, model, content, comments])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get_many(self, keys):
+        """Return {cache_key: summary dict} for the keys already cached"""
+        keys = list(set(keys))
+        if not keys:
+            return {}
+
+        rows = self.con.execute(f"""
+            SELECT cache_key, summarized_content, summarized_comments, verdict
+            FROM {self.TABLE_NAME}
+            WHERE cache_key IN (SELECT unnest(?))
+        """, [keys]).fetchall()
+
+        found = {
+            key: {
+                "summarized_content": content,
+                "summarized_comments": comments,
+                "verdict": verdict,
+            }
+            for key, content, comments, verdict in rows
+        }
+
+        if found:
+            self.con.execute(f"""
+                UPDATE {self.TABLE_NAME}
+                SET last_used_at = ?, hit_count = hit_count + 1
+                WHERE cache_key IN (SELECT unnest(?))
+            """, [datetime.now(), list(found)])
+
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        CACHE_LOOKUPS.inc(len(found), cache="summary", result="hit")
+        CACHE_LOOKUPS.inc(len(keys) - len(found), cache="summary", result="miss")
+        return found
+
+    def put_many(self, summaries):
+        """Store {cache_key: summary dict} entries"""
+        if not summaries:
+            return
+
+        now = datetime.now()
+        entries = pd.DataFrame([
+            {
+                "cache_key": key,
+                "summarized_content": s.get("summarized_content", ""),
+                "summarized_comments": s.get("summarized_comments", ""),
+                "verdict": s.get("verdict", ""),
+                "created_at": now,
+                "last_used_at": now,
+                "hit_count": 0,
+            }
+            for key, s in summaries.items()
+        ])
+
+        self.con.register("new_summary_cache", entries)
+        self.con.execute(f"""
+            INSERT OR REPLACE INTO {self.TABLE_NAME}
+            SELECT cache_key, summarized_content, summarized_comments, verdict,
+                   created_at, last_used_at, hit_count
+            FROM new_summary_cache
+        """)
+        self.con.unregister("new_summary_cache")
+
+    def evict(self):
+        """Drop stale entries, then the least recently used beyond max_entries"""
+        cutoff = datetime.now() - timedelta(days=self.max_age_days)
+        self.con.execute(
+            f"DELETE FROM {self.TABLE_NAME} WHERE last_used_at < ?", [cutoff])
+        self.con.execute(f"""
+            DELETE FROM {self.TABLE_NAME}
+            WHERE cache_key IN (
+                SELECT cache_key FROM {self.TABLE_NAME}
+                ORDER BY last_used_at DESC
+                OFFSET ?
+            )
+        """, [self.max_entries])
+
+    def stats(self):
+        total = self.hits + self.misses
+        hit_rate = self.hits / total if total else 0.0
+        size = self.con.execute(
+            f"SELECT COUNT(*) FROM {self.TABLE_NAME}").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": hit_rate, "entries": size}
@@ -0,0 +1,168 @@
+import os
+import socket
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import duckdb
+
+
+class SummaryJobQueue:
+    """
+    Durable summarization queue stored in DuckDB (table summary_jobs).
+
+    One job per post. Workers claim a batch by taking a lease on it
+    (status 'running', lease_owner, lease_expires) and checkpoint each
+    finished batch in its own transaction, so a crash only loses the
+    batch in flight: its lease expires and another worker reclaims it.
+    Each claim counts as an attempt; a job that has used up
+    `max_attempts` is parked as 'failed' instead of retrying forever.
+
+    DuckDB allows one writer process per file, so the queue never keeps a
+    connection open across LLM calls. Each claim/checkpoint opens a
+    short-lived connection and retries while another worker holds the
+    lock.
+    """
+
+    TABLE_NAME = "summary_jobs"
+
+    def __init__(self, db_path, lease_seconds=600, max_attempts=3,
+                 lock_timeout=120, worker_id=None):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock_timeout = lock_timeout
+        self.worker_id = worker_id or (
+            f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}")
+
+    @contextmanager
+    def connect(self):
+        """Short-lived read-write connection, waiting out other writers"""
+        deadline = time.monotonic() + self.lock_timeout
+        delay = 0.05
+        while True:
+            try:
+                con = duckdb.connect(self.db_path)
+                break
+            except duckdb.IOException as e:
+                if "lock" not in str(e).lower() or time.monotonic() > deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        try:
+            yield con
+        finally:
+            con.close()
+
+    def ensure_table(self, con):
+        con.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self.TABLE_NAME} (
+                post_id TEXT PRIMARY KEY,
+                status TEXT,
+                attempts INTEGER,
+                lease_owner TEXT,
+                lease_expires TIMESTAMP,
+                last_error TEXT,
+                updated_at TIMESTAMP
+            );
+        """)
+
+    def enqueue(self, con, retry_failed=False, min_relevance=0.0,
+                template_model=None):
+        """
+        Add a pending job for every post without a summaries row (or with
+        only a summary by template_model) whose relevance_score reaches
+        min_relevance; unscored posts always qualify. Jobs already done whose
+        summaries row has since been deleted are reset to pending; failed
+        jobs only when retry_failed is set. A stored summary that came back
+        empty counts as done, so it is not retried on every run.
+        """
+        self.ensure_table(con)
+        reset = "('done', 'failed')" if retry_failed else "('done')"
+        con.execute(f"""
+            INSERT INTO {self.TABLE_NAME} (post_id, status, attempts, updated_at)
+            SELECT p.post_id, 'pending', 0, ?
+            FROM posts AS p
+            LEFT JOIN summaries AS s USING (post_id)
+            WHERE (s.post_id IS NULL OR s.model = ?)
+              AND coalesce(p.relevance_score, 1) >= ?
+            ON CONFLICT (post_id) DO UPDATE SET
+                status = 'pending', attempts = 0, lease_owner = NULL,
+                lease_expires = NULL, updated_at = excluded.updated_at
+            WHERE {self.TABLE_NAME}.status IN {reset}
+        """, [datetime.utcnow(), template_model, min_relevance])
+        return self.stats(con)
+
+    def claim(self, con, batch_size):
+        """
+        Lease up to batch_size pending (or lease-expired) jobs for this
+        worker and return their post_ids. Runs in one transaction, so
+        concurrent workers get disjoint batches.
+        """
+        now = datetime.utcnow()
+        con.execute("BEGIN TRANSACTION")
+        try:
+            # Expired leases that are out of attempts are given up on
+            con.execute(f"""
+                UPDATE {self.TABLE_NAME}
+                SET status = 'failed', lease_owner = NULL, lease_expires = NULL,
+                    last_error = coalesce(last_error, 'lease expired'),
+                    updated_at = ?
+                WHERE status = 'running' AND lease_expires < ?
+                  AND attempts >= ?
+            """, [now, now, self.max_attempts])
+
+            rows = con.execute(f"""
+                UPDATE {self.TABLE_NAME}
+                SET status = 'running', attempts = attempts + 1,
+                    lease_owner = ?, lease_expires = ?, updated_at = ?
+                WHERE post_id IN (
+                    SELECT post_id FROM {self.TABLE_NAME}
+                    WHERE status = 'pending'
+                       OR (status = 'running' AND lease_expires < ?)
+                    ORDER BY updated_at, post_id
+                    LIMIT ?
+                )
+                RETURNING post_id
+            """, [self.worker_id,
+                  now + timedelta(seconds=self.lease_seconds),
+                  now, now, batch_size]).fetchall()
+            con.execute("COMMIT")
+        except Exception:
+            con.execute("ROLLBACK")
+            raise
+        return [r[0] for r in rows]
+
+    def complete(self, con, done_ids, failures):
+        """
+        Checkpoint a batch: mark done_ids done and send failures
+        ({post_id: error}) back to pending, or to failed once out of
+        attempts. Call inside the transaction that writes the summaries.
+        """
+        now = datetime.utcnow()
+        if done_ids:
+            con.execute(f"""
+                UPDATE {self.TABLE_NAME}
+                SET status = 'done', lease_owner = NULL, lease_expires = NULL,
+                    last_error = NULL, updated_at = ?
+                WHERE post_id IN (SELECT unnest(?))
+            """, [now, list(done_ids)])
+        if failures:
+            con.execute(f"""
+                UPDATE {self.TABLE_NAME} AS j
+                SET status = CASE WHEN j.attempts >= $1 THEN 'failed'
+                                  ELSE 'pending' END,
+                    lease_owner = NULL, lease_expires = NULL,
+                    last_error = f.error, updated_at = $2
+                FROM (SELECT unnest($3) AS post_id, unnest($4) AS error) AS f
+                WHERE j.post_id = f.post_id
+            """, [self.max_attempts, now,
+                  list(failures), [str(e)[:500] for e in failures.values()]])
+
+    def stats(self, con):
+        """Return {status: job count}"""
+        self.ensure_table(con)
+        return dict(con.execute(
+            f"SELECT status, COUNT(*) FROM {self.TABLE_NAME} GROUP BY status"
+        ).fetchall())
@@ -0,0 +1,196 @@
+import duckdb
+
+from scripts.data_version import bump_data_version
+from scripts.schema import ensure_schema
+
+TABLES_SQL = """
+CREATE TABLE IF NOT EXISTS ticker_daily_stats (
+    reddit_ticker TEXT,
+    day DATE,
+    yfinance_symbol TEXT,
+    mentions BIGINT,
+    posts BIGINT,
+    last_updated TIMESTAMP,
+    last_post_utc TIMESTAMP,
+    current_price DOUBLE,
+    previous_close DOUBLE,
+    open DOUBLE,
+    buy BIGINT,
+    sell BIGINT,
+    hold BIGINT,
+    PRIMARY KEY (reddit_ticker, day)
+);
+
+CREATE TABLE IF NOT EXISTS ticker_latest (
+    reddit_ticker TEXT PRIMARY KEY,
+    yfinance_symbol TEXT,
+    long_name TEXT,
+    sector TEXT,
+    current_price DOUBLE,
+    previous_close DOUBLE,
+    open DOUBLE,
+    change_pct DOUBLE,
+    mentions BIGINT,
+    buy BIGINT,
+    sell BIGINT,
+    hold BIGINT,
+    first_seen DATE,
+    last_updated TIMESTAMP,
+    last_post_utc TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS aggregate_watermarks (
+    source TEXT PRIMARY KEY,
+    watermark TIMESTAMP
+);
+"""
+
+# Days with new or re-fetched mentions, newly summarized posts, or
+# mention counts that no longer match (rows moved to another day)
+TOUCHED_DAYS_SQL = """
+CREATE OR REPLACE TEMP TABLE touched_days AS
+SELECT CAST(last_updated AS DATE) AS day
+FROM post_ticker_mentions
+WHERE last_updated > coalesce($mentions_watermark, '-infinity'::TIMESTAMP)
+UNION
+SELECT CAST(m.last_updated AS DATE)
+FROM summaries AS s
+JOIN post_ticker_mentions AS m USING (post_id)
+WHERE s.created_at > coalesce($summaries_watermark, '-infinity'::TIMESTAMP)
+UNION
+SELECT day
+FROM (
+    SELECT CAST(last_updated AS DATE) AS day, COUNT(*) AS mentions
+    FROM post_ticker_mentions
+    WHERE reddit_ticker IS NOT NULL AND last_updated IS NOT NULL
+    GROUP BY day
+) AS current
+FULL JOIN (
+    SELECT day, SUM(mentions) AS mentions
+    FROM ticker_daily_stats
+    GROUP BY day
+) AS stored USING (day)
+WHERE current.mentions IS DISTINCT FROM stored.mentions
+"""
+
+# Prices are the latest quoted values of the day
+DAILY_SQL = """
+INSERT INTO ticker_daily_stats
+SELECT
+    reddit_ticker,
+    CAST(last_updated AS DATE) AS day,
+    arg_max(yfinance_symbol, last_updated) AS yfinance_symbol,
+    COUNT(*) AS mentions,
+    COUNT(DISTINCT post_id) AS posts,
+    max(last_updated) AS last_updated,
+    max(created_utc) AS last_post_utc,
+    arg_max(current_price, last_updated)
+        FILTER (WHERE current_price IS NOT NULL) AS current_price,
+    arg_max(previous_close, last_updated)
+        FILTER (WHERE current_price IS NOT NULL) AS previous_close,
+    arg_max(open, last_updated)
+        FILTER (WHERE current_price IS NOT NULL) AS open,
+    COUNT(DISTINCT post_id) FILTER (WHERE upper(trim(verdict)) = 'BUY') AS buy,
+    COUNT(DISTINCT post_id) FILTER (WHERE upper(trim(verdict)) = 'SELL') AS sell,
+    COUNT(DISTINCT post_id) FILTER (WHERE upper(trim(verdict)) = 'HOLD') AS hold
+FROM {view}
+WHERE reddit_ticker IS NOT NULL
+  AND CAST(last_updated AS DATE) IN (SELECT day FROM touched_days)
+GROUP BY reddit_ticker, day
+"""
+
+# Small enough (tickers x days) to rebuild from the daily table every run
+LATEST_SQL = """
+DELETE FROM ticker_latest;
+INSERT INTO ticker_latest
+SELECT
+    d.reddit_ticker,
+    d.yfinance_symbol,
+    c.long_name,
+    c.sector,
+    d.current_price,
+    d.previous_close,
+    d.open,
+    (d.current_price - d.previous_close) / d.previous_close * 100 AS change_pct,
+    t.mentions,
+    t.buy,
+    t.sell,
+    t.hold,
+    t.first_seen,
+    t.last_updated,
+    t.last_post_utc
+FROM (
+    SELECT reddit_ticker,
+           SUM(mentions) AS mentions,
+           SUM(buy) AS buy, SUM(sell) AS sell, SUM(hold) AS hold,
+           min(day) AS first_seen,
+           max(last_updated) AS last_updated,
+           max(last_post_utc) AS last_post_utc
+    FROM ticker_daily_stats
+    GROUP BY reddit_ticker
+) AS t
+JOIN (
+    SELECT * FROM ticker_daily_stats
+    QUALIFY ROW_NUMBER() OVER (
+        PARTITION BY reddit_ticker
+        ORDER BY (current_price IS NULL), day DESC) = 1
+) AS d USING (reddit_ticker)
+LEFT JOIN companies AS c ON c.yfinance_symbol = d.yfinance_symbol;
+"""
+
+
+def _watermark(con, source):
+    row = con.execute(
+        "SELECT watermark FROM aggregate_watermarks WHERE source = ?",
+        [source]).fetchone()
+    return row[0] if row else None
+
+
+def update_ticker_aggregates(DB_PATH, TABLE_NAME="training", full=False):
+    """
+    Maintain ticker_daily_stats (one row per ticker per day of
+    last_updated) and ticker_latest (one row per ticker) for the API and
+    dashboard. Only days touched since the last run are recomputed from
+    TABLE_NAME; full=True rebuilds every day.
+    """
+    print("<--------------------------Running 7 -------------------------->")
+    con = duckdb.connect(DB_PATH)
+    ensure_schema(con, TABLE_NAME)
+    con.execute(TABLES_SQL)
+
+    if full:
+        con.execute("DELETE FROM aggregate_watermarks")
+
+    mentions_watermark = _watermark(con, "mentions")
+    summaries_watermark = _watermark(con, "summaries")
+    new_mentions_watermark, new_summaries_watermark = con.execute("""
+        SELECT (SELECT max(last_updated) FROM post_ticker_mentions),
+               (SELECT max(created_at) FROM summaries)
+    """).fetchone()
+
+    con.execute("BEGIN TRANSACTION")
+    # Without a watermark (first run or full=True) every day is touched
+    con.execute(TOUCHED_DAYS_SQL, {
+        "mentions_watermark": mentions_watermark,
+        "summaries_watermark": summaries_watermark,
+    })
+    touched = con.execute("SELECT COUNT(*) FROM touched_days").fetchone()[0]
+    if touched:
+        con.execute("""
+            DELETE FROM ticker_daily_stats
+            WHERE day IN (SELECT day FROM touched_days)
+        """)
+        con.execute(DAILY_SQL.format(view=TABLE_NAME))
+        con.execute(LATEST_SQL)
+    con.execute("""
+        INSERT OR REPLACE INTO aggregate_watermarks VALUES
+            ('mentions', ?), ('summaries', ?)
+    """, [new_mentions_watermark, new_summaries_watermark])
+    con.execute("COMMIT")
+
+    if touched:
+        bump_data_version(con, "update_ticker_aggregates")
+    tickers = con.execute("SELECT COUNT(*) FROM ticker_latest").fetchone()[0]
+    con.close()
+    print(f"✅ Ticker aggregates: {touched} day(s) recomputed, {tickers} tickers")
+    return {"days": touched, "tickers": tickers}
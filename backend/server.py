@@ -1,14 +1,423 @@
 # backend/server.py
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
+from contextlib import ExitStack, asynccontextmanager, contextmanager
+from collections import OrderedDict
 import duckdb
-import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
+from decimal import Decimal
+import threading
+import hashlib
+import itertools
+import base64
+import json
 import math
+import os
+import time
+
+from backend.scripts.metrics import Registry
+
+DB_PATH = Path("backend/data/duckdb/pennyai.duckdb")
+
+# Max queries running against DuckDB at once; extra requests wait, then 503
+DB_MAX_CONCURRENCY = int(os.environ.get("PENNYAI_DB_MAX_CONCURRENCY", 8))
+DB_ACQUIRE_TIMEOUT = float(os.environ.get("PENNYAI_DB_ACQUIRE_TIMEOUT", 10))
+
+# Total size of cached response bodies kept in memory
+CACHE_MAX_BYTES = int(os.environ.get(
+    "PENNYAI_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+# ------------------ Metrics ------------------
+
+METRICS = Registry()
+HTTP_LATENCY = METRICS.histogram(
+    "pennyai_http_request_duration_seconds",
+    "Request latency per route until the last body byte is sent")
+DB_QUERY_SECONDS = METRICS.histogram(
+    "pennyai_db_query_duration_seconds", "DuckDB query time including fetch")
+DB_ROWS = METRICS.counter(
+    "pennyai_db_rows_returned_total", "Rows returned by DuckDB queries")
+RESPONSE_CACHE = METRICS.counter(
+    "pennyai_response_cache_lookups_total", "Response cache lookups by result")
+RESPONSE_CACHE_BYTES = METRICS.gauge(
+    "pennyai_response_cache_bytes", "Bytes of response bodies held in the cache")
+DB_ACTIVE_QUERIES = METRICS.gauge(
+    "pennyai_db_active_queries", "Queries running on the current database handle")
+
+
+def record_query(name, started, rows):
+    DB_QUERY_SECONDS.observe(time.perf_counter() - started, query=name)
+    DB_ROWS.inc(rows, query=name)
+
+
+def run_query(conn, name, query, params=None):
+    """Execute and fetch a query, recording its duration and row count"""
+    started = time.perf_counter()
+    result = conn.execute(query, params or [])
+    names = [d[0] for d in result.description]
+    rows = result.fetchall()
+    record_query(name, started, len(rows))
+    return names, rows
+
+
+class RequestMetricsMiddleware:
+    """
+    Pure ASGI middleware observing request latency per route template
+    (e.g. /api/pennystocks/details), so streamed responses are timed
+    until their last chunk is sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.observe(
+                time.perf_counter() - started,
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=status,
+            )
+
+# ------------------ Connection Pool ------------------
+
+
+class PoolExhausted(Exception):
+    """Raised when no query slot frees up within the acquire timeout"""
+
+
+class _DatabaseHandle:
+    """One opened read-only database plus the cursors created from it"""
+
+    def __init__(self, db, signature):
+        self.db = db
+        self.signature = signature
+        self.cursors = []
+        self.active = 0
+
+    def read_version(self):
+        """
+        Data version written by the pipeline (scripts/data_version.py).
+        Read again on every check rather than cached with the handle, so
+        the version never lags the data this handle serves. Called with the
+        pool lock held, which serializes use of the base connection. Older
+        files without the table fall back to the file signature.
+        """
+        try:
+            row = self.db.execute("SELECT version FROM data_version").fetchone()
+            if row:
+                return row[0]
+        except duckdb.Error:
+            pass
+        return "file-" + "-".join(str(part) for part in self.signature)
+
+    def close(self):
+        for cursor in self.cursors:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self.db.close()
+
+
+class DuckDBPool:
+    """
+    Long-lived read-only DuckDB handle shared by all request threads.
+
+    Each worker thread gets its own cursor (DuckDB connections are not safe
+    to share across threads), and a semaphore bounds how many queries run
+    at once. The handle holds a lock on the file, so the pipeline never
+    writes to it: it builds a staging copy and swaps it in with os.replace
+    (scripts/db_publish.py). The next request after the swap opens the new
+    file right away; the old handle is retired and closed by the last
+    request (or stream) still using it, so no request waits on another.
+    """
+
+    def __init__(self, db_path, max_concurrency=DB_MAX_CONCURRENCY,
+                 acquire_timeout=DB_ACQUIRE_TIMEOUT):
+        self.db_path = Path(db_path)
+        self.acquire_timeout = acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._handle = None
+        self._retired = []
+        self._generation = itertools.count()
+
+    def _file_signature(self, path=None):
+        st = (path or self.db_path).stat()
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+    def _connect(self):
+        """
+        Open the file currently at db_path. DuckDB caches database instances
+        by path, so while a retired handle on the old file is still open,
+        connecting to db_path would hand back the old data. Each file is
+        therefore opened through its own short-lived hard link; the name is
+        only needed until the connection is open.
+        """
+        link = self.db_path.with_name(
+            f"{self.db_path.name}.reader-{os.getpid()}-{next(self._generation)}")
+        os.link(self.db_path, link)
+        try:
+            signature = self._file_signature(link)
+            db = duckdb.connect(str(link), read_only=True)
+        finally:
+            link.unlink()
+        return _DatabaseHandle(db, signature)
+
+    def open(self):
+        """Open (or reopen) the database if the file changed since last open"""
+        with self._lock:
+            return self._current_handle()
+
+    def _current_handle(self):
+        try:
+            signature = self._file_signature()
+        except FileNotFoundError:
+            if self._handle is not None:
+                return self._handle
+            raise
+
+        if self._handle is None or self._handle.signature != signature:
+            old, self._handle = self._handle, self._connect()
+            if old is not None:
+                self._retire(old)
+        return self._handle
+
+    def _retire(self, handle):
+        """Close a replaced handle now, or once its last user checks in"""
+        if handle.active == 0:
+            handle.close()
+        else:
+            self._retired.append(handle)
+
+    def data_version(self):
+        """Version of the data the next request will read"""
+        with self._lock:
+            return self._current_handle().read_version()
+
+    def active_queries(self):
+        with self._lock:
+            return self._handle.active if self._handle is not None else 0
+
+    def _checkout(self):
+        with self._lock:
+            handle = self._current_handle()
+            handle.active += 1
+            return handle
+
+    def _checkin(self, handle):
+        with self._lock:
+            handle.active -= 1
+            if handle.active == 0 and handle in self._retired:
+                self._retired.remove(handle)
+                handle.close()
+
+    @contextmanager
+    def _slot(self):
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            raise PoolExhausted("Too many concurrent database requests")
+        try:
+            handle = self._checkout()
+            try:
+                yield handle
+            finally:
+                self._checkin(handle)
+        finally:
+            self._semaphore.release()
+
+    @contextmanager
+    def connection(self):
+        """Yield this thread's cursor on the current database handle"""
+        with self._slot() as handle:
+            cursor = getattr(self._local, "cursor", None)
+            if cursor is None or self._local.handle is not handle:
+                cursor = handle.db.cursor()
+                with self._lock:
+                    handle.cursors.append(cursor)
+                self._local.cursor = cursor
+                self._local.handle = handle
+            yield cursor
+
+    @contextmanager
+    def dedicated_cursor(self):
+        """
+        Yield a private cursor for reads that outlive the request thread,
+        such as streamed responses consumed across several worker threads.
+        """
+        with self._slot() as handle:
+            cursor = handle.db.cursor()
+            try:
+                yield cursor
+            finally:
+                cursor.close()
+
+    def close(self):
+        with self._lock:
+            for handle in self._retired:
+                handle.close()
+            self._retired = []
+            if self._handle is not None:
+                self._handle.close()
+                self._handle = None
+
+
+# ------------------ Response Cache ------------------
+
+
+class ResponseCache:
+    """
+    In-process LRU cache of encoded responses, bounded by total body size.
+    Keys embed the data version, and entries from older versions are
+    dropped as soon as a newer version is seen.
+    """
+
+    def __init__(self, max_bytes=CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._size = 0
+                self._version = version
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                RESPONSE_CACHE.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            RESPONSE_CACHE.inc(result="hit")
+            return entry
+
+    def size_bytes(self):
+        with self._lock:
+            return self._size
+
+    def put(self, key, version, body: bytes):
+        with self._lock:
+            if version != self._version or len(body) > self.max_bytes:
+                return
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+def make_etag(version, key):
+    digest = hashlib.sha1(f"{version}|{key}".encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(request: Request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [t.strip().removeprefix("W/") for t in header.split(",")]
+    return "*" in tags or etag in tags
+
+
+def request_cache_key(request: Request, *extra):
+    """Endpoint path plus sorted query params (and any negotiated extras)"""
+    params = sorted(request.query_params.multi_items())
+    return json.dumps([request.url.path, params, *extra])
+
+
+def check_etag(request: Request, key):
+    """
+    Return (version, validator headers, 304 response or None). The ETag
+    depends only on the data version and the request, so a revalidation is
+    answered without running any query.
+    """
+    try:
+        version = request.app.state.db_pool.data_version()
+    except Exception:
+        return None, {}, None
+    etag = make_etag(version, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return version, headers, Response(status_code=304, headers=headers)
+    return version, headers, None
+
+
+def cached_json(request: Request, key, build):
+    """Serve build()'s JSON payload through the response cache with an ETag"""
+    version, headers, not_modified = check_etag(request, key)
+    if not_modified is not None:
+        return not_modified
+    if version is None:
+        return build()
+
+    cache = request.app.state.response_cache
+    body = cache.get(key, version)
+    if body is None:
+        payload = build()
+        body = json.dumps(payload, default=json_default, ensure_ascii=False,
+                          allow_nan=False, separators=(",", ":")).encode()
+        if "error" in payload:
+            return Response(body, media_type="application/json")
+        cache.put(key, version, body)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.db_pool = DuckDBPool(DB_PATH)
+    app.state.response_cache = ResponseCache()
+    try:
+        app.state.db_pool.open()
+    except Exception as e:
+        # Keep serving; the pool retries on the next request
+        print(f"⚠️  Could not open {DB_PATH}: {e}")
+    yield
+    app.state.db_pool.close()
+
+
+@contextmanager
+def db_connection(request: Request, dedicated=False):
+    """Borrow a pooled cursor, mapping an exhausted pool to HTTP 503"""
+    pool = request.app.state.db_pool
+    try:
+        cm = pool.dedicated_cursor() if dedicated else pool.connection()
+        with cm as conn:
+            yield conn
+    except PoolExhausted as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
 
 # Initialize FastAPI
-app = FastAPI(title="Penny Stocks API")
+app = FastAPI(title="Penny Stocks API", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -17,8 +426,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
-
-DB_PATH = Path("backend/data/duckdb/pennyai.duckdb")
+app.add_middleware(RequestMetricsMiddleware)
 
 # ------------------ Helpers ------------------
 
@@ -34,19 +442,114 @@ def sanitize_row(row: dict):
     """Apply sanitize_value to all values in a row dict"""
     return {k: sanitize_value(v) for k, v in row.items()}
 
-# ------------------ Summary Endpoint ------------------
+# ------------------ Summary Queries ------------------
 
 
-@app.get("/api/pennystocks/summary")
-def get_summary():
-    conn = duckdb.connect(str(DB_PATH))
+SUMMARY_TOTALS_SQL = """
+SELECT
+    COUNT(*) AS total_stocks,
+    COUNT(DISTINCT reddit_ticker) FILTER (
+        WHERE CAST(last_updated AS DATE) = ?
+    ) AS new_stocks_today
+FROM training
+"""
+
+TOP_GAINERS_SQL = """
+SELECT
+    reddit_ticker,
+    current_price,
+    (current_price - previous_close) / previous_close * 100 AS change_pct
+FROM training
+ORDER BY change_pct DESC NULLS LAST
+LIMIT 5
+"""
+
+# Last 30 updates per ticker, oldest first, aggregated into one row per ticker
+TRENDS_SQL = """
+WITH ranked AS (
+    SELECT
+        reddit_ticker,
+        last_updated,
+        current_price,
+        ROW_NUMBER() OVER (
+            PARTITION BY reddit_ticker ORDER BY last_updated DESC
+        ) AS rn
+    FROM training
+    WHERE reddit_ticker IS NOT NULL
+)
+SELECT
+    reddit_ticker,
+    list(CAST(last_updated AS VARCHAR) ORDER BY last_updated) AS updated,
+    list(current_price ORDER BY last_updated) AS prices
+FROM ranked
+WHERE rn <= 30
+GROUP BY reddit_ticker
+ORDER BY reddit_ticker
+"""
 
-    try:
-        df = conn.execute("SELECT * FROM training").fetchdf()
-    except Exception as e:
-        return {"error": str(e)}
 
-    if df.empty:
+# Same payload from the per-ticker tables the pipeline maintains
+# (scripts/ticker_aggregates.py); trends are one point per day
+AGG_SUMMARY_TOTALS_SQL = """
+SELECT
+    COALESCE(SUM(mentions), 0) AS total_stocks,
+    COUNT(DISTINCT reddit_ticker) FILTER (WHERE day = ?) AS new_stocks_today
+FROM ticker_daily_stats
+"""
+
+AGG_TOP_GAINERS_SQL = """
+SELECT reddit_ticker, current_price, change_pct
+FROM ticker_latest
+ORDER BY change_pct DESC NULLS LAST
+LIMIT 5
+"""
+
+AGG_TRENDS_SQL = """
+WITH ranked AS (
+    SELECT
+        reddit_ticker,
+        day,
+        last_updated,
+        current_price,
+        ROW_NUMBER() OVER (PARTITION BY reddit_ticker ORDER BY day DESC) AS rn
+    FROM ticker_daily_stats
+)
+SELECT
+    reddit_ticker,
+    list(CAST(last_updated AS VARCHAR) ORDER BY day) AS updated,
+    list(current_price ORDER BY day) AS prices
+FROM ranked
+WHERE rn <= 30
+GROUP BY reddit_ticker
+ORDER BY reddit_ticker
+"""
+
+
+def has_aggregates(conn):
+    count = conn.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_name IN ('ticker_daily_stats', 'ticker_latest')
+    """).fetchone()[0]
+    return count == 2
+
+
+def build_summary(conn, today):
+    """
+    Compute the summary payload in DuckDB, from the ticker aggregate
+    tables when the pipeline has built them, else from the raw rows.
+    `today` (a UTC date) is the day newStocksToday counts.
+    """
+    if has_aggregates(conn):
+        totals_sql, gainers_sql, trends_sql = (
+            AGG_SUMMARY_TOTALS_SQL, AGG_TOP_GAINERS_SQL, AGG_TRENDS_SQL)
+    else:
+        totals_sql, gainers_sql, trends_sql = (
+            SUMMARY_TOTALS_SQL, TOP_GAINERS_SQL, TRENDS_SQL)
+
+    _, rows = run_query(conn, "summary_totals", totals_sql, [today])
+    total_stocks, new_stocks_today = rows[0]
+
+    if total_stocks == 0:
         return {
             "totalStocks": 0,
             "newStocksToday": 0,
@@ -54,35 +557,23 @@ def get_summary():
             "trends": {}
         }
 
-    # Total stocks
-    total_stocks = len(df)
-
-    # New stocks today
-    today = datetime.utcnow().date()
-    df["last_updated_date"] = pd.to_datetime(
-        df["last_updated"], errors='coerce').dt.date
-    new_stocks_today = df[df["last_updated_date"]
-                          == today]["reddit_ticker"].nunique()
-
-    # Top gainers (by % change)
-    df["change_pct"] = (
-        (df["current_price"] - df["previous_close"]) / df["previous_close"]) * 100
-    top_gainers = (
-        df.sort_values("change_pct", ascending=False)
-        .head(5)[["reddit_ticker", "current_price", "change_pct"]]
-        .applymap(sanitize_value)
-        .to_dict(orient="records")
-    )
+    top_gainers = [
+        {
+            "reddit_ticker": ticker,
+            "current_price": sanitize_value(price),
+            "change_pct": sanitize_value(change),
+        }
+        for ticker, price, change in run_query(conn, "top_gainers", gainers_sql)[1]
+    ]
 
-    # Stock trends: last 30 updates per ticker
-    trends = {}
-    for ticker, group in df.groupby("reddit_ticker"):
-        group_sorted = group.sort_values("last_updated").tail(30)
-        trends[ticker] = [
-            {"last_updated": str(row["last_updated"]), "current_price": sanitize_value(
-                row["current_price"])}
-            for _, row in group_sorted.iterrows()
+    trends = {
+        ticker: [
+            {"last_updated": str(updated),
+             "current_price": sanitize_value(price)}
+            for updated, price in zip(updated_list, prices)
         ]
+        for ticker, updated_list, prices in run_query(conn, "trends", trends_sql)[1]
+    }
 
     return {
         "totalStocks": total_stocks,
@@ -91,54 +582,516 @@ def get_summary():
         "trends": trends,
     }
 
+# ------------------ Summary Endpoint ------------------
+
+
+@app.get("/api/pennystocks/summary")
+def get_summary(request: Request):
+    # newStocksToday depends on the date as well as the data, so the day
+    # is part of the cache key and ETag: both roll over at UTC midnight
+    today = datetime.utcnow().date()
+
+    def build():
+        try:
+            with db_connection(request) as conn:
+                return build_summary(conn, today)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+    key = request_cache_key(request, today.isoformat())
+    return cached_json(request, key, build)
+
 # ------------------ Details Endpoint ------------------
-# ------------------ Details Endpoint ------------------
+
+DETAILS_COLUMNS = [
+    "row_id", "reddit_ticker", "yfinance_symbol", "long_name", "short_name",
+    "sector", "industry", "market_cap", "employees", "founded", "country",
+    "currency", "current_price", "previous_close", "open", "day_high",
+    "day_low", "volume", "website", "about", "score", "num_comments",
+    "created_utc", "error", "last_updated",
+    "summarized_content", "summarized_comments", "verdict"
+]
+
+# Rows per DuckDB record batch when streaming NDJSON / Arrow / Parquet
+STREAM_BATCH_ROWS = 2048
+EXPORT_BATCH_ROWS = 65536
+
+
+def encode_cursor(created_utc, row_id):
+    """Opaque keyset cursor for the (created_utc, row_id) sort key"""
+    created = created_utc.isoformat() if created_utc is not None else None
+    raw = json.dumps([created, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created = datetime.fromisoformat(created) if created else None
+        return created, int(row_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def json_default(v):
+    """json.dumps fallback for the non-JSON types DuckDB returns"""
+    if isinstance(v, (datetime, date)):
+        return v.isoformat()
+    if isinstance(v, Decimal):
+        return float(v)
+    return str(v)
+
+
+def details_query(limit, cursor, include_content, include_comments):
+    """Build the projected, keyset-paginated details query and its params"""
+    columns = list(DETAILS_COLUMNS)
+    if include_content:
+        columns.append("content")
+    if include_comments:
+        columns.append("comments")
+
+    query = f"SELECT {', '.join(columns)} FROM training"
+    params = []
+    if cursor is not None:
+        created, row_id = decode_cursor(cursor)
+        if created is None:
+            # NULL created_utc sorts last, so only NULL rows can follow
+            query += " WHERE created_utc IS NULL AND row_id < ?"
+            params += [row_id]
+        else:
+            query += """
+            WHERE created_utc IS NULL
+            OR created_utc < ?
+            OR (created_utc = ? AND row_id < ?)"""
+            params += [created, created, row_id]
+    query += " ORDER BY created_utc DESC NULLS LAST, row_id DESC"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+
+class _ChunkSink:
+    """Write-only file object whose bytes are drained after each batch"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def ndjson_rows(stack, reader, limit, record):
+    """Yield one NDJSON chunk per record batch, then the next-page cursor"""
+    sent = 0
+    try:
+        last = None
+        for batch in reader:
+            rows = batch.to_pylist()
+            if not rows:
+                continue
+            sent += len(rows)
+            last = rows[-1]
+            yield "".join(
+                json.dumps(sanitize_row(row), default=json_default) + "\n"
+                for row in rows
+            )
+        if limit is not None and sent == limit and last is not None:
+            next_cursor = encode_cursor(last["created_utc"], last["row_id"])
+            yield json.dumps({"nextCursor": next_cursor}) + "\n"
+    finally:
+        record(sent)
+        stack.close()
+
+
+def arrow_batches(stack, reader, fmt, record):
+    """Re-encode DuckDB record batches as an Arrow IPC stream/file or Parquet file"""
+    sent = 0
+    try:
+        sink = _ChunkSink()
+        if fmt == "parquet":
+            # Each DuckDB batch becomes one Parquet row group
+            writer = pq.ParquetWriter(sink, reader.schema, compression="zstd")
+        elif fmt == "arrow_file":
+            # Batches are written as they arrive; the footer follows the last
+            writer = pa.ipc.new_file(sink, reader.schema)
+        else:
+            writer = pa.ipc.new_stream(sink, reader.schema)
+        with writer:
+            for batch in reader:
+                writer.write_batch(batch)
+                sent += batch.num_rows
+                yield sink.drain()
+        yield sink.drain()
+    finally:
+        record(sent)
+        stack.close()
+
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "arrow_file": "application/vnd.apache.arrow.file",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Other spellings clients send in Accept for the same formats
+ACCEPT_ALIASES = {
+    "application/x-parquet": "parquet",
+}
+
+# Formats served as a download rather than a stream
+ATTACHMENT_NAMES = {
+    "arrow_file": "pennystocks.arrow",
+    "parquet": "pennystocks.parquet",
+}
+
+
+def negotiate_format(request: Request, fmt, default="json"):
+    """Pick the response format from ?format=, then Accept, then default"""
+    if fmt is not None:
+        return fmt
+    for part in request.headers.get("accept", "").split(","):
+        media_type = part.split(";")[0].strip().lower()
+        for name, known in MEDIA_TYPES.items():
+            if media_type == known:
+                return name
+        if media_type in ACCEPT_ALIASES:
+            return ACCEPT_ALIASES[media_type]
+    return default
+
+
+def stream_response(request: Request, name, query, params, fmt, limit=None):
+    """Run query on a dedicated cursor and stream it as ndjson/arrow/parquet"""
+    # The cursor stays checked out until the stream is fully sent
+    stack = ExitStack()
+    conn = stack.enter_context(db_connection(request, dedicated=True))
+    batch_rows = STREAM_BATCH_ROWS if fmt == "ndjson" else EXPORT_BATCH_ROWS
+    started = time.perf_counter()
+
+    def record(rows):
+        record_query(f"{name}_{fmt}", started, rows)
+
+    try:
+        reader = conn.execute(query, params).fetch_record_batch(batch_rows)
+    except Exception as e:
+        stack.close()
+        return {"error": str(e)}
+
+    if fmt == "ndjson":
+        body = ndjson_rows(stack, reader, limit, record)
+    else:
+        body = arrow_batches(stack, reader, fmt, record)
+
+    headers = {}
+    if fmt in ATTACHMENT_NAMES:
+        headers["Content-Disposition"] = (
+            f'attachment; filename="{ATTACHMENT_NAMES[fmt]}"')
+    return StreamingResponse(body, media_type=MEDIA_TYPES[fmt], headers=headers)
 
 
 @app.get("/api/pennystocks/details")
-def get_details(limit: int = None, include_comments: bool = False):
+def get_details(
+    request: Request,
+    limit: int = Query(None, ge=1),
+    cursor: str = None,
+    include_content: bool = False,
+    include_comments: bool = False,
+    format: str = Query(None, pattern="^(json|ndjson|arrow|arrow_file|parquet)$"),
+):
     """
-    Returns all columns for all tickers.
+    Returns ticker rows, newest first.
     Parameters:
-        - limit: optional integer to limit rows (useful for testing or pagination)
+        - limit: optional page size
+        - cursor: nextCursor from the previous page (keyset on created_utc, row_id)
+        - include_content: whether to include the post content (can be large)
         - include_comments: whether to include comment content (can be large)
+        - format: "json" for one document, "ndjson" to stream one row per line,
+          "arrow" (IPC stream), "arrow_file" (IPC file) or "parquet" for
+          typed columnar output; when omitted it is negotiated from the
+          Accept header.
+          A paged NDJSON stream ends with a {"nextCursor": ...} line
     """
-    conn = duckdb.connect(str(DB_PATH))
+    fmt = negotiate_format(request, format)
+    query, params = details_query(
+        limit, cursor, include_content, include_comments)
 
-    # All columns
-    columns = [
-        "row_id", "reddit_ticker", "yfinance_symbol", "long_name", "short_name",
-        "sector", "industry", "market_cap", "employees", "founded", "country",
-        "currency", "current_price", "previous_close", "open", "day_high",
-        "day_low", "volume", "website", "about", "score", "num_comments",
-        "content", "created_utc", "error", "last_updated",
-        "summarized_content", "summarized_comments", "verdict"
-    ]
+    key = request_cache_key(request, fmt)
+    if fmt != "json":
+        # Streams are revalidated by ETag but too large to keep in the cache
+        _, headers, not_modified = check_etag(request, key)
+        if not_modified is not None:
+            return not_modified
+        response = stream_response(request, "details", query, params, fmt, limit)
+        if isinstance(response, Response):
+            response.headers.update(headers)
+        return response
 
-    query = f"SELECT {', '.join(columns)} FROM training ORDER BY created_utc DESC"
-    if limit is not None:
-        query += f" LIMIT {limit}"
+    def build():
+        try:
+            with db_connection(request) as conn:
+                names, rows = run_query(conn, "details", query, params)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
 
-    try:
-        df = conn.execute(query).fetchdf()
-    except Exception as e:
-        return {"error": str(e)}
+        # Replace NaN/inf with None for all numeric values
+        full_data = [sanitize_row(dict(zip(names, row))) for row in rows]
 
-    # Replace NaN/inf with None for all numeric values
-    import math
+        next_cursor = None
+        if limit is not None and len(full_data) == limit:
+            last = full_data[-1]
+            next_cursor = encode_cursor(last["created_utc"], last["row_id"])
 
-    def sanitize_value(v):
-        if isinstance(v, float) and (math.isnan(v) or math.isinf(v)):
-            return None
-        return v
+        return {
+            "totalStocks": len(full_data),
+            "data": full_data,
+            "nextCursor": next_cursor,
+        }
 
-    # Convert DataFrame to list of dicts, sanitizing every value
-    full_data = []
-    for row in df.to_dict(orient="records"):
-        sanitized_row = {k: sanitize_value(v) for k, v in row.items()}
-        full_data.append(sanitized_row)
+    return cached_json(request, key, build)
 
-    return {
-        "totalStocks": len(df),
-        "data": full_data
-    }
+# ------------------ Bulk Export Endpoint ------------------
+
+
+@app.get("/api/pennystocks/export")
+def export_details(
+    request: Request,
+    include_content: bool = True,
+    include_comments: bool = True,
+    format: str = Query(None, pattern="^(arrow|arrow_file|parquet)$"),
+):
+    """
+    Streams the full details table for bulk consumers as an Arrow IPC stream
+    (default), an Arrow IPC file or a Parquet file, keeping DuckDB's column
+    types intact.
+    """
+    fmt = negotiate_format(request, format, default="arrow")
+    if fmt not in ("arrow", "arrow_file", "parquet"):
+        raise HTTPException(
+            status_code=406, detail="Export supports Arrow or Parquet only")
+    _, headers, not_modified = check_etag(
+        request, request_cache_key(request, fmt))
+    if not_modified is not None:
+        return not_modified
+    query, params = details_query(
+        None, None, include_content, include_comments)
+    response = stream_response(request, "export", query, params, fmt)
+    if isinstance(response, Response):
+        response.headers.update(headers)
+    return response
+
+# ------------------ Search Endpoint ------------------
+
+SEARCH_COLUMNS = [
+    "post_id", "tickers", "created_utc", "score", "num_comments",
+    "summarized_content", "summarized_comments", "verdict"
+]
+
+# Okapi BM25 parameters (the fts extension's defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Query terms, tokenized by the same search_tokens macro as the posts
+QUERY_TERMS_SQL = """
+SELECT DISTINCT term
+FROM (SELECT unnest(search_tokens(?)) AS term)
+WHERE term <> '' AND term NOT IN (SELECT word FROM search_stopwords)
+"""
+
+# BM25 score of every post containing one of the {terms} placeholders.
+# Postings are read as plain term lookups (served by the term index) and
+# carry the post length, so this never scans the whole index.
+SEARCH_SCORES_SQL = f"""
+SELECT h.post_id,
+       SUM(ln((n.docs - h.df + 0.5) / (h.df + 0.5) + 1) * h.tf * ({BM25_K1} + 1)
+           / (h.tf + {BM25_K1} * (1 - {BM25_B} + {BM25_B} * h.length / n.avg_length))
+       ) AS relevance,
+       COUNT(*) AS matched_terms
+FROM (
+    SELECT unnest(post_ids) AS post_id, unnest(tfs) AS tf,
+           unnest(lengths) AS length, len(post_ids) AS df
+    FROM (
+        SELECT list(post_id) AS post_ids, list(tf) AS tfs, list(length) AS lengths
+        FROM search_terms
+        WHERE term IN ({{terms}})
+        GROUP BY term
+    )
+) AS h
+CROSS JOIN (
+    SELECT COUNT(*) AS docs, avg(length) AS avg_length FROM search_docs
+) AS n
+GROUP BY h.post_id
+"""
+
+
+def has_search_index(conn):
+    count = conn.execute("""
+        SELECT COUNT(*) FROM information_schema.tables
+        WHERE table_name IN ('search_docs', 'search_terms', 'search_stopwords')
+    """).fetchone()[0]
+    return count == 3
+
+
+def search_matches(terms, ticker, since, until, verdict, conjunctive):
+    """
+    FROM/WHERE clause over every post matching the search (BM25 scores as
+    s, search_docs as d), shared by the page and the count queries.
+    """
+    scores = SEARCH_SCORES_SQL.format(terms=", ".join("?" * len(terms)))
+    params = list(terms)
+
+    query = f"""
+        FROM ({scores}) AS s
+        JOIN search_docs AS d USING (post_id)
+        WHERE TRUE"""
+    if conjunctive:
+        query += " AND s.matched_terms = ?"
+        params.append(len(terms))
+    if ticker:
+        query += " AND list_contains(d.tickers, ?)"
+        params.append(ticker.strip().upper())
+    if since is not None:
+        query += " AND d.created_utc >= ?"
+        params.append(since)
+    if until is not None:
+        # Inclusive of the whole `until` day
+        query += " AND d.created_utc < CAST(? AS DATE) + INTERVAL 1 DAY"
+        params.append(until)
+    if verdict:
+        query += " AND d.verdict = ?"
+        params.append(verdict.upper())
+    return query, params
+
+
+def search_query(terms, ticker, since, until, verdict, conjunctive,
+                 include_content, limit, offset):
+    """Build the filtered, BM25-ranked query for one page of matching posts"""
+    matches, params = search_matches(
+        terms, ticker, since, until, verdict, conjunctive)
+
+    order = "relevance DESC, created_utc DESC NULLS LAST, post_id"
+    columns = [f"page.{c}" if c in ("created_utc", "verdict") else c
+               for c in SEARCH_COLUMNS]
+    if include_content:
+        columns.append("p.content")
+    query = f"""
+    WITH page AS (
+        SELECT s.post_id, s.relevance, d.tickers, d.created_utc, d.verdict,
+               COUNT(*) OVER () AS total
+        {matches}
+        ORDER BY {order}
+        LIMIT ? OFFSET ?
+    )
+    SELECT {', '.join(columns)}, relevance, total
+    FROM page
+    JOIN posts AS p USING (post_id)
+    LEFT JOIN summaries AS su USING (post_id)
+    ORDER BY {order}"""
+    params += [limit, offset]
+    return query, params
+
+
+def search_count_query(terms, ticker, since, until, verdict, conjunctive):
+    """Count every post matching the search, for pages past the last match"""
+    matches, params = search_matches(
+        terms, ticker, since, until, verdict, conjunctive)
+    return f"SELECT COUNT(*) {matches}", params
+
+
+@app.get("/api/pennystocks/search")
+def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=500),
+    ticker: str = None,
+    since: date = None,
+    until: date = None,
+    verdict: str = Query(None, pattern="^(?i:buy|sell|hold)$"),
+    conjunctive: bool = False,
+    include_content: bool = False,
+    limit: int = Query(20, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Full-text search over post content and LLM summaries, best match
+    first (BM25). Returns one row per matching post with the tickers it
+    mentions.
+    Parameters:
+        - q: search terms
+        - ticker: only posts mentioning this Reddit ticker
+        - since / until: post creation date range (YYYY-MM-DD, inclusive)
+        - verdict: BUY, SELL or HOLD
+        - conjunctive: only posts containing every search term
+        - include_content: whether to include the post content (can be large)
+        - limit / offset: page size and position; nextOffset is set while
+          more results remain
+    """
+    def build():
+        try:
+            with db_connection(request) as conn:
+                if not has_search_index(conn):
+                    return {"error": "Search index has not been built yet"}
+                _, rows = run_query(conn, "search_terms", QUERY_TERMS_SQL, [q])
+                terms = [term for term, in rows]
+                names, rows, total = [], [], 0
+                if terms:
+                    query, params = search_query(
+                        terms, ticker, since, until, verdict, conjunctive,
+                        include_content, limit, offset)
+                    names, rows = run_query(conn, "search", query, params)
+                    if not rows and offset:
+                        # The page's window count comes with its rows, so a
+                        # page past the end counts the matches separately
+                        query, params = search_count_query(
+                            terms, ticker, since, until, verdict, conjunctive)
+                        _, counted = run_query(conn, "search_count", query, params)
+                        total = counted[0][0]
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"error": str(e)}
+
+        data = [sanitize_row(dict(zip(names, row))) for row in rows]
+        for row in data:
+            total = row.pop("total")
+
+        return {
+            "query": q,
+            "terms": terms,
+            "total": total,
+            "data": data,
+            "nextOffset": offset + limit if offset + limit < total else None,
+        }
+
+    return cached_json(request, request_cache_key(request), build)
+
+# ------------------ Metrics Endpoint ------------------
+
+
+@app.get("/metrics")
+def get_metrics(request: Request):
+    """Prometheus text exposition of request, query and cache metrics"""
+    RESPONSE_CACHE_BYTES.set(request.app.state.response_cache.size_bytes())
+    DB_ACTIVE_QUERIES.set(request.app.state.db_pool.active_queries())
+    return Response(METRICS.render(),
+                    media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,107 @@
+"""
+The in-process (--engine duckdb) preprocess -> merge -> upload path on
+runs where enrich has nothing typed to offer.
+
+    python -m unittest discover backend/tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from scripts.create_duckdb_from_parquet import upload_to_db  # noqa: E402
+from scripts.duckdb_engine import merge_duckdb, preprocess_duckdb  # noqa: E402
+from scripts.fetch_posts_from_reddit import POST_SCHEMA  # noqa: E402
+from scripts.get_ticker_info_from_yfinance import (  # noqa: E402
+    TICKER_COLUMNS, yfinance_table)
+
+
+def reddit_posts():
+    return pa.Table.from_pylist([
+        {"subreddit": "pennystocks", "id": "p1", "title": "$ABCD to the moon",
+         "body": "Earnings beat, adding more", "author": "a", "score": 12,
+         "num_comments": 2, "comments": ["great call on this one"],
+         "created_utc": 1.76e9, "url": "https://reddit.example/p1"},
+        {"subreddit": "pennystocks", "id": "p2", "title": "$WXYZ dilution",
+         "body": "Another offering incoming", "author": "b", "score": 3,
+         "num_comments": 0, "comments": [],
+         "created_utc": 1.76e9 + 60, "url": "https://reddit.example/p2"},
+    ], schema=POST_SCHEMA)
+
+
+def enrich_rows(tickers, resolved):
+    """Rows shaped like enrich_tickers_with_yfinance's result"""
+    rows = []
+    for ticker in tickers:
+        if resolved:
+            rows.append({
+                "reddit_ticker": ticker, "yfinance_symbol": ticker,
+                "long_name": f"{ticker} Holdings Inc.", "sector": "Technology",
+                "market_cap": 12_500_000, "employees": 40, "currency": "USD",
+                "current_price": 0.42, "previous_close": 0.40, "open": 0.41,
+                "day_high": 0.45, "day_low": 0.39, "volume": 150_000,
+            })
+        else:
+            rows.append({"reddit_ticker": ticker, "yfinance_symbol": None,
+                         "error": "Not found"})
+    return pd.DataFrame(rows, columns=TICKER_COLUMNS)
+
+
+class InProcessUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pennyai.duckdb")
+        self.con = duckdb.connect()
+
+    def tearDown(self):
+        self.con.close()
+        self.tmp.cleanup()
+
+    def run_engine(self, posts, resolved, to_arrow=yfinance_table):
+        processed = preprocess_duckdb(self.con, posts, denylist_path=None,
+                                      universe_path=None)
+        tickers = sorted(set(processed.column("tickers").to_pylist()))
+        yfinance_info = to_arrow(enrich_rows(tickers, resolved))
+        llm_ready = merge_duckdb(self.con, processed, yfinance_info)
+        upload_to_db(self.db_path, llm_ready, "training")
+
+    def count(self, sql):
+        with duckdb.connect(self.db_path, read_only=True) as con:
+            return con.execute(sql).fetchone()[0]
+
+    def test_no_ticker_resolved(self):
+        self.run_engine(reddit_posts(), resolved=True)
+        self.run_engine(reddit_posts(), resolved=False)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM posts"), 2)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM training"), 2)
+        # The failed lookup must not wipe the stored profile
+        self.assertEqual(self.count(
+            "SELECT COUNT(*) FROM companies WHERE long_name IS NOT NULL"), 2)
+
+    def test_no_ticker_resolved_untyped_input(self):
+        # merge_duckdb also types a table built without YFINANCE_SCHEMA
+        untyped = lambda df: pa.Table.from_pandas(df, preserve_index=False)
+        self.run_engine(reddit_posts(), resolved=True)
+        self.run_engine(reddit_posts(), resolved=False, to_arrow=untyped)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM training"), 2)
+
+    def test_empty_run(self):
+        self.run_engine(reddit_posts(), resolved=True)
+        self.run_engine(POST_SCHEMA.empty_table(), resolved=False)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM posts"), 2)
+
+    def test_empty_first_run(self):
+        self.run_engine(POST_SCHEMA.empty_table(), resolved=False)
+        self.assertEqual(self.count("SELECT COUNT(*) FROM posts"), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+"""
+Migration of the old denormalized `training` table into the normalized
+model (scripts/schema.py).
+
+    python -m unittest discover backend/tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+
+import duckdb
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from scripts.create_duckdb_from_parquet import upload_to_db  # noqa: E402
+from scripts.get_ticker_info_from_yfinance import YFINANCE_SCHEMA  # noqa: E402
+from scripts.schema import ensure_schema  # noqa: E402
+
+# The table upload_to_db created before the normalized schema
+LEGACY_TABLE_SQL = """
+CREATE SEQUENCE IF NOT EXISTS seq_row_id START 1;
+CREATE TABLE training (
+    row_id INTEGER PRIMARY KEY DEFAULT nextval('seq_row_id'),
+    reddit_ticker TEXT, yfinance_symbol TEXT, long_name TEXT, short_name TEXT,
+    sector TEXT, industry TEXT, market_cap BIGINT, employees INTEGER,
+    founded INTEGER, country TEXT, currency TEXT, current_price DOUBLE,
+    previous_close DOUBLE, open DOUBLE, day_high DOUBLE, day_low DOUBLE,
+    volume BIGINT, website TEXT, about TEXT, score INTEGER,
+    num_comments INTEGER, content TEXT, comments TEXT,
+    created_utc TIMESTAMP, error TEXT, last_updated TIMESTAMP
+);
+"""
+
+LEGACY_INSERT_SQL = """
+INSERT INTO training (
+    reddit_ticker, yfinance_symbol, long_name, current_price, score,
+    num_comments, content, comments, created_utc, error, last_updated
+)
+SELECT reddit_ticker, yfinance_symbol, long_name, current_price, score,
+       num_comments, content, comments, to_timestamp(created_utc),
+       error, last_updated
+FROM read_parquet(?)
+"""
+
+
+def legacy_parquet(path):
+    """An llm_ready parquet from before post_id was tracked"""
+    columns = {
+        "reddit_ticker": ["ABCD", "WXYZ", "ABCD"],
+        "yfinance_symbol": ["ABCD", None, "ABCD"],
+        "long_name": ["ABCD Holdings Inc.", None, "ABCD Holdings Inc."],
+        "current_price": [0.42, None, 0.42],
+        "score": pa.array([12, 3, 7], pa.int64()),
+        "num_comments": pa.array([2, 0, 1], pa.int64()),
+        "content": ["$ABCD to the moon", "$WXYZ dilution", "$ABCD again"],
+        "comments": [["great call"], [], ["nope"]],
+        "created_utc": [1.76e9, 1.76e9 + 60, 1.76e9 + 120.5],
+        "error": [None, "Not found", None],
+        "last_updated": pa.array([1.76e15] * 3, pa.timestamp("us")),
+    }
+    for field in YFINANCE_SCHEMA:
+        columns.setdefault(field.name, pa.nulls(3, field.type))
+    pq.write_table(pa.table(columns), path)
+
+
+class LegacyMigrationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "pennyai.duckdb")
+        self.parquet = os.path.join(self.tmp.name, "llm_ready_dataset.parquet")
+        legacy_parquet(self.parquet)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reupload_after_migration_keeps_post_ids(self):
+        with duckdb.connect(self.db_path) as con:
+            con.execute(LEGACY_TABLE_SQL)
+            con.execute(LEGACY_INSERT_SQL, [self.parquet])
+            ensure_schema(con)
+            con.execute("""
+                INSERT INTO summaries
+                SELECT post_id, 'summary', '', 'BUY', NULL, NULL, now()
+                FROM posts
+            """)
+            migrated = sorted(r[0] for r in con.execute(
+                "SELECT post_id FROM posts").fetchall())
+
+        upload_to_db(self.db_path, self.parquet, "training")
+
+        with duckdb.connect(self.db_path, read_only=True) as con:
+            post_ids = sorted(r[0] for r in con.execute(
+                "SELECT post_id FROM posts").fetchall())
+            rows, summarized = con.execute("""
+                SELECT COUNT(*), COUNT(summarized_content) FROM training
+            """).fetchone()
+        self.assertEqual(len(migrated), 3)
+        self.assertEqual(post_ids, migrated)
+        self.assertEqual((rows, summarized), (3, 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
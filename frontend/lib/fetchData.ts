@@ -41,6 +41,7 @@ export interface PennyDetailsRow {
   score: number | null;
   num_comments: number | null;
   content?: string;
+  comments?: string;
   created_utc: string;
   error?: string;
   last_updated: string;
@@ -52,6 +53,14 @@ export interface PennyDetailsRow {
 export interface PennyDetailsResponse {
   totalStocks: number;
   data: PennyDetailsRow[];
+  nextCursor: string | null;
+}
+
+export interface PennyDetailsOptions {
+  cursor?: string;
+  include_content?: boolean;
+  // Called for each row as soon as it arrives from the stream
+  onRow?: (row: PennyDetailsRow) => void;
 }
 
 // ---------------- Fetch summary ----------------
@@ -62,15 +71,50 @@ export async function fetchPennySummary(): Promise<PennySummaryResponse> {
 }
 
 // ---------------- Fetch details ----------------
+// Streams NDJSON so rows are available before the whole result is sent.
 export async function fetchPennyDetails(
   limit?: number,
-  include_comments: boolean = true
+  include_comments: boolean = true,
+  options: PennyDetailsOptions = {}
 ): Promise<PennyDetailsResponse> {
   const url = new URL("http://localhost:8000/api/pennystocks/details");
   if (limit) url.searchParams.append("limit", limit.toString());
   url.searchParams.append("include_comments", include_comments.toString());
+  if (options.include_content) url.searchParams.append("include_content", "true");
+  if (options.cursor) url.searchParams.append("cursor", options.cursor);
+  url.searchParams.append("format", "ndjson");
 
   const res = await fetch(url.toString());
-  if (!res.ok) throw new Error("Failed to fetch details data");
-  return res.json();
+  if (!res.ok || !res.body) throw new Error("Failed to fetch details data");
+
+  const data: PennyDetailsRow[] = [];
+  let nextCursor: string | null = null;
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const parsed = JSON.parse(line);
+    // A paged stream ends with a {"nextCursor": ...} line
+    if ("nextCursor" in parsed) {
+      nextCursor = parsed.nextCursor;
+      return;
+    }
+    if (!("row_id" in parsed) && parsed.error) throw new Error(parsed.error);
+    data.push(parsed);
+    options.onRow?.(parsed);
+  };
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop() ?? "";
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer + decoder.decode());
+
+  return { totalStocks: data.length, data, nextCursor };
 }
@@ -1,9 +1,14 @@
 import streamlit as st
-import duckdb
 import pandas as pd
 import plotly.express as px
+import html
 import math
 
+from queries import data_version, load_insights, load_kpis
+
+# Insight cards per page
+CARDS_PER_PAGE = 20
+
 # -----------------------------
 # APP CONFIG
 # -----------------------------
@@ -50,48 +55,31 @@ st.markdown(
     "Real-time insights and trends on trending penny stocks from Reddit + Market Data")
 
 st.markdown(
-    "Note: Please clear cache to refresh data. Data refresh scheduled at 6am daily.")
+    "Data refreshes automatically after the daily 6am pipeline run.")
 
 # -----------------------------
 # LOAD DATA
 # -----------------------------
-
-
-@st.cache_data
-def load_data():
-    conn = duckdb.connect("backend/data/duckdb/pennyai.duckdb", read_only=True)
-    df = conn.execute("SELECT * FROM training").df()
-    conn.close()
-    return df
-
-
-df = load_data()
+version = data_version()
+kpis = load_kpis(version)
 
 
 # -----------------------------
 # KPI METRICS
 # -----------------------------
 # Most recent timestamp
-last_updated = pd.to_datetime(df["created_utc"].max())
+last_updated = pd.to_datetime(kpis["last_updated"])
 
 # Total distinct tickers
-total_stocks = df["reddit_ticker"].nunique()
+total_stocks = kpis["total_stocks"]
 
 # Top mover (based on percent change)
-if "percent_change" in df.columns:
-    top_mover_row = df.loc[df["percent_change"].idxmax()]
-else:
-    df["percent_change"] = (
-        (df["previous_close"] - df["open"]) / df["open"]) * 100
-    top_mover_row = df.loc[df["percent_change"].idxmax()]
-
-top_mover = top_mover_row["reddit_ticker"]
-top_mover_change = round(top_mover_row["percent_change"], 2)
+top_mover = kpis["top_mover"]
+top_mover_change = round(kpis["top_mover_change"] or 0, 2)
 
 # Most talked-about ticker (count of mentions)
-talk_counts = df["reddit_ticker"].value_counts()
-most_talked = talk_counts.idxmax()
-most_talked_count = talk_counts.max()
+most_talked = kpis["most_talked"]
+most_talked_count = kpis["most_talked_count"]
 
 st.markdown("""
 <style>
@@ -150,7 +138,7 @@ with col4:
     st.markdown(f"""
     <div class='kpi-card'>
         <div class='kpi-title'>Last Updated</div>
-        <div class='kpi-value'>{last_updated.strftime("%Y-%m-%d %H:%M UTC")}</div>
+        <div class='kpi-value'>{last_updated.strftime("%Y-%m-%d %H:%M UTC") if pd.notna(last_updated) else "N/A"}</div>
     </div>
     """, unsafe_allow_html=True)
 
@@ -160,21 +148,30 @@ with col4:
 # -----------------------------
 st.subheader("Latest Reddit Insights")
 
-latest_df = df.sort_values("created_utc", ascending=False).head(20)
+pages = max(1, math.ceil(kpis["total_rows"] / CARDS_PER_PAGE))
+page = st.number_input(
+    f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+latest_df = load_insights(version, int(page), CARDS_PER_PAGE)
+
+SENTIMENT_COLORS = {
+    "bullish": "#00ff95",
+    "bearish": "#ff4b4b",
+    "neutral": "#9ea7ff"
+}
 
 
-for _, row in latest_df.iterrows():
-    # safely get value, default to empty string
-    verdict = row.get('verdict', '').strip()
-    if not verdict:
-        verdict = 'N/A'  # or 'Hold' if you want a default
-    sentiment_color = {
-        "bullish": "#00ff95",
-        "bearish": "#ff4b4b",
-        "neutral": "#9ea7ff"
-    }.get(str(row["verdict"]).lower(), "#cccccc")
+def text(value):
+    """HTML-escaped display text; missing values render empty"""
+    return "" if value is None or pd.isna(value) else html.escape(str(value))
 
-    st.markdown(f"""
+
+def insight_card(row):
+    verdict = text(row["verdict"]).strip() or "N/A"
+    sentiment_color = SENTIMENT_COLORS.get(verdict.lower(), "#cccccc")
+    created = pd.to_datetime(row["created_utc"])
+    created = created.strftime('%Y-%m-%d %H:%M UTC') if pd.notna(created) else ""
+
+    return f"""
     <div style="
         background: rgba(255,255,255,0.05);
         padding: 15px;
@@ -183,14 +180,14 @@ for _, row in latest_df.iterrows():
         border: 1px solid rgba(255,255,255,0.07);
     ">
         <div style="font-size:20px; font-weight:600; color:#b9e6ff;">
-            {row['reddit_ticker']} — {row['long_name']} - ${row['current_price']} - {row['sector']}
+            {text(row['reddit_ticker'])} — {text(row['long_name'])} - ${text(row['current_price'])} - {text(row['sector'])}
         </div>
         <div style="font-size:14px; color:#7f9ebd; margin-bottom:8px;">
-            {pd.to_datetime(row['created_utc'], unit='s').strftime('%Y-%m-%d %H:%M UTC')}
+            {created}
         </div>
         <div style="font-size:15px; color:#eaeafe;">
-            {row['summarized_content']} <br> <br> {row['summarized_comments']} <a href="{row['website']}" target="_blank" style="color:#b9e6ff; text-decoration:underline;">
-        {row['website']}
+            {text(row['summarized_content'])} <br> <br> {text(row['summarized_comments'])} <a href="{text(row['website'])}" target="_blank" style="color:#b9e6ff; text-decoration:underline;">
+        {text(row['website'])}</a>
         </div>
         <div style="
             margin-top:10px;
@@ -205,7 +202,13 @@ for _, row in latest_df.iterrows():
             {verdict}
         </div>
     </div>
-    """, unsafe_allow_html=True)
+    """
+
+
+# All cards on the page go out in one markdown block
+st.markdown(
+    "".join(insight_card(row) for row in latest_df.to_dict("records")),
+    unsafe_allow_html=True)
 
 
 st.markdown("""
@@ -0,0 +1,122 @@
+"""
+Dashboard query layer.
+
+Each widget runs its own projected query, with aggregates computed in
+DuckDB, so a session only ever holds the KPI row and one page of
+insight cards. KPIs come from the ticker_latest table the pipeline
+maintains (scripts/ticker_aggregates.py), falling back to the
+`training` view on databases built before it existed. Results are cached with
+st.cache_data keyed on the pipeline's data version (see
+backend/scripts/data_version.py), so a pipeline run invalidates them
+without anyone clearing the cache. The version itself is rechecked
+every VERSION_TTL seconds.
+"""
+import os
+from pathlib import Path
+
+import duckdb
+import streamlit as st
+
+DB_PATH = Path(os.environ.get(
+    "PENNYAI_DB_PATH", "backend/data/duckdb/pennyai.duckdb"))
+
+# How often the data version is rechecked, and how long results live
+VERSION_TTL = int(os.environ.get("PENNYAI_VERSION_TTL", 60))
+RESULT_TTL = int(os.environ.get("PENNYAI_RESULT_TTL", 6 * 60 * 60))
+
+CARD_COLUMNS = [
+    "reddit_ticker", "long_name", "current_price", "sector", "created_utc",
+    "summarized_content", "summarized_comments", "website", "verdict",
+]
+
+KPI_SQL = """
+WITH mentions AS (
+    SELECT
+        reddit_ticker,
+        created_utc,
+        (previous_close - open) / open * 100 AS percent_change
+    FROM training
+),
+totals AS (
+    SELECT
+        COUNT(*) AS total_rows,
+        COUNT(DISTINCT reddit_ticker) AS total_stocks,
+        max(created_utc) AS last_updated,
+        arg_max(reddit_ticker, percent_change)
+            FILTER (WHERE isfinite(percent_change)) AS top_mover,
+        max(percent_change)
+            FILTER (WHERE isfinite(percent_change)) AS top_mover_change
+    FROM mentions
+),
+most_talked AS (
+    SELECT reddit_ticker AS most_talked, COUNT(*) AS most_talked_count
+    FROM mentions
+    WHERE reddit_ticker IS NOT NULL
+    GROUP BY reddit_ticker
+    ORDER BY most_talked_count DESC, reddit_ticker
+    LIMIT 1
+)
+SELECT * FROM totals LEFT JOIN most_talked ON TRUE
+"""
+
+AGG_KPI_SQL = """
+SELECT
+    COALESCE(SUM(mentions), 0) AS total_rows,
+    COUNT(*) AS total_stocks,
+    max(last_post_utc) AS last_updated,
+    arg_max(reddit_ticker, (previous_close - open) / open * 100)
+        FILTER (WHERE isfinite((previous_close - open) / open)) AS top_mover,
+    max((previous_close - open) / open * 100)
+        FILTER (WHERE isfinite((previous_close - open) / open)) AS top_mover_change,
+    arg_max(reddit_ticker, mentions) AS most_talked,
+    max(mentions) AS most_talked_count
+FROM ticker_latest
+"""
+
+CARDS_SQL = f"""
+SELECT {", ".join(CARD_COLUMNS)}
+FROM training
+ORDER BY created_utc DESC NULLS LAST, row_id DESC
+LIMIT ? OFFSET ?
+"""
+
+
+def _connect():
+    return duckdb.connect(str(DB_PATH), read_only=True)
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def data_version():
+    """
+    Version written by the pipeline; databases without the data_version
+    table fall back to the file's modification time and size.
+    """
+    try:
+        with _connect() as con:
+            row = con.execute("SELECT version FROM data_version").fetchone()
+            if row:
+                return row[0]
+    except duckdb.Error:
+        pass
+    stat = DB_PATH.stat()
+    return f"file-{stat.st_mtime_ns}-{stat.st_size}"
+
+
+@st.cache_data(ttl=RESULT_TTL, max_entries=4, show_spinner=False)
+def load_kpis(version):
+    """KPI card values, computed in one DuckDB query"""
+    with _connect() as con:
+        has_aggregates = con.execute(
+            "SELECT COUNT(*) FROM information_schema.tables "
+            "WHERE table_name = 'ticker_latest'").fetchone()[0]
+        result = con.execute(AGG_KPI_SQL if has_aggregates else KPI_SQL)
+        names = [d[0] for d in result.description]
+        return dict(zip(names, result.fetchone()))
+
+
+@st.cache_data(ttl=RESULT_TTL, max_entries=64, show_spinner=False)
+def load_insights(version, page, page_size):
+    """One page of insight cards, newest post first"""
+    with _connect() as con:
+        return con.execute(
+            CARDS_SQL, [page_size, (page - 1) * page_size]).df()